@@ -0,0 +1,147 @@
+import os
+from math import cos
+from math import floor
+from math import log
+from math import pi
+from math import radians
+from math import tan
+from typing import Tuple
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy import NullPool
+
+from benchmarks import network
+
+# Note to the Future: The suite needs a PostGIS database it can fill with a
+# synthetic network.  Point it at one with `--dsn` (or `BENCHMARK_DSN`);
+# otherwise a throwaway `postgis/postgis` container is started (and removed
+# when the run ends).  See the `dsn` fixture in the top-level `conftest.py`.
+# The network is only rebuilt when it isn't already the requested size, so
+# repeated runs against the same database are quick.
+
+#: This is the number of links in each (ID-ordered) sample of the network.
+SAMPLE_SIZE = 100
+
+#: This is the zoom level of the benchmarked vector tile.
+TILE_ZOOM = 14
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("urban-sdk-homework benchmarks")
+    group.addoption(
+        "--links",
+        type=int,
+        default=10_000,
+        help="the number of links in the synthetic network",
+    )
+    group.addoption(
+        "--records",
+        type=int,
+        default=1,
+        help="the number of speed records per link, day and period",
+    )
+
+
+@pytest.fixture(scope="session")
+def scale(request) -> Tuple[int, int]:
+    """The number of links and the number of records per link and cell."""
+    return (
+        request.config.getoption("--links"),
+        request.config.getoption("--records"),
+    )
+
+
+@pytest.fixture(scope="session")
+def database(dsn: str, scale: Tuple[int, int]) -> str:
+    """A migrated database holding the synthetic network."""
+    # The services read their settings when they're created, so the
+    # environment has to be in place first.  Caching is turned off so every
+    # round measures the database, not a dictionary lookup.
+    os.environ["urban_sdk_homework__traffic__sqa_conn"] = dsn
+    os.environ["urban_sdk_homework__traffic__cache_size"] = "0"
+    os.environ["urban_sdk_homework__traffic__tile_cache_size"] = "0"
+    os.environ["urban_sdk_homework__api__warm_up"] = "false"
+
+    from urban_sdk_homework.modules.db.services import DbService
+    from urban_sdk_homework.modules.traffic.services import TrafficService
+
+    DbService().upgrade()
+    links, records = scale
+    engine = create_engine(dsn, poolclass=NullPool)
+    try:
+        with engine.connect() as conn:
+            found = conn.execute(network.counts()).one()
+        if (found.links, found.records) != (links, links * 49 * records):
+            with engine.begin() as conn:
+                conn.execute(network.clear())
+                conn.execute(network.insert_links(links))
+            service = TrafficService()
+            service.create_partitions(
+                network.FIRST_WEEK,
+                network.FIRST_WEEK + network.weeks(records),
+            )
+            with engine.begin() as conn:
+                conn.execute(network.insert_speed_records(links, records))
+            service.simplify_links()
+            service.refresh_aggregates(full=True)
+        with engine.connect().execution_options(
+            isolation_level="AUTOCOMMIT"
+        ) as conn:
+            conn.execute(network.analyze())
+    finally:
+        engine.dispose()
+    return dsn
+
+
+@pytest.fixture(scope="session")
+def link_ids(scale: Tuple[int, int]) -> Tuple[int, ...]:
+    """A sample of link IDs spread across the network."""
+    links, _ = scale
+    step = max(links // SAMPLE_SIZE, 1)
+    return tuple(range(1, links + 1, step))[:SAMPLE_SIZE]
+
+
+@pytest.fixture(scope="session")
+def bbox(scale: Tuple[int, int]) -> Tuple[float, float, float, float]:
+    """A bounding box around the south-west quarter of the network."""
+    min_x, min_y, max_x, max_y = network.extent(scale[0])
+    return min_x, min_y, (min_x + max_x) / 2, (min_y + max_y) / 2
+
+
+@pytest.fixture(scope="session")
+def polygon(bbox: Tuple[float, float, float, float]) -> dict:
+    """A GeoJSON polygon around the south-west quarter of the network."""
+    min_x, min_y, max_x, max_y = bbox
+    return {
+        "type": "Polygon",
+        "coordinates": [
+            [
+                [min_x, min_y],
+                [max_x, min_y],
+                [max_x, max_y],
+                [min_x, max_y],
+                [min_x, min_y],
+            ]
+        ],
+    }
+
+
+@pytest.fixture(scope="session")
+def tile() -> Tuple[int, int, int]:
+    """The `(z, x, y)` of the tile holding the network's south-west corner."""
+    lng, lat = network.ORIGIN
+    n = 2**TILE_ZOOM
+    x = floor((lng + 180.0) / 360.0 * n)
+    mercator = log(tan(radians(lat)) + 1 / cos(radians(lat)))
+    y = floor((1.0 - mercator / pi) / 2.0 * n)
+    return TILE_ZOOM, x, y
+
+
+@pytest.fixture(autouse=True)
+def _scale_info(request, scale: Tuple[int, int]):
+    """Record the network's size with every benchmark."""
+    if "benchmark" in request.fixturenames:
+        links, records = scale
+        benchmark = request.getfixturevalue("benchmark")
+        benchmark.extra_info.update(links=links, records=records)
@@ -0,0 +1,142 @@
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from math import ceil
+from math import sqrt
+from typing import Tuple
+
+from sqlalchemy import text
+from sqlalchemy import TextClause
+
+# Note to the Future: The synthetic network is generated by Postgres itself
+# (with `generate_series`) so that even a million links load in seconds
+# rather than minutes.  It's a grid of alternating east-west and north-south
+# segments (about 100m long) anchored in Duval County, with a speed record
+# for every link, day and period (times `records` weeks).
+
+#: This is the south-west corner of the grid (longitude, latitude).
+ORIGIN: Tuple[float, float] = (-81.8, 30.2)
+
+#: This is the distance between grid nodes (in degrees, roughly 100m).
+SPACING = 0.001
+
+#: This is the first week of speed records (a Sunday, since day 1 is
+#: Sunday).
+FIRST_WEEK = datetime(2024, 1, 7, tzinfo=timezone.utc)
+
+
+def columns(links: int) -> int:
+    """
+    Get the number of grid columns (and rows) for a number of links.
+
+    :param links: the number of links
+    """
+    return max(ceil(sqrt(links / 2)), 1)
+
+
+def extent(links: int) -> Tuple[float, float, float, float]:
+    """
+    Get the bounding box of the network.
+
+    :param links: the number of links
+    """
+    size = (columns(links) + 1) * SPACING
+    return ORIGIN[0], ORIGIN[1], ORIGIN[0] + size, ORIGIN[1] + size
+
+
+def weeks(records: int) -> timedelta:
+    """
+    Get the time spanned by the speed records.
+
+    :param records: the number of records for each link, day and period
+    """
+    return timedelta(weeks=records)
+
+
+def clear() -> TextClause:
+    """Empty the traffic tables."""
+    return text(
+        'TRUNCATE "traffic"."links", "traffic"."speed_records" '
+        "RESTART IDENTITY CASCADE"
+    )
+
+
+def insert_links(links: int) -> TextClause:
+    """
+    Generate the links.
+
+    :param links: the number of links
+    """
+    return text(
+        'INSERT INTO "traffic"."links"'
+        '("link_id", "road_name", "length", "geom") '
+        "SELECT "
+        "i + 1, "
+        "CASE WHEN i % 2 = 0 "
+        "THEN 'Row ' || (i / 2) / :columns "
+        "ELSE 'Column ' || (i / 2) % :columns END || ' St', "
+        "ST_Length(line::geography), "
+        "line "
+        "FROM generate_series(0, :links - 1) AS i, "
+        "LATERAL (SELECT ST_SetSRID(ST_MakeLine("
+        "ST_MakePoint("
+        ":x + ((i / 2) % :columns) * :spacing, "
+        ":y + ((i / 2) / :columns) * :spacing), "
+        "ST_MakePoint("
+        ":x + ((i / 2) % :columns + 1 - i % 2) * :spacing, "
+        ":y + ((i / 2) / :columns + i % 2) * :spacing)"
+        "), 4326) AS line) AS g"
+    ).bindparams(
+        links=links,
+        columns=columns(links),
+        x=ORIGIN[0],
+        y=ORIGIN[1],
+        spacing=SPACING,
+    )
+
+
+def insert_speed_records(links: int, records: int) -> TextClause:
+    """
+    Generate the speed records.
+
+    Each link gets a free-flow speed, which slows down in the peak periods
+    (and a little at random).
+
+    :param links: the number of links
+    :param records: the number of records for each link, day and period
+    """
+    return text(
+        'INSERT INTO "traffic"."speed_records"'
+        '("link_id", "speed", "day_of_week", "period", "timestamp") '
+        "SELECT "
+        "link_id, "
+        "GREATEST((25 + (link_id % 40)) "
+        "* CASE WHEN period IN (3, 6) AND day BETWEEN 2 AND 6 "
+        "THEN 0.6 ELSE 1.0 END "
+        "* (0.85 + random() * 0.3), 1), "
+        "day, "
+        "period, "
+        "CAST(:first_week AS TIMESTAMPTZ) "
+        "+ (week * 7 + day - 1) * INTERVAL '1 day' "
+        "+ (period * 3) * INTERVAL '1 hour' "
+        "FROM generate_series(1, :links) AS link_id, "
+        "generate_series(1, 7) AS day, "
+        "generate_series(1, 7) AS period, "
+        "generate_series(0, :records - 1) AS week"
+    ).bindparams(links=links, records=records, first_week=FIRST_WEEK)
+
+
+def counts() -> TextClause:
+    """Count the links and speed records."""
+    return text(
+        'SELECT (SELECT COUNT(*) FROM "traffic"."links") AS links, '
+        '(SELECT COUNT(*) FROM "traffic"."speed_records") AS records'
+    )
+
+
+def analyze() -> TextClause:
+    """Update the planner's statistics for the traffic tables."""
+    return text(
+        'ANALYZE "traffic"."links", "traffic"."speed_records", '
+        '"traffic"."link_aggs", "traffic"."link_speed_bins"'
+    )
@@ -0,0 +1,174 @@
+from typing import Tuple
+
+import pytest
+
+# Note to the Future: These benchmarks send requests through the whole
+# application (middleware, validation, the async service and serialization)
+# in-process, so there's no network in the numbers.  For latency under
+# concurrent load, run a load test against a real server instead.
+
+#: This is the day (Monday) and period (AM Peak) most benchmarks read.
+DAY, PERIOD = 2, 3
+
+#: These are the same day and period as they're named in URLs.
+DAY_NAME, PERIOD_NAME = "Monday", "AM Peak"
+
+#: These are the page sizes: the default, and the largest a caller may ask
+#: for.
+LIMITS = (100, 10_000)
+
+
+@pytest.fixture(scope="module")
+def client(database: str):
+    """A client for the application, connected to the benchmark database."""
+    from fastapi.testclient import TestClient
+
+    from urban_sdk_homework.modules.api.app import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+def _get(client, url: str, **params):
+    """
+    Get a URL (and make sure it worked).
+
+    :param client: the client
+    :param url: the URL
+    :param params: the query parameters
+    """
+    response = client.get(url, params=params, follow_redirects=False)
+    assert response.status_code == 200, response.text
+    return response
+
+
+def _post(client, url: str, body: dict, **params):
+    """
+    Post a body to a URL (and make sure it worked).
+
+    :param client: the client
+    :param url: the URL
+    :param body: the JSON body
+    :param params: the query parameters
+    """
+    response = client.post(
+        url, json=body, params=params, follow_redirects=False
+    )
+    assert response.status_code == 200, response.text
+    return response
+
+
+@pytest.mark.benchmark(group="api:aggregates")
+@pytest.mark.parametrize("limit", LIMITS)
+@pytest.mark.parametrize("format_", ("json", "geojson", "ndjson"))
+def test_aggregates(benchmark, client, limit: int, format_: str):
+    benchmark(
+        _get,
+        client,
+        "/aggregates",
+        day=DAY_NAME,
+        period=PERIOD_NAME,
+        limit=limit,
+        format=format_,
+    )
+
+
+@pytest.mark.benchmark(group="api:aggregates")
+def test_aggregates_by_link(benchmark, client, link_ids: Tuple[int, ...]):
+    benchmark(
+        _get,
+        client,
+        f"/aggregates/{link_ids[0]}",
+        day=DAY_NAME,
+        period=PERIOD_NAME,
+    )
+
+
+@pytest.mark.benchmark(group="api:aggregates")
+def test_aggregates_spatial_filter(
+    benchmark, client, bbox: Tuple[float, float, float, float]
+):
+    benchmark(
+        _post,
+        client,
+        "/aggregates/spatial_filter",
+        {"day": DAY, "period": PERIOD, "bbox": list(bbox)},
+        limit=1000,
+    )
+
+
+@pytest.mark.benchmark(group="api:links")
+def test_link(benchmark, client, link_ids: Tuple[int, ...]):
+    benchmark(_get, client, f"/link/{link_ids[0]}")
+
+
+@pytest.mark.benchmark(group="api:links")
+@pytest.mark.parametrize("resolution", ("full", "low"))
+def test_links(benchmark, client, resolution: str):
+    benchmark(
+        _get,
+        client,
+        "/links",
+        day=DAY_NAME,
+        period=PERIOD_NAME,
+        limit=1000,
+        resolution=resolution,
+    )
+
+
+@pytest.mark.benchmark(group="api:links")
+def test_link_batch(benchmark, client, link_ids: Tuple[int, ...]):
+    benchmark(_post, client, "/links/batch", {"link_ids": list(link_ids)})
+
+
+@pytest.mark.benchmark(group="api:profiles")
+def test_speed_profile(benchmark, client, link_ids: Tuple[int, ...]):
+    benchmark(_get, client, f"/aggregates/{link_ids[0]}/profile")
+
+
+@pytest.mark.benchmark(group="api:profiles")
+def test_speed_profile_batch(benchmark, client, link_ids: Tuple[int, ...]):
+    benchmark(
+        _post, client, "/aggregates/profiles", {"link_ids": list(link_ids)}
+    )
+
+
+@pytest.mark.benchmark(group="api:percentiles")
+@pytest.mark.parametrize("group_by", ("link", "road", "all"))
+def test_speed_percentiles(
+    benchmark,
+    client,
+    bbox: Tuple[float, float, float, float],
+    group_by: str,
+):
+    benchmark(
+        _post,
+        client,
+        "/aggregates/percentiles",
+        {
+            "day": DAY,
+            "period": PERIOD,
+            "percentiles": [50, 85, 95],
+            "group_by": group_by,
+            "bbox": list(bbox),
+        },
+    )
+
+
+@pytest.mark.benchmark(group="api:patterns")
+def test_slow_links(benchmark, client):
+    benchmark(
+        _get,
+        client,
+        "/patterns/slow_links",
+        period=PERIOD_NAME,
+        threshold=30.0,
+        min_days=3,
+    )
+
+
+@pytest.mark.benchmark(group="api:tiles")
+def test_tile(benchmark, client, tile: Tuple[int, int, int]):
+    z, x, y = tile
+    url = f"/tiles/{DAY_NAME}/{PERIOD_NAME}/{z}/{x}/{y}.pbf"
+    benchmark(_get, client, url)
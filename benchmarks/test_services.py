@@ -0,0 +1,161 @@
+from typing import Tuple
+
+import pytest
+
+from urban_sdk_homework.core.geometry import geojson
+from urban_sdk_homework.modules.traffic.models import GeometryOptions
+from urban_sdk_homework.modules.traffic.models import Grouping
+from urban_sdk_homework.modules.traffic.models import Resolution
+
+# Note to the Future: These benchmarks call the (synchronous) traffic service
+# directly, so they measure the queries and the model building without the
+# web framework.  Compare them with `test_endpoints.py` to see what the API
+# itself costs.
+
+#: This is the day (Monday) and period (AM Peak) most benchmarks read.
+DAY, PERIOD = 2, 3
+
+#: These are the page sizes: the default, and the largest a caller may ask
+#: for.
+LIMITS = (100, 10_000)
+
+
+@pytest.fixture(scope="module")
+def service(database: str):
+    """The traffic service, connected to the benchmark database."""
+    from urban_sdk_homework.modules.traffic.services import TrafficService
+
+    service = TrafficService()
+    # Open a connection (and load any lazily-built state) before timing.
+    service.data_version()
+    return service
+
+
+@pytest.mark.benchmark(group="service:aggregates")
+@pytest.mark.parametrize("limit", LIMITS)
+def test_get_aggregates(benchmark, service, limit: int):
+    items = benchmark(
+        service.get_aggregates, day=DAY, period=PERIOD, limit=limit
+    )
+    assert items
+
+
+@pytest.mark.benchmark(group="service:aggregates")
+def test_get_aggregates_bbox(
+    benchmark, service, bbox: Tuple[float, float, float, float]
+):
+    items = benchmark(
+        service.get_aggregates, day=DAY, period=PERIOD, bbox=bbox, limit=100
+    )
+    assert items
+
+
+@pytest.mark.benchmark(group="service:aggregates")
+def test_get_aggregates_percentiles(benchmark, service):
+    items = benchmark(
+        service.get_aggregates,
+        day=DAY,
+        period=PERIOD,
+        limit=100,
+        percentiles=(50, 85, 95),
+    )
+    assert items
+
+
+@pytest.mark.benchmark(group="service:aggregates")
+@pytest.mark.parametrize("limit", LIMITS)
+def test_get_aggregates_geojson(benchmark, service, limit: int):
+    page = benchmark(
+        service.get_aggregates_geojson, day=DAY, period=PERIOD, limit=limit
+    )
+    assert page.count
+
+
+@pytest.mark.benchmark(group="service:links")
+def test_get_link(benchmark, service, link_ids: Tuple[int, ...]):
+    links = benchmark(service.get_links, link_id=link_ids[0])
+    assert links
+
+
+@pytest.mark.benchmark(group="service:links")
+@pytest.mark.parametrize("resolution", tuple(Resolution))
+def test_get_links_bbox(
+    benchmark,
+    service,
+    bbox: Tuple[float, float, float, float],
+    resolution: Resolution,
+):
+    links = benchmark(
+        service.get_links,
+        bbox=bbox,
+        limit=1000,
+        geometry=GeometryOptions(resolution=resolution),
+    )
+    assert links
+
+
+@pytest.mark.benchmark(group="service:links")
+def test_get_links_polygon(benchmark, service, polygon: dict):
+    links = benchmark(
+        service.get_links,
+        polygon=geojson.Polygon.model_validate(polygon),
+        limit=1000,
+    )
+    assert links
+
+
+@pytest.mark.benchmark(group="service:links")
+def test_get_links_geojson(
+    benchmark, service, bbox: Tuple[float, float, float, float]
+):
+    page = benchmark(service.get_links_geojson, bbox=bbox, limit=1000)
+    assert page.count
+
+
+@pytest.mark.benchmark(group="service:links")
+def test_get_link_batch(benchmark, service, link_ids: Tuple[int, ...]):
+    batch = benchmark(service.get_link_batch, link_ids=link_ids)
+    assert not batch.missing
+
+
+@pytest.mark.benchmark(group="service:profiles")
+def test_get_profile_batch(benchmark, service, link_ids: Tuple[int, ...]):
+    batch = benchmark(service.get_profile_batch, link_ids=link_ids)
+    assert not batch.missing
+
+
+@pytest.mark.benchmark(group="service:percentiles")
+@pytest.mark.parametrize("group_by", tuple(Grouping))
+def test_get_percentiles(
+    benchmark,
+    service,
+    bbox: Tuple[float, float, float, float],
+    group_by: Grouping,
+):
+    items = benchmark(
+        service.get_percentiles,
+        day=DAY,
+        period=PERIOD,
+        percentiles=(50, 85, 95),
+        group_by=group_by,
+        bbox=bbox,
+        limit=100 if group_by == Grouping.LINK else None,
+    )
+    assert items
+
+
+@pytest.mark.benchmark(group="service:patterns")
+def test_get_slow_links(benchmark, service):
+    links = benchmark(
+        service.get_slow_links, period=PERIOD, threshold=30.0, limit=100
+    )
+    assert links
+
+
+@pytest.mark.benchmark(group="service:tiles")
+def test_get_tile(benchmark, service, tile: Tuple[int, int, int]):
+    z, x, y = tile
+    content = benchmark(
+        service.get_tile, day=DAY, period=PERIOD, z=z, x=x, y=y
+    )
+    assert content
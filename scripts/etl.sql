@@ -1,39 +1,18 @@
--- Make sure we're ready to handle geometry.
-CREATE EXTENSION IF NOT EXISTS postgis;
--- Create the "traffic" schema.
-CREATE SCHEMA IF NOT EXISTS "traffic";
+-- The tables are created (and kept up to date) by the migrations, so run
+-- `homework db upgrade` before this script.
 
--- Create the "links" table.
-DROP TABLE IF EXISTS "traffic"."links" CASCADE;
-CREATE TABLE IF NOT EXISTS "traffic"."links"(
-	-- "link_id" wouldn't be the first choice for the ID column
-	-- on a relation called "links"... but this seems more consistent
-	-- with the assignment.
-	"link_id" BIGINT PRIMARY KEY,
-	"road_name" CHARACTER VARYING,
-	"length" NUMERIC,
-	"geom" Geometry(LineString, 4326)
-);
-CREATE INDEX idx_links_geom ON "traffic"."links" USING GIST(geom);
-
--- Create the "speed_records" table.
-DROP TABLE IF EXISTS "traffic"."speed_records";
-CREATE TABLE IF NOT EXISTS "traffic"."speed_records"(
-	"id" SERIAL PRIMARY KEY,
-	"link_id" BIGINT REFERENCES "traffic"."links"("link_id"),
-	"speed" DOUBLE PRECISION,
-	"day_of_week" SMALLINT,
-	"period" SMALLINT,
-	"timestamp" TIMESTAMPTZ
-);
-CREATE INDEX IF NOT EXISTS idx_speed_records_link_id ON "traffic"."speed_records"("link_id");
-CREATE INDEX IF NOT EXISTS idx_speed_records_speed ON "traffic"."speed_records"("speed");
-CREATE INDEX IF NOT EXISTS idx_speed_records_day_of_week ON "traffic"."speed_records"("day_of_week");
-CREATE INDEX IF NOT EXISTS idx_speed_records_period ON "traffic"."speed_records"("period");
-CREATE INDEX IF NOT EXISTS idx_speed_records_timestamp ON "traffic"."speed_records"("timestamp");
+-- Empty the links and everything that refers to them.  (The speed record
+-- partitions themselves are kept, and so is "data_version", so the version
+-- only goes up.)
+TRUNCATE
+	"traffic"."links",
+	"traffic"."speed_records",
+	"traffic"."link_aggs",
+	"traffic"."link_speed_bins",
+	"traffic"."link_aggs_state"
+RESTART IDENTITY CASCADE;
 
 -- ETL the Links data.
-DELETE FROM "traffic"."links";
 INSERT INTO
 	"traffic"."links"(
 		"link_id",
@@ -58,8 +37,40 @@ FROM
 	"staging"."link_info"
 ;
 
+-- Simplify the link geometry.  (These tolerances must match the ones in
+-- `urban_sdk_homework.modules.traffic.models.Resolution`.)  We keep links
+-- that simplify to a point as two-point lines so they don't disappear.
+UPDATE
+	"traffic"."links"
+SET
+	"geom_high" = ST_Simplify("geom", 0.00001, TRUE),
+	"geom_medium" = ST_Simplify("geom", 0.0001, TRUE),
+	"geom_low" = ST_Simplify("geom", 0.001, TRUE)
+;
+
 -- ETL the aggregates data.
-DELETE FROM "traffic"."speed_records";
+-- Create a partition for every month in the staging data.
+DO $$
+DECLARE
+	"month" DATE;
+	"last" DATE;
+BEGIN
+	SELECT
+		DATE_TRUNC('month', MIN("date_time"::TIMESTAMPTZ) AT TIME ZONE 'UTC'),
+		DATE_TRUNC('month', MAX("date_time"::TIMESTAMPTZ) AT TIME ZONE 'UTC')
+	INTO "month", "last"
+	FROM "staging"."duval_jan1_2024";
+	WHILE "month" <= "last" LOOP
+		EXECUTE FORMAT(
+			'CREATE TABLE IF NOT EXISTS "traffic".%I PARTITION OF "traffic"."speed_records" FOR VALUES FROM (%L) TO (%L)',
+			'speed_records_' || TO_CHAR("month", 'YYYY_MM'),
+			"month"::TEXT || ' 00:00:00+00',
+			("month" + INTERVAL '1 month')::DATE::TEXT || ' 00:00:00+00'
+		);
+		"month" := ("month" + INTERVAL '1 month')::DATE;
+	END LOOP;
+END
+$$;
 INSERT INTO
 	"traffic"."speed_records"(
 		"link_id",
@@ -77,3 +88,88 @@ SELECT
 FROM
 	"staging"."duval_jan1_2024"
 ;
+
+-- Build the aggregates.
+INSERT INTO
+	"traffic"."link_aggs"(
+		"link_id",
+		"day_of_week",
+		"period",
+		"speed",
+		"total",
+		"count",
+		"min_speed",
+		"max_speed"
+	)
+SELECT
+	"link_id",
+	"day_of_week",
+	"period",
+	AVG("speed"),
+	SUM("speed"),
+	COUNT("speed"),
+	MIN("speed"),
+	MAX("speed")
+FROM
+	"traffic"."speed_records"
+WHERE
+	"speed" IS NOT NULL
+GROUP BY
+	"link_id",
+	"day_of_week",
+	"period"
+;
+
+-- Build the speed histograms.  (The bins are 0.5 mph wide, like
+-- `BIN_WIDTH` in `urban_sdk_homework/modules/traffic/histograms.py`.)
+INSERT INTO
+	"traffic"."link_speed_bins"(
+		"link_id",
+		"day_of_week",
+		"period",
+		"bin",
+		"count"
+	)
+SELECT
+	"link_id",
+	"day_of_week",
+	"period",
+	FLOOR("speed" / 0.5),
+	COUNT(*)
+FROM
+	"traffic"."speed_records"
+WHERE
+	"speed" IS NOT NULL
+GROUP BY
+	"link_id",
+	"day_of_week",
+	"period",
+	FLOOR("speed" / 0.5)
+;
+INSERT INTO
+	"traffic"."link_aggs_state"(
+		"id",
+		"last_record_id",
+		"refreshed_at"
+	)
+SELECT
+	1,
+	COALESCE(MAX("id"), 0),
+	NOW()
+FROM
+	"traffic"."speed_records"
+;
+
+-- Let the API know the data has changed.
+INSERT INTO
+	"traffic"."data_version"(
+		"id",
+		"version",
+		"updated_at"
+	)
+VALUES
+	(1, 1, NOW())
+ON CONFLICT ("id") DO UPDATE SET
+	"version" = "data_version"."version" + 1,
+	"updated_at" = NOW()
+;
@@ -30,4 +30,6 @@ ogr2ogr \
 
 # Ensure libpq is in your PATH.
 export PATH="$PATH:/usr/local/Cellar/libpq/17.5/bin"
+# Bring the schema up to date before we load it.
+homework db upgrade
 psql -f ./scripts/etl.sql
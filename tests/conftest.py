@@ -0,0 +1,89 @@
+import os
+from typing import Iterator
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy import Engine
+from sqlalchemy import NullPool
+from sqlalchemy import text
+
+# Note to the Future: Every test that touches the database starts from empty
+# traffic tables (see `engine`), so tests can't see each other's rows.
+
+
+@pytest.fixture(scope="session")
+def database(dsn: str) -> str:
+    """A migrated database."""
+    # The services read their settings when they're created, so the
+    # environment has to be in place first.  Caching is turned off so every
+    # call reaches the database.
+    os.environ["urban_sdk_homework__traffic__sqa_conn"] = dsn
+    os.environ["urban_sdk_homework__traffic__cache_size"] = "0"
+    os.environ["urban_sdk_homework__traffic__tile_cache_size"] = "0"
+    os.environ["urban_sdk_homework__traffic__data_version_interval"] = "0"
+
+    from urban_sdk_homework.modules.db.services import DbService
+
+    DbService().upgrade()
+    return dsn
+
+
+@pytest.fixture
+def engine(database: str) -> Iterator[Engine]:
+    """An engine for the (emptied) test database."""
+    engine = create_engine(database, poolclass=NullPool)
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                'TRUNCATE "traffic"."links", "traffic"."speed_records", '
+                '"traffic"."link_aggs_state", "traffic"."data_version" '
+                "RESTART IDENTITY CASCADE"
+            )
+        )
+    try:
+        yield engine
+    finally:
+        engine.dispose()
+
+
+@pytest.fixture
+def service(engine: Engine):
+    """A traffic service connected to the (emptied) test database."""
+    from urban_sdk_homework.modules.traffic.services import TrafficService
+
+    return TrafficService()
+
+
+@pytest.fixture
+def client(engine: Engine) -> Iterator[TestClient]:
+    """A client for the traffic endpoints, backed by the test database."""
+    from urban_sdk_homework.core.errors import AppException
+    from urban_sdk_homework.modules.api.api.metrics import router as metrics
+    from urban_sdk_homework.modules.api.app import app_exception_handler
+    from urban_sdk_homework.modules.api.middleware import MetricsMiddleware
+    from urban_sdk_homework.modules.api.middleware import (
+        ServerTimingMiddleware,
+    )
+    from urban_sdk_homework.modules.traffic.api.dependencies import service
+    from urban_sdk_homework.modules.traffic.api.endpoints import router
+    from urban_sdk_homework.modules.traffic.services import (
+        AsyncTrafficService,
+    )
+
+    # The app is put together here (rather than imported) so that the routes
+    # get a service created with the test settings, and so that nothing
+    # warms up a connection the tests don't use.
+    app = FastAPI()
+    app.add_exception_handler(AppException, app_exception_handler)
+    app.add_middleware(ServerTimingMiddleware)
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(router)
+    app.include_router(metrics)
+    traffic = AsyncTrafficService()
+    app.dependency_overrides[service] = lambda: traffic
+    # Entering the client runs every request on one event loop (which the
+    # service's pooled connections belong to).
+    with TestClient(app) as client:
+        yield client
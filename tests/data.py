@@ -0,0 +1,68 @@
+from datetime import datetime
+from datetime import timezone
+from typing import Iterable
+from typing import Optional
+from typing import Tuple
+
+from sqlalchemy import Engine
+from sqlalchemy import text
+
+#: This is the time of the speed records (a Monday morning, so day 2 and
+#: period 3).
+MONDAY = datetime(2024, 1, 8, 8, tzinfo=timezone.utc)
+
+
+def add_links(engine: Engine, link_ids: Iterable[int]):
+    """
+    Add short east-west links.
+
+    :param engine: the engine
+    :param link_ids: the links' IDs
+    """
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                'INSERT INTO "traffic"."links"'
+                '("link_id", "road_name", "length", "geom") '
+                "VALUES (:link_id, 'Main St', 100, ST_SetSRID("
+                "ST_MakeLine(ST_MakePoint(-81.6 + :link_id * 0.001, 30.3), "
+                "ST_MakePoint(-81.599 + :link_id * 0.001, 30.3)), 4326))"
+            ),
+            [{"link_id": link_id} for link_id in link_ids],
+        )
+
+
+def add_records(
+    engine: Engine,
+    records: Iterable[Tuple[int, Optional[float]]],
+    day: int = 2,
+    period: int = 3,
+    timestamp: datetime = MONDAY,
+):
+    """
+    Add speed records.
+
+    :param engine: the engine
+    :param records: the records' link IDs and speeds
+    :param day: the records' day of the week
+    :param period: the records' time period
+    :param timestamp: the records' time
+    """
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                'INSERT INTO "traffic"."speed_records"'
+                '("link_id", "speed", "day_of_week", "period", "timestamp") '
+                "VALUES (:link_id, :speed, :day, :period, :timestamp)"
+            ),
+            [
+                {
+                    "link_id": link_id,
+                    "speed": speed,
+                    "day": day,
+                    "period": period,
+                    "timestamp": timestamp,
+                }
+                for link_id, speed in records
+            ],
+        )
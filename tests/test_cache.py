@@ -0,0 +1,46 @@
+from urban_sdk_homework.core.cache import estimate_size
+from urban_sdk_homework.core.cache import LRUCache
+
+
+def test_cache_evicts_by_count():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert ("a" in cache, "b" in cache, "c" in cache) == (True, False, True)
+    assert cache.stats().evictions == 1
+
+
+def test_cache_evicts_by_size():
+    cache = LRUCache(10, maxbytes=10, sizeof=len)
+    cache.put("a", "xxxx")
+    cache.put("b", "xxxx")
+    cache.put("c", "xxxx")
+
+    assert ("a" in cache, "b" in cache, "c" in cache) == (False, True, True)
+    stats = cache.stats()
+    assert (stats.nbytes, stats.maxbytes, stats.evictions) == (8, 10, 1)
+
+
+def test_cache_skips_items_larger_than_it():
+    cache = LRUCache(10, maxbytes=10, sizeof=len)
+    cache.put("a", "xxxx")
+    cache.put("b", "x" * 11)
+
+    assert ("a" in cache, "b" in cache) == (True, False)
+
+
+def test_cache_replaces_items():
+    cache = LRUCache(10, maxbytes=10, sizeof=len)
+    cache.put("a", "xxxx")
+    cache.put("a", "xxxxxx")
+
+    assert cache.get("a") == "xxxxxx"
+    assert cache.stats().nbytes == 6
+
+
+def test_estimate_size_grows_with_sequences():
+    assert estimate_size(b"abc") == 3
+    assert estimate_size(("abc",) * 1000) > 1000 * 3
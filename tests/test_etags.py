@@ -0,0 +1,75 @@
+import pytest
+from fastapi import APIRouter
+from fastapi import FastAPI
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from urban_sdk_homework.core.fastapi import ETagRoute
+from urban_sdk_homework.modules.traffic.api.routes import TrafficRoute
+
+
+class _Route(ETagRoute):
+    async def version(self, request):
+        return 1
+
+
+@pytest.fixture(scope="module")
+def client() -> TestClient:
+    """A client for an app with one tagged route."""
+    router = APIRouter(route_class=_Route)
+
+    @router.get("/things/{thing_id}")
+    def get_thing(thing_id: int):
+        if thing_id != 1:
+            raise HTTPException(status_code=404)
+        return {"thing_id": thing_id}
+
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def test_matching_etag_is_not_modified(client: TestClient):
+    etag = client.get("/things/1").headers["ETag"]
+
+    response = client.get("/things/1", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+
+def test_wildcard_is_not_modified_when_found(client: TestClient):
+    response = client.get("/things/1", headers={"If-None-Match": "*"})
+
+    assert response.status_code == 304
+
+
+def test_wildcard_is_not_found_when_missing(client: TestClient):
+    response = client.get("/things/2", headers={"If-None-Match": "*"})
+
+    assert response.status_code == 404
+    assert "ETag" not in response.headers
+
+
+def test_traffic_routes_read_cache_control_late(monkeypatch):
+    class Route(TrafficRoute):
+        async def version(self, request):
+            return 1
+
+    router = APIRouter(route_class=Route)
+
+    @router.get("/things")
+    def get_things():
+        return []
+
+    # `homework api start` loads its environment file after the routes are
+    # made.
+    monkeypatch.setenv(
+        "urban_sdk_homework__api__cache_control", "public, max-age=60"
+    )
+    app = FastAPI()
+    app.include_router(router)
+
+    response = TestClient(app).get("/things")
+
+    assert response.headers["Cache-Control"] == "public, max-age=60"
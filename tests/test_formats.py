@@ -0,0 +1,115 @@
+import json
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+from tests.data import add_links
+from tests.data import add_records
+
+
+@pytest.fixture
+def network(engine, service):
+    """Three links, two with speeds on a Monday morning."""
+    add_links(engine, (1, 2, 3))
+    add_records(engine, ((1, 10.0), (1, 20.0), (2, 30.0)))
+    service.refresh_aggregates()
+
+
+def _next(response) -> str:
+    """Get the URL of the next page from a response's `Link` header."""
+    return re.fullmatch(r'<(.*)>; rel="next"', response.headers["Link"])[1]
+
+
+def test_aggregates_geojson(client: TestClient, network):
+    response = client.get(
+        "/aggregates/",
+        params={"day": "Monday", "period": "AM Peak", "format": "geojson"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "application/geo+json"
+    body = response.json()
+    assert body["type"] == "FeatureCollection"
+    assert [f["id"] for f in body["features"]] == [1, 2]
+    feature = body["features"][0]
+    assert feature["type"] == "Feature"
+    assert feature["geometry"]["type"] == "LineString"
+    assert feature["properties"]["link_id"] == 1
+    assert feature["properties"]["speed"] == 15.0
+    assert "as_geojson" not in feature["properties"]
+
+
+def test_links_geojson_pages(client: TestClient, network):
+    response = client.get("/links/", params={"format": "geojson", "limit": 2})
+
+    assert [f["id"] for f in response.json()["features"]] == [1, 2]
+    response = client.get(_next(response))
+    assert [f["id"] for f in response.json()["features"]] == [3]
+    # A short page is the last one.
+    assert "Link" not in response.headers
+
+
+def test_empty_geojson(client: TestClient, engine):
+    response = client.get("/links/", params={"format": "geojson"})
+
+    assert json.loads(response.text) == {
+        "type": "FeatureCollection",
+        "features": [],
+    }
+    assert "Link" not in response.headers
+
+
+def test_links_ndjson(client: TestClient, network):
+    response = client.get("/links/", params={"format": "ndjson"})
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "application/x-ndjson"
+    assert response.text.endswith("\n")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    # Streams aren't paged, so every link comes back.
+    assert [row["link_id"] for row in rows] == [1, 2, 3]
+    assert rows[0]["road_name"] == "Main St"
+    assert rows[0]["geom"]["type"] == "LineString"
+    assert "Link" not in response.headers
+
+
+def test_aggregates_geojsonseq(client: TestClient, network):
+    response = client.get(
+        "/aggregates/",
+        params={"day": "Monday", "period": "AM Peak", "format": "geojsonseq"},
+    )
+
+    assert response.headers["Content-Type"] == "application/geo+json-seq"
+    records = response.text.split("\x1e")
+    # Each text follows a record separator and ends with a newline.
+    assert records[0] == ""
+    assert all(record.endswith("\n") for record in records[1:])
+    features = [json.loads(record) for record in records[1:]]
+    assert [f["id"] for f in features] == [1, 2]
+    assert features[1]["type"] == "Feature"
+    assert features[1]["properties"]["speed"] == 30.0
+
+
+@pytest.mark.parametrize("format_", ("ndjson", "geojsonseq"))
+def test_streams_honour_limit(client: TestClient, network, format_: str):
+    response = client.get("/links/", params={"format": format_, "limit": 2})
+
+    lines = response.text.replace("\x1e", "").splitlines()
+    assert len(lines) == 2
+
+
+def test_spatial_filter_ndjson(client: TestClient, network):
+    response = client.post(
+        "/aggregates/spatial_filter/",
+        params={"format": "ndjson"},
+        json={
+            "day": 2,
+            "period": 3,
+            "bbox": [-81.5975, 30.2, -81.5955, 30.4],
+        },
+    )
+
+    ids = [json.loads(line)["link_id"] for line in response.text.splitlines()]
+    # Link 3 is in the box, but has no speeds on Monday mornings.
+    assert ids == [2]
@@ -0,0 +1,111 @@
+from decimal import Decimal
+
+import pyarrow as pa
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from tests.data import add_links
+from tests.data import add_records
+from tests.data import MONDAY
+from urban_sdk_homework.modules.traffic.loader import link_rows
+
+
+def _stage(engine, links, records):
+    """Fill the staging tables (as the loader would)."""
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                'INSERT INTO "traffic"."links_load"'
+                '("link_id", "road_name", "length", "geom") '
+                "VALUES (:link_id, 'Side St', 50, 'LINESTRING(0 0,1 1)')"
+            ),
+            [{"link_id": link_id} for link_id in links],
+        )
+        conn.execute(
+            text(
+                'INSERT INTO "traffic"."speed_records_load"'
+                '("link_id", "speed", "day_of_week", "period", "timestamp") '
+                "VALUES (:link_id, :speed, 2, 3, :timestamp)"
+            ),
+            [
+                {"link_id": link_id, "speed": speed, "timestamp": MONDAY}
+                for link_id, speed in records
+            ],
+        )
+
+
+def _link_ids(engine) -> set:
+    """Get the IDs of the links."""
+    with engine.connect() as conn:
+        return set(
+            conn.execute(
+                text('SELECT "link_id" FROM "traffic"."links"')
+            ).scalars()
+        )
+
+
+def _aggregates(engine) -> dict:
+    """Get the average speed of each link from the aggregates."""
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text('SELECT "link_id", "speed" FROM "traffic"."link_aggs"')
+        ).all()
+    return {row.link_id: row.speed for row in rows}
+
+
+def test_replace_data_swaps_in_staging(engine, service):
+    add_links(engine, (1,))
+    add_records(engine, ((1, 10.0),))
+    service.refresh_aggregates()
+
+    service.create_staging()
+    _stage(engine, (2, 3), ((2, 20.0), (2, 30.0), (3, 40.0)))
+    # Nothing changes until the new data is swapped in.
+    assert _link_ids(engine) == {1}
+    assert _aggregates(engine) == {1: 10.0}
+
+    refresh = service.replace_data()
+
+    assert refresh.full and refresh.records == 3
+    assert _link_ids(engine) == {2, 3}
+    assert _aggregates(engine) == {2: 25.0, 3: 40.0}
+    with engine.connect() as conn:
+        assert not conn.execute(
+            text('SELECT to_regclass(\'"traffic"."links_load"\')')
+        ).scalar()
+
+
+def test_failed_replace_keeps_data(engine, service):
+    add_links(engine, (1,))
+    add_records(engine, ((1, 10.0),))
+    service.refresh_aggregates()
+
+    service.create_staging()
+    # This record refers to a link that isn't being loaded.
+    _stage(engine, (2,), ((4, 20.0),))
+    with pytest.raises(IntegrityError):
+        service.replace_data()
+
+    assert _link_ids(engine) == {1}
+    assert _aggregates(engine) == {1: 10.0}
+
+
+def test_link_lengths_keep_their_digits():
+    batch = pa.RecordBatch.from_pydict(
+        {
+            "link_id": [1, 2],
+            "road_name": ["Main St", None],
+            "_length": [214.248, None],
+            "geo_json": [
+                '{"type": "MultiLineString", '
+                '"coordinates": [[[-81.6, 30.3], [-81.5, 30.3]]]}'
+            ]
+            * 2,
+        }
+    )
+
+    rows = link_rows(batch)
+
+    # (Copied as floats, the lengths would pick up binary noise.)
+    assert [row[2] for row in rows] == [Decimal("214.248"), None]
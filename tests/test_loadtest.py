@@ -0,0 +1,109 @@
+from collections import Counter
+
+import pytest
+from fastapi.testclient import TestClient
+
+from tests.data import add_links
+from tests.data import add_records
+from urban_sdk_homework.modules.api.loadtest import _summarize
+from urban_sdk_homework.modules.api.loadtest import parse_mix
+from urban_sdk_homework.modules.api.loadtest import ROUTES
+from urban_sdk_homework.modules.api.loadtest import Sampler
+
+#: This mix includes every kind of request.
+EVERYTHING = {kind: 1 for kind in ROUTES}
+
+
+def test_parse_mix():
+    assert parse_mix(" aggregates=4, link=3,,bbox ") == {
+        "aggregates": 4,
+        "link": 3,
+        "bbox": 1,
+    }
+    assert parse_mix("link=0,profile=2") == {"link": 0, "profile": 2}
+
+
+@pytest.mark.parametrize(
+    "text", ("", "link=0", "tiles=1", "link=-1", "link=x", "link=1,=2")
+)
+def test_parse_mix_rejects_bad_mixes(text: str):
+    with pytest.raises(ValueError):
+        parse_mix(text)
+
+
+def test_sampler_follows_the_mix():
+    sample = Sampler({"link": 3, "bbox": 1, "profile": 0}, (7,), seed=1)
+
+    routes = Counter(sample().route for _ in range(4000))
+
+    assert set(routes) == {ROUTES["link"], ROUTES["bbox"]}
+    assert 2.5 < routes[ROUTES["link"]] / routes[ROUTES["bbox"]] < 3.5
+
+
+def test_sampler_is_repeatable():
+    first = Sampler(EVERYTHING, (1, 2, 3), seed=42)
+    second = Sampler(EVERYTHING, (1, 2, 3), seed=42)
+
+    assert [first() for _ in range(50)] == [second() for _ in range(50)]
+
+
+def test_sampler_boxes_stay_in_the_extent():
+    extent = (-81.8, 30.1, -81.6, 30.3)
+    sample = Sampler({"bbox": 1}, (), extent=extent, bbox_size=0.05, seed=3)
+
+    for _ in range(200):
+        min_x, min_y, max_x, max_y = sample().json["bbox"]
+        assert max_x - min_x == pytest.approx(0.05)
+        assert max_y - min_y == pytest.approx(0.05)
+        assert extent[0] <= min_x and max_x <= extent[2] + 1e-9
+        assert extent[1] <= min_y and max_y <= extent[3] + 1e-9
+
+
+def test_sampled_requests_succeed(client: TestClient, engine, service):
+    add_links(engine, (1, 2))
+    # Requests are for random days and periods, so there are speeds for
+    # all of them.
+    for day in range(1, 8):
+        for period in range(1, 8):
+            add_records(engine, ((1, 10.0), (2, 20.0)), day, period)
+    service.refresh_aggregates()
+    # Draw boxes around the links (so they aren't all empty).
+    sample = Sampler(
+        EVERYTHING,
+        (1, 2),
+        extent=(-81.6, 30.29, -81.59, 30.31),
+        bbox_size=0.01,
+        seed=5,
+    )
+
+    for request in (sample() for _ in range(40)):
+        response = client.request(
+            request.method,
+            request.url,
+            params=request.params,
+            json=request.json,
+            follow_redirects=False,
+        )
+        assert response.is_success, request
+
+
+def test_summarize():
+    latencies = [n / 1000 for n in range(1, 101)]
+
+    route = _summarize("GET /link/{link_id}", latencies, errors=5, seconds=10)
+
+    assert route.requests == 105
+    assert route.errors == 5
+    assert route.throughput == 10.5
+    assert route.p50 == 50.5
+    assert route.p95 == 95.05
+    assert route.p99 == 99.01
+    assert route.max == 100.0
+
+
+def test_summarize_without_successes():
+    route = _summarize("Total", [], errors=3, seconds=0)
+
+    assert route.requests == 3
+    assert route.throughput == 0.0
+    assert route.p50 is None and route.max is None
@@ -0,0 +1,128 @@
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+from tests.data import add_links
+from urban_sdk_homework.core.metrics import CONTENT_TYPE
+from urban_sdk_homework.core.metrics import Histogram
+from urban_sdk_homework.core.metrics import Registry
+
+
+def _sample(text: str, name: str) -> float:
+    """Get a sample's value from metrics in the text exposition format."""
+    match = re.search(rf"^{re.escape(name)} (\S+)$", text, re.MULTILINE)
+    assert match, f"{name} is missing"
+    return float(match[1])
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram(buckets=(1.0, 0.5))
+    for value in (0.25, 0.5, 0.75, 2.0):
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+
+    # The bounds are sorted, and a value on a bound falls in its bucket.
+    assert [(b.le, b.count) for b in snapshot.buckets] == [
+        (0.5, 2),
+        (1.0, 3),
+        (None, 4),
+    ]
+    assert snapshot.count == 4
+    assert snapshot.sum == 3.5
+
+
+def test_render_counters_and_gauges():
+    registry = Registry()
+    requests = registry.counter(
+        "requests_total", "Requests.", labels=("method",)
+    )
+    requests.labels("POST").inc()
+    requests.labels("GET").inc(2)
+    in_flight = registry.gauge("in_flight", "Requests being handled.")
+    in_flight.labels().inc(3)
+    in_flight.labels().dec()
+
+    assert registry.render() == (
+        "# HELP in_flight Requests being handled.\n"
+        "# TYPE in_flight gauge\n"
+        "in_flight 2\n"
+        "# HELP requests_total Requests.\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{method="GET"} 2\n'
+        'requests_total{method="POST"} 1\n'
+    )
+
+
+def test_render_histogram():
+    registry = Registry()
+    family = registry.histogram(
+        "seconds", "Time.", labels=("route",), buckets=(0.5,)
+    )
+    family.labels("/things").observe(0.25)
+    family.labels("/things").observe(1.5)
+
+    assert registry.render().splitlines()[2:] == [
+        'seconds_bucket{route="/things",le="0.5"} 1',
+        'seconds_bucket{route="/things",le="+Inf"} 2',
+        'seconds_sum{route="/things"} 1.75',
+        'seconds_count{route="/things"} 2',
+    ]
+
+
+def test_render_escapes_labels_and_help():
+    registry = Registry()
+    family = registry.counter("things_total", 'A "thing"\\\n', ("name",))
+    family.labels('say "hi"\n').inc()
+
+    assert registry.render().splitlines() == [
+        '# HELP things_total A "thing"\\\\\\n',
+        "# TYPE things_total counter",
+        'things_total{name="say \\"hi\\"\\n"} 1',
+    ]
+
+
+def test_families_are_registered_once():
+    registry = Registry()
+
+    first = registry.counter("things_total", "Things.")
+    second = registry.counter("things_total", "Other things.")
+
+    assert second is first
+
+
+def test_labels_must_match_names():
+    family = Registry().counter("things_total", "Things.", ("a", "b"))
+
+    with pytest.raises(ValueError):
+        family.labels("a")
+
+
+def test_metrics_endpoint(client: TestClient, engine):
+    add_links(engine, (1,))
+    client.get("/link/1")
+    client.get("/nowhere")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == CONTENT_TYPE
+    text = response.text
+    # Requests are labelled with the route's template, not the path.
+    route = 'method="GET",route="/link/{link_id}",status="200"'
+    assert _sample(text, f"http_request_duration_seconds_count{{{route}}}")
+    assert _sample(
+        text,
+        'http_request_duration_seconds_count{method="GET",'
+        'route="unmatched",status="404"}',
+    )
+    assert _sample(
+        text,
+        'http_response_size_bytes_sum{method="GET",route="/link/{link_id}"}',
+    )
+    # The only request in flight is this one.
+    assert _sample(text, "http_requests_in_flight") == 1
+    assert _sample(
+        text, 'db_statement_duration_seconds_count{method="get_links"}'
+    )
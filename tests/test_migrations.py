@@ -0,0 +1,98 @@
+from datetime import datetime
+from datetime import timezone
+
+from sqlalchemy import text
+
+from urban_sdk_homework.modules.db.migrations import MIGRATIONS
+
+
+def test_first_migration_adopts_etl_speed_records(engine):
+    with engine.connect() as conn:
+        with conn.begin() as transaction:
+            # This is how the old `etl.sql` made the table.
+            conn.execute(text('DROP TABLE "traffic"."speed_records" CASCADE'))
+            conn.execute(
+                text(
+                    'CREATE TABLE "traffic"."speed_records"('
+                    '"id" SERIAL PRIMARY KEY, '
+                    '"link_id" BIGINT, '
+                    '"speed" DOUBLE PRECISION, '
+                    '"day_of_week" SMALLINT, '
+                    '"period" SMALLINT, '
+                    '"timestamp" TIMESTAMPTZ)'
+                )
+            )
+            conn.execute(
+                text(
+                    "CREATE INDEX idx_speed_records_link_id "
+                    'ON "traffic"."speed_records"("link_id")'
+                )
+            )
+            conn.execute(
+                text(
+                    'INSERT INTO "traffic"."speed_records"'
+                    '("speed", "timestamp") VALUES (:speed, :timestamp)'
+                ),
+                [
+                    {
+                        "speed": 10.0,
+                        "timestamp": datetime(2024, 1, 8, tzinfo=timezone.utc),
+                    },
+                    {
+                        "speed": 20.0,
+                        "timestamp": datetime(2024, 2, 8, tzinfo=timezone.utc),
+                    },
+                ],
+            )
+
+            for statement in MIGRATIONS[0].statements:
+                conn.execute(text(statement))
+
+            partitions = set(
+                conn.execute(
+                    text(
+                        "SELECT relid::TEXT FROM pg_partition_tree("
+                        '\'"traffic"."speed_records"\') WHERE level > 0'
+                    )
+                ).scalars()
+            )
+            assert partitions == {
+                "traffic.speed_records_default",
+                "traffic.speed_records_2024_01",
+                "traffic.speed_records_2024_02",
+            }
+            assert conn.execute(
+                text(
+                    'SELECT "id", "speed" FROM "traffic"."speed_records" '
+                    'ORDER BY "id"'
+                )
+            ).all() == [(1, 10.0), (2, 20.0)]
+            # New records carry on from the old IDs.
+            assert (
+                conn.execute(
+                    text(
+                        'INSERT INTO "traffic"."speed_records"("timestamp") '
+                        'VALUES (NOW()) RETURNING "id"'
+                    )
+                ).scalar_one()
+                == 3
+            )
+            # The index was made for the partitioned table (rather than
+            # skipped because the old table had one by the same name).
+            assert (
+                conn.execute(
+                    text(
+                        "SELECT indrelid::REGCLASS::TEXT FROM pg_index "
+                        "WHERE indexrelid = "
+                        '\'"traffic"."idx_speed_records_link_id"\''
+                        "::REGCLASS"
+                    )
+                ).scalar_one()
+                == "traffic.speed_records"
+            )
+            assert not conn.execute(
+                text(
+                    'SELECT to_regclass(\'"traffic"."speed_records_legacy"\')'
+                )
+            ).scalar()
+            transaction.rollback()
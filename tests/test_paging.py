@@ -0,0 +1,17 @@
+import asyncio
+
+import pytest
+
+from urban_sdk_homework.core.pagination import encode_cursor
+from urban_sdk_homework.core.pagination import InvalidCursorException
+from urban_sdk_homework.modules.traffic.api.dependencies import paging
+
+
+def test_paging_decodes_cursor():
+    assert asyncio.run(paging(cursor=encode_cursor(42), limit=5)).after == 42
+
+
+@pytest.mark.parametrize("key", (True, False, "42", 4.2, [42]))
+def test_paging_rejects_non_integer_cursors(key):
+    with pytest.raises(InvalidCursorException):
+        asyncio.run(paging(cursor=encode_cursor(key), limit=5))
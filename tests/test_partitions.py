@@ -0,0 +1,66 @@
+from datetime import date
+from datetime import datetime
+from datetime import timezone
+
+import pytest
+from sqlalchemy import text
+
+from tests.data import add_links
+from tests.data import add_records
+from urban_sdk_homework.modules.traffic.errors import (
+    PartitionDetachedException,
+)
+
+
+def _counts(engine) -> dict:
+    """Count the speed records in each partition."""
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text(
+                'SELECT tableoid::REGCLASS::TEXT AS "partition", COUNT(*) '
+                'FROM "traffic"."speed_records" GROUP BY 1'
+            )
+        ).all()
+    return dict(rows)
+
+
+@pytest.fixture
+def months(engine):
+    """Drop the partitions (and detached tables) the tests make."""
+    yield
+    with engine.begin() as conn:
+        for name in ("speed_records_2023_03", "speed_records_2023_04"):
+            conn.execute(text(f'DROP TABLE IF EXISTS "traffic"."{name}"'))
+
+
+def test_create_partition_moves_default_records(engine, service, months):
+    time = datetime(2023, 3, 6, 8, tzinfo=timezone.utc)
+    add_links(engine, (1,))
+    add_records(engine, ((1, 10.0), (1, 20.0)), timestamp=time)
+    assert _counts(engine) == {"traffic.speed_records_default": 2}
+
+    names = service.create_partitions(time, time)
+
+    assert names == ("speed_records_2023_03",)
+    assert _counts(engine) == {"traffic.speed_records_2023_03": 2}
+    # The partition is a real one: new records for the month land in it.
+    add_records(engine, ((1, 30.0),), timestamp=time)
+    assert _counts(engine) == {"traffic.speed_records_2023_03": 3}
+
+
+def test_create_partition_refuses_detached_table(engine, service, months):
+    time = datetime(2023, 4, 3, 8, tzinfo=timezone.utc)
+    service.create_partitions(time, time)
+    service.detach_partition(date(2023, 4, 1))
+    try:
+        with pytest.raises(PartitionDetachedException):
+            service.create_partitions(time, time)
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text('DROP TABLE "traffic"."speed_records_2023_04"'))
+
+    # Once the detached table is gone, the month can be reloaded.
+    add_links(engine, (1,))
+    add_records(engine, ((1, 10.0),), timestamp=time)
+    service.create_partitions(time, time)
+    assert _counts(engine) == {"traffic.speed_records_2023_04": 1}
@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from tests.data import add_links
+from tests.data import add_records
+from tests.data import MONDAY
+
+
+def test_windowed_percentiles_match_window(engine, service):
+    add_links(engine, (1,))
+    add_records(engine, ((1, 10.0),) * 3, timestamp=MONDAY)
+    add_records(engine, ((1, 40.0),) * 3, timestamp=MONDAY + timedelta(7))
+    service.refresh_aggregates()
+
+    (everything,) = service.get_aggregates(day=2, period=3, percentiles=[90])
+    (windowed,) = service.get_aggregates(
+        day=2, period=3, end=MONDAY + timedelta(1), percentiles=[90]
+    )
+
+    assert everything.speed == 25.0
+    assert everything.percentiles["p90"] > 40.0
+    assert windowed.speed == 10.0
+    # Only the records in the window count.
+    assert abs(windowed.percentiles["p90"] - 10.0) <= 0.5
@@ -0,0 +1,53 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from tests.data import add_links
+from tests.data import add_records
+
+
+@pytest.fixture
+def network(engine, service):
+    """Two links, one with speeds on Monday mornings and Friday evenings."""
+    add_links(engine, (1, 2))
+    add_records(engine, ((1, 10.0), (1, 20.0)))
+    add_records(engine, ((1, 40.0),), day=6, period=6)
+    service.refresh_aggregates()
+
+
+def test_profile(client: TestClient, network):
+    response = client.get("/aggregates/1/profile")
+
+    assert response.status_code == 200
+    profile = response.json()
+    assert profile["link_id"] == 1
+    assert profile["days"][0] == "Sunday"
+    assert profile["periods"][0] == "Overnight"
+    speeds = profile["speeds"]
+    assert len(speeds) == 7 and all(len(row) == 7 for row in speeds)
+    # Rows are days and columns are periods.
+    assert speeds[1][2] == 15.0
+    assert speeds[5][5] == 40.0
+    assert sum(speed is not None for row in speeds for speed in row) == 2
+
+
+def test_profile_without_speeds(client: TestClient, network):
+    speeds = client.get("/aggregates/2/profile").json()["speeds"]
+
+    assert speeds == [[None] * 7] * 7
+
+
+def test_profile_of_missing_link(client: TestClient, network):
+    response = client.get("/aggregates/3/profile")
+
+    assert response.status_code == 404
+
+
+def test_profile_batch(client: TestClient, network):
+    response = client.post(
+        "/aggregates/profiles", json={"link_ids": [2, 3, 1]}
+    )
+
+    batch = response.json()
+    assert [p["link_id"] for p in batch["profiles"]] == [2, 1]
+    assert batch["profiles"][1]["speeds"][1][2] == 15.0
+    assert batch["missing"] == [3]
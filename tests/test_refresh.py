@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+
+from tests.data import add_links
+from tests.data import add_records
+
+
+def _aggregates(engine) -> dict:
+    """Get the materialized aggregates (by link ID)."""
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text(
+                'SELECT "link_id", "speed", "count", "min_speed", '
+                '"max_speed" FROM "traffic"."link_aggs"'
+            )
+        ).all()
+    return {row.link_id: row for row in rows}
+
+
+def _averages(engine) -> dict:
+    """Get the average speed of each link straight from the records."""
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text(
+                'SELECT "link_id", AVG("speed") AS "speed" '
+                'FROM "traffic"."speed_records" GROUP BY "link_id"'
+            )
+        ).all()
+    return {row.link_id: row.speed for row in rows}
+
+
+def test_refresh_skips_null_speeds(engine, service):
+    add_links(engine, (1, 2))
+    add_records(engine, ((1, 10.0), (1, 20.0), (1, None), (2, None)))
+
+    refresh = service.refresh_aggregates()
+
+    assert refresh.records == 4
+    aggregates = _aggregates(engine)
+    # A link with only null speeds has no average (rather than failing the
+    # refresh).
+    assert set(aggregates) == {1}
+    assert aggregates[1].speed == 15.0
+    assert aggregates[1].count == 2
+    assert (aggregates[1].min_speed, aggregates[1].max_speed) == (10.0, 20.0)
+
+    # Merging more records (some null) still matches `AVG`.
+    add_records(engine, ((1, 30.0), (1, None), (2, 40.0)))
+    service.refresh_aggregates()
+
+    aggregates = _aggregates(engine)
+    averages = _averages(engine)
+    assert {k: v.speed for k, v in aggregates.items()} == averages
+    assert aggregates[1].count == 3
+    assert aggregates[2].count == 1
+
+
+def test_full_refresh_matches_incremental(engine, service):
+    add_links(engine, (1,))
+    add_records(engine, ((1, 12.5), (1, None)))
+    service.refresh_aggregates()
+    add_records(engine, ((1, 17.5),))
+    service.refresh_aggregates()
+    incremental = _aggregates(engine)
+
+    service.refresh_aggregates(full=True)
+
+    assert _aggregates(engine) == incremental
+
+
+def test_concurrent_refreshes_merge_records_once(engine, service):
+    add_links(engine, (1,))
+    add_records(engine, ((1, 10.0), (1, 20.0)))
+
+    # Neither refresh finds a state row, so both would create one.
+    with ThreadPoolExecutor(2) as pool:
+        refreshes = list(
+            pool.map(lambda _: service.refresh_aggregates(), range(2))
+        )
+
+    assert sorted(refresh.records for refresh in refreshes) == [0, 2]
+    assert _aggregates(engine)[1].count == 2
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from tests.data import add_links
+from tests.data import add_records
+from urban_sdk_homework.modules.traffic.models import Engine
+from urban_sdk_homework.modules.traffic.services import AsyncTrafficService
+from urban_sdk_homework.modules.traffic.services import TrafficService
+
+
+def _call(service, name: str, **kwargs):
+    """Call a service method, whether it's synchronous or not."""
+    result = getattr(service, name)(**kwargs)
+    if asyncio.iscoroutine(result):
+        return asyncio.run(result)
+    return result
+
+
+@pytest.fixture
+def network(engine, service):
+    """Three links, two with speeds on a Monday morning."""
+    add_links(engine, (1, 2, 3))
+    add_records(engine, ((1, 10.0), (1, 20.0), (2, 30.0)))
+    service.refresh_aggregates()
+
+
+@pytest.fixture(params=(TrafficService, AsyncTrafficService))
+def services(request, network):
+    """A traffic service of each kind."""
+    return request.param()
+
+
+@pytest.mark.parametrize("engine_", (Engine.SQL, Engine.NUMPY))
+def test_aggregates(monkeypatch, network, engine_: Engine):
+    monkeypatch.setenv("urban_sdk_homework__traffic__engine", engine_.value)
+
+    aggregates = {
+        cls: _call(cls(), "get_aggregates", day=2, period=3)
+        for cls in (TrafficService, AsyncTrafficService)
+    }
+
+    assert aggregates[TrafficService] == aggregates[AsyncTrafficService]
+    assert [(a.link_id, a.speed) for a in aggregates[TrafficService]] == [
+        (1, 15.0),
+        (2, 30.0),
+    ]
+
+
+def test_link_batch(services):
+    batch = _call(services, "get_link_batch", link_ids=[3, 1, 4, 3])
+
+    assert [link.link_id for link in batch.links] == [3, 1]
+    assert batch.missing == [4]
+
+
+def test_data_version(services, engine):
+    assert _call(services, "data_version") == 1
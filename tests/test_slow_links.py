@@ -0,0 +1,52 @@
+import pytest
+from sqlalchemy import Engine
+
+from tests.data import add_links
+from tests.data import add_records
+from urban_sdk_homework.modules.traffic import queries
+from urban_sdk_homework.modules.traffic.columnar import SpeedColumns
+
+
+def _slow_links(engine: Engine, materialized: bool, **params) -> dict:
+    """Get the slow links' speeds (by link ID)."""
+    statement = queries.slow_links(
+        period=3, limit=100, materialized=materialized, **params
+    )
+    with engine.connect() as conn:
+        rows = conn.execute(statement).all()
+    return {row.link_id: row.speed for row in rows}
+
+
+@pytest.fixture
+def network(engine: Engine, service) -> Engine:
+    """Links with a slow (or fast) Monday, Tuesday and Wednesday."""
+    add_links(engine, (1, 2, 3))
+    for day in (2, 3, 4):
+        # Link 1 averages 15 each day, though some records are fast; link 2
+        # has a slow record each day, though it averages 32.5; link 3 is slow
+        # on Monday only.
+        add_records(engine, ((1, 10.0), (1, 20.0), (1, 30.0)), day=day)
+        add_records(engine, ((2, 15.0), (2, 50.0), (2, None)), day=day)
+        add_records(engine, ((3, 10.0 if day == 2 else 40.0),), day=day)
+    service.refresh_aggregates()
+    return engine
+
+
+@pytest.mark.parametrize("materialized", (True, False))
+def test_slow_links_count_slow_days(network: Engine, materialized: bool):
+    slow = _slow_links(network, materialized, threshold=25.0, min_days=3)
+
+    assert slow == {1: 20.0}
+
+
+@pytest.mark.parametrize("min_days", (1, 2, 3, 4))
+def test_slow_links_match_across_engines(network: Engine, min_days: int):
+    raw = _slow_links(network, False, threshold=25.0, min_days=min_days)
+    with network.connect() as conn:
+        rows = conn.execute(queries.speed_columns()).all()
+    ids, speeds = SpeedColumns.from_batches([rows]).slow_links(
+        period=3, threshold=25.0, min_days=min_days
+    )
+
+    assert raw == _slow_links(network, True, threshold=25.0, min_days=min_days)
+    assert raw == pytest.approx(dict(zip(ids.tolist(), speeds.tolist())))
@@ -0,0 +1,81 @@
+from typing import List
+from typing import Tuple
+
+import pytest
+from sqlalchemy import Engine
+
+from tests.data import add_links
+from tests.data import add_records
+from urban_sdk_homework.core.geometry import geojson
+from urban_sdk_homework.modules.traffic import queries
+from urban_sdk_homework.modules.traffic.spatial import LinkIndex
+
+#: These boxes cover some, all or none of the links (including boxes that
+#: only touch a link's end).
+BOXES: Tuple[Tuple[float, float, float, float], ...] = (
+    (-81.6, 30.2, -81.5975, 30.4),
+    (-81.5975, 30.2, -81.5955, 30.4),
+    (-81.594, 30.29, -81.593, 30.31),
+    (-81.7, 30.2, -81.5, 30.4),
+    (-81.7, 30.31, -81.5, 30.4),
+)
+
+
+@pytest.fixture
+def network(engine: Engine, service) -> Engine:
+    """Five links, with speeds for the first three on a Monday morning."""
+    add_links(engine, (1, 2, 3, 4, 5))
+    add_records(engine, ((1, 10.0), (2, 20.0), (3, 30.0)))
+    service.refresh_aggregates()
+    return engine
+
+
+def _sql_within(engine: Engine, bbox) -> List[int]:
+    """Find the links in a bounding box with Postgres."""
+    with engine.connect() as conn:
+        rows = conn.execute(queries.links(bbox=bbox, limit=None)).all()
+    return [row.link_id for row in rows]
+
+
+def _index(engine: Engine) -> LinkIndex:
+    """Build the spatial index of the links."""
+    with engine.connect() as conn:
+        rows = conn.execute(queries.link_geometries()).all()
+    return LinkIndex.from_batches([rows])
+
+
+@pytest.mark.parametrize("bbox", BOXES)
+def test_index_matches_sql(network: Engine, bbox):
+    index = _index(network)
+
+    assert index.query(bbox=bbox).tolist() == _sql_within(network, bbox)
+
+
+@pytest.mark.parametrize("bbox", BOXES)
+def test_service_bbox_matches_sql(network: Engine, service, bbox):
+    links = service.get_links(bbox=bbox, limit=100)
+    aggregates = service.get_aggregates(day=2, period=3, bbox=bbox, limit=100)
+
+    expected = _sql_within(network, bbox)
+    assert [link.link_id for link in links] == expected
+    assert [a.link_id for a in aggregates] == [i for i in expected if i <= 3]
+
+
+def test_index_polygon(network: Engine):
+    # This triangle reaches the middle of link 2 (but not link 3).
+    polygon = geojson.Polygon(
+        coordinates=[
+            [
+                [-81.6, 30.2],
+                [-81.5975, 30.3],
+                [-81.6, 30.4],
+                [-81.6, 30.2],
+            ]
+        ]
+    )
+
+    index = _index(network)
+
+    assert index.query(polygon=polygon).tolist() == [1, 2]
+    assert index.query(bbox=BOXES[1], polygon=polygon).tolist() == [2]
+    assert len(index) == 5
@@ -0,0 +1,85 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from urban_sdk_homework.modules.traffic import synth
+
+#: These are the days of speed records generated.
+DAYS = synth.days(date(2024, 1, 6), date(2024, 1, 8))
+
+
+def _generate(path: Path, network: synth.Network, workers: int) -> Path:
+    """Write a network's files with a number of workers (as the CLI does)."""
+    path.mkdir()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        synth.write(
+            path / "link_info.parquet",
+            synth.LINK_SCHEMA,
+            executor,
+            (
+                (synth.links, (network, first, last))
+                for first, last in network.chunks()
+            ),
+            window=workers * 2,
+        )
+        synth.write(
+            path / "speed_records.parquet",
+            synth.SPEED_RECORD_SCHEMA,
+            executor,
+            (
+                (synth.speed_records, (network, day, first, last))
+                for day in DAYS
+                for first, last in network.chunks()
+            ),
+            window=workers * 2,
+        )
+    return path
+
+
+@pytest.fixture
+def network(monkeypatch) -> synth.Network:
+    """A network made of several chunks."""
+    monkeypatch.setattr(synth, "CHUNK_SIZE", 100)
+    return synth.Network(links=250, seed=7)
+
+
+def test_days():
+    assert DAYS == (date(2024, 1, 6), date(2024, 1, 7), date(2024, 1, 8))
+
+
+def test_chunks(network: synth.Network):
+    assert list(network.chunks()) == [(1, 100), (101, 200), (201, 250)]
+
+
+def test_output_does_not_depend_on_workers(
+    tmp_path: Path, network: synth.Network
+):
+    one = _generate(tmp_path / "one", network, workers=1)
+    three = _generate(tmp_path / "three", network, workers=3)
+
+    for name in ("link_info.parquet", "speed_records.parquet"):
+        assert pq.read_table(one / name).equals(pq.read_table(three / name))
+    records = pq.read_table(one / "speed_records.parquet")
+    assert records.num_rows == 250 * len(DAYS) * 7
+
+
+def test_links_do_not_depend_on_chunks(network: synth.Network):
+    whole = synth.links(network, 1, 250)
+    pieces = pa.concat_tables(
+        [synth.links(network, 1, 120), synth.links(network, 121, 250)]
+    )
+
+    assert whole.equals(pieces)
+
+
+def test_seed_changes_output(network: synth.Network):
+    other = synth.Network(links=network.links, seed=network.seed + 1)
+
+    assert not synth.links(network, 1, 100).equals(synth.links(other, 1, 100))
+    assert not synth.speed_records(network, DAYS[0], 1, 100).equals(
+        synth.speed_records(other, DAYS[0], 1, 100)
+    )
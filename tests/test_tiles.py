@@ -0,0 +1,72 @@
+import math
+from typing import Tuple
+
+import pytest
+from fastapi.testclient import TestClient
+
+from tests.data import add_links
+from tests.data import add_records
+from urban_sdk_homework.modules.traffic.errors import TileNotFoundException
+from urban_sdk_homework.modules.traffic.services import check_tile
+
+#: This is the zoom level of the tiles we fetch.
+ZOOM = 12
+
+
+def _tile(lon: float, lat: float, z: int) -> Tuple[int, int]:
+    """Get the column and row of the tile that holds a point."""
+    n = 2**z
+    x = (lon + 180) / 360 * n
+    y = (1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n
+    return int(x), int(y)
+
+
+@pytest.mark.parametrize("z, x, y", ((0, 0, 0), (1, 1, 1), (12, 1117, 1691)))
+def test_check_tile_accepts_the_grid(z: int, x: int, y: int):
+    check_tile(z=z, x=x, y=y)
+
+
+@pytest.mark.parametrize(
+    "z, x, y", ((0, 1, 0), (0, 0, 1), (1, 2, 0), (12, 4096, 0), (-1, 0, 0))
+)
+def test_check_tile_rejects_tiles_off_the_grid(z: int, x: int, y: int):
+    with pytest.raises(TileNotFoundException):
+        check_tile(z=z, x=x, y=y)
+
+
+@pytest.fixture
+def network(engine, service):
+    """Two links with speeds on a Monday morning."""
+    add_links(engine, (1, 2))
+    add_records(engine, ((1, 10.0), (2, 30.0)))
+    service.refresh_aggregates()
+
+
+def test_tile(client: TestClient, network):
+    x, y = _tile(-81.5985, 30.3, ZOOM)
+
+    response = client.get(f"/tiles/Monday/AM Peak/{ZOOM}/{x}/{y}.pbf")
+
+    assert response.status_code == 200
+    assert (
+        response.headers["Content-Type"]
+        == "application/vnd.mapbox-vector-tile"
+    )
+    # The layer and attribute names are written into the tile as strings.
+    for name in (b"links", b"link_id", b"road_name", b"speed"):
+        assert name in response.content
+
+
+def test_tile_without_links_is_empty(client: TestClient, network):
+    x, y = _tile(-81.5985, 30.3, ZOOM)
+
+    response = client.get(f"/tiles/Monday/AM Peak/{ZOOM}/{x + 2}/{y}.pbf")
+
+    assert response.status_code == 200
+    assert response.content == b""
+
+
+def test_tile_off_the_grid_is_not_found(client: TestClient, network):
+    response = client.get(f"/tiles/Monday/AM Peak/{ZOOM}/{2**ZOOM}/0.pbf")
+
+    assert response.status_code == 404
@@ -0,0 +1,99 @@
+import asyncio
+import re
+
+from fastapi.testclient import TestClient
+
+from tests.data import add_links
+from urban_sdk_homework.core import timing
+
+
+def _phases(header: str) -> dict:
+    """Parse a `Server-Timing` header into durations by name."""
+    metrics = (metric.split(";dur=") for metric in header.split(", "))
+    return {name: float(dur) for name, dur in metrics}
+
+
+def test_header_lists_known_phases_first():
+    timings = timing.Timings()
+    timings.add("validate", 0.002)
+    timings.add("db", 0.001)
+    timings.add("db", 0.001)
+    timings.add("cache", 0.0005)
+
+    header = timings.header()
+
+    assert re.fullmatch(
+        r"db;dur=2\.000, validate;dur=2\.000, cache;dur=0\.500, "
+        r"total;dur=\d+\.\d{3}",
+        header,
+    )
+
+
+def test_nothing_is_recorded_outside_a_request():
+    assert timing.current() is None
+    with timing.phase("decode"):
+        pass
+    timing.record("db", 1.0)
+
+    assert timing.current() is None
+
+
+def test_phases_add_up():
+    with timing.collecting() as timings:
+        assert timing.current() is timings
+        with timing.phase("decode"):
+            pass
+        timing.record("db", 0.25)
+        timing.record("db", 0.5)
+
+    assert timing.current() is None
+    phases = _phases(timings.header())
+    assert phases["db"] == 750.0
+    assert phases["decode"] >= 0
+
+
+def test_timings_follow_the_request_into_threads():
+    async def handle():
+        with timing.collecting() as timings:
+            await asyncio.to_thread(timing.record, "db", 0.001)
+        return timings
+
+    timings = asyncio.run(handle())
+
+    assert _phases(timings.header())["db"] == 1.0
+
+
+def test_returns_notes_when_the_endpoint_returns():
+    def endpoint():
+        return 1
+
+    async def async_endpoint():
+        return 2
+
+    with timing.collecting() as timings:
+        assert timing.returns(endpoint)() == 1
+        returned = timings.returned
+        assert asyncio.run(timing.returns(async_endpoint)()) == 2
+
+    assert returned is not None
+    assert timings.returned >= returned
+
+
+def test_server_timing_header(client: TestClient, engine):
+    add_links(engine, (1,))
+
+    response = client.get("/link/1")
+
+    phases = _phases(response.headers["Server-Timing"])
+    assert list(phases)[0] == "db"
+    assert {"serialize", "total"} <= set(phases)
+    assert phases["total"] >= phases["db"]
+
+
+def test_server_timing_header_on_streams(client: TestClient, engine):
+    add_links(engine, (1,))
+
+    response = client.get("/links/", params={"format": "ndjson"})
+
+    # The header is sent before the rows are read.
+    assert "total" in _phases(response.headers["Server-Timing"])
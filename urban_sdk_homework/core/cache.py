@@ -0,0 +1,233 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+from typing import Callable
+from typing import Generic
+from typing import Hashable
+from typing import Optional
+from typing import Tuple
+from typing import TypeVar
+
+from pydantic import BaseModel as PydanticBaseModel
+from pydantic import Field
+
+from urban_sdk_homework.core.models import BaseModel
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+#: This is the number of items of a sequence that are measured to estimate
+#: the size of the whole sequence.
+SIZE_SAMPLE = 8
+
+
+class CacheStats(BaseModel):
+    """Cache statistics."""
+
+    size: int = Field(description="This is the number of cached items.")
+    maxsize: int = Field(
+        description="This is the maximum number of cached items."
+    )
+    ttl: Optional[float] = Field(
+        description=(
+            "This is the number of seconds an item stays cached (if items "
+            "expire)."
+        )
+    )
+    hits: int = Field(
+        description="This is the number of lookups that found an item."
+    )
+    misses: int = Field(
+        description="This is the number of lookups that didn't find an item."
+    )
+    evictions: int = Field(
+        description=(
+            "This is the number of items removed to make room for others."
+        )
+    )
+    nbytes: Optional[int] = Field(
+        default=None,
+        description=(
+            "This is the approximate size (in bytes) of the cached items (if "
+            "the cache is bounded by size)."
+        ),
+    )
+    maxbytes: Optional[int] = Field(
+        default=None,
+        description=(
+            "This is the approximate size (in bytes) the cached items may "
+            "take up (if the cache is bounded by size)."
+        ),
+    )
+
+
+class LRUCache(Generic[K, V]):
+    """
+    A bounded cache that evicts the least recently used item when it's full.
+
+    Items may also expire after a fixed time, and the cache may be bounded
+    by the (approximate) size of its items as well as their number.  The
+    cache is safe to use from multiple threads.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: Optional[float] = None,
+        maxbytes: Optional[int] = None,
+        sizeof: Callable[[V], int] = None,
+    ):
+        """
+        Create a new instance.
+
+        :param maxsize: the maximum number of items (If it's zero, nothing
+            is cached.)
+        :param ttl: the number of seconds an item stays cached (or `None` if
+            items don't expire)
+        :param maxbytes: the approximate size (in bytes) the items may take
+            up (or `None` if only their number is bounded).  Items larger
+            than this aren't cached.
+        :param sizeof: estimates the size of an item (in bytes)
+            (:py:func:`estimate_size` by default)
+        """
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._maxbytes = maxbytes
+        self._sizeof = sizeof or estimate_size
+        # Each item is stored with the (monotonic) time at which it expires
+        # and its size.
+        self._items: OrderedDict[K, Tuple[float, int, V]] = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def maxsize(self) -> int:
+        """Get the maximum number of items."""
+        return self._maxsize
+
+    @property
+    def ttl(self) -> Optional[float]:
+        """Get the number of seconds an item stays cached."""
+        return self._ttl
+
+    @property
+    def maxbytes(self) -> Optional[int]:
+        """Get the approximate size (in bytes) the items may take up."""
+        return self._maxbytes
+
+    def get(self, key: K, default: Any = None) -> Optional[V]:
+        """
+        Get an item (and mark it as the most recently used).
+
+        :param key: the item's key
+        :param default: the value to return if the item isn't cached
+        """
+        with self._lock:
+            try:
+                expires, _, value = self._items[key]
+            except KeyError:
+                self._misses += 1
+                return default
+            if expires <= time.monotonic():
+                self._remove(key)
+                self._misses += 1
+                return default
+            self._items.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: K, value: V):
+        """
+        Add an item, evicting the least recently used items if the cache is
+        full.
+
+        :param key: the item's key
+        :param value: the item
+        """
+        if self._maxsize <= 0:
+            return
+        size = self._sizeof(value) if self._maxbytes is not None else 0
+        if self._maxbytes is not None and size > self._maxbytes:
+            # It would push everything else out (and still not fit).
+            return
+        expires = (
+            time.monotonic() + self._ttl
+            if self._ttl is not None
+            else float("inf")
+        )
+        with self._lock:
+            self._remove(key)
+            self._items[key] = (expires, size, value)
+            self._nbytes += size
+            while len(self._items) > self._maxsize or (
+                self._maxbytes is not None and self._nbytes > self._maxbytes
+            ):
+                self._remove(next(iter(self._items)))
+                self._evictions += 1
+
+    def _remove(self, key: K):
+        """
+        Remove an item (if it's cached).  The caller holds the lock.
+
+        :param key: the item's key
+        """
+        item = self._items.pop(key, None)
+        if item is not None:
+            self._nbytes -= item[1]
+
+    def clear(self):
+        """Remove all items."""
+        with self._lock:
+            self._items.clear()
+            self._nbytes = 0
+
+    def stats(self) -> CacheStats:
+        """Get cache statistics."""
+        with self._lock:
+            return CacheStats(
+                size=len(self._items),
+                maxsize=self._maxsize,
+                ttl=self._ttl,
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                nbytes=self._nbytes if self._maxbytes is not None else None,
+                maxbytes=self._maxbytes,
+            )
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: K) -> bool:
+        item = self._items.get(key)
+        return item is not None and item[0] > time.monotonic()
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Estimate how much memory a cached value takes up (in bytes).
+
+    Models are measured by the size of their JSON, and sequences by a
+    sample of their items, so even large results are cheap to measure.
+    The estimate is rough; it's meant for budgeting, not accounting.
+
+    :param value: the value
+    """
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        if not value:
+            return sys.getsizeof(value)
+        step = max(len(value) // SIZE_SAMPLE, 1)
+        sample = value[::step][:SIZE_SAMPLE]
+        return sys.getsizeof(value) + sum(
+            estimate_size(item) for item in sample
+        ) * len(value) // len(sample)
+    if isinstance(value, PydanticBaseModel):
+        return len(value.model_dump_json())
+    return sys.getsizeof(value)
@@ -1,3 +1,4 @@
+import hashlib
 import importlib
 import inspect
 import re
@@ -5,13 +6,24 @@ import weakref
 from collections import defaultdict
 from functools import wraps
 from typing import Any
+from typing import Awaitable
 from typing import Callable
+from typing import get_origin
 from typing import Iterable
+from typing import Optional
 
+import orjson
 from fastapi import APIRouter as FastAPIRouter
+from fastapi import Request
+from fastapi import Response
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
 from fastapi.types import DecoratedCallable
+from pydantic import TypeAdapter
 
 from urban_sdk_homework.core import strings
+from urban_sdk_homework.core import timing
 from urban_sdk_homework.core.modules import load_submodules
 
 
@@ -27,7 +39,14 @@ class APIRouter(FastAPIRouter):
     __refs__ = defaultdict(list)
 
     # @wraps(FastAPIRouter.__init__)
-    def __init__(self, *args, enabled: bool = True, **kwargs):
+    def __init__(
+        self,
+        *args,
+        enabled: bool = True,
+        warm_up: Callable[[], Awaitable[None]] = None,
+        **kwargs,
+    ):
+        kwargs.setdefault("route_class", TimedRoute)
         super().__init__(*args, **kwargs)
         # Update the prefix and tags properties (if necessary).
         frame = inspect.currentframe()
@@ -42,6 +61,7 @@ class APIRouter(FastAPIRouter):
                 self._infer_attrs(modname=mod.__name__)
 
         self._enabled = enabled
+        self._warm_up = warm_up
         # Keep a reference to the instance.
         self.__refs__[self.__class__].append(weakref.ref(self))
 
@@ -50,6 +70,14 @@ class APIRouter(FastAPIRouter):
         """Indicates that the router is enabled."""
         return self._enabled
 
+    async def warm_up(self):
+        """
+        Prepare the router's services (for example, by opening database
+        connections) before the application starts taking requests.
+        """
+        if self._warm_up is not None:
+            await self._warm_up()
+
     def _infer_attrs(self, modname: str):
         """Infer this routers' prefix."""
         # If all the values we would infer are already set, there's nothingg
@@ -108,3 +136,243 @@ class APIRouter(FastAPIRouter):
         return super().api_route(
             path, include_in_schema=include_in_schema, **kwargs
         )
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    A JSON response encoded with orjson.
+
+    Content that has already been encoded (as `bytes`) is sent as it is.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return orjson.dumps(
+            content,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        )
+
+
+class TimedRoute(APIRoute):
+    """
+    A route that notes when its endpoint returns, so the time spent
+    validating and serializing the response can be reported.
+
+    If the route's response class is a :py:class:`FastJSONResponse`, what the
+    endpoint returns is encoded directly by the response model's serializer.
+    (FastAPI would otherwise dump it, validate it all over again and then
+    encode it, though our services only return models they've validated.)
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs: Any):
+        endpoint_ = timing.returns(endpoint)
+        response_class = _value(kwargs.get("response_class"))
+        response_model = _value(kwargs.get("response_model"))
+        if (
+            isinstance(response_class, type)
+            and issubclass(response_class, FastJSONResponse)
+            and response_model is not None
+            # We don't support picking fields (and nothing uses it).
+            and _value(kwargs.get("response_model_include")) is None
+            and _value(kwargs.get("response_model_exclude")) is None
+        ):
+            endpoint_ = _encodes(
+                endpoint_,
+                encode=json_serializer(
+                    response_model,
+                    by_alias=kwargs.get("response_model_by_alias", True),
+                    exclude_unset=kwargs.get(
+                        "response_model_exclude_unset", False
+                    ),
+                    exclude_defaults=kwargs.get(
+                        "response_model_exclude_defaults", False
+                    ),
+                    exclude_none=kwargs.get(
+                        "response_model_exclude_none", False
+                    ),
+                ),
+                response_class=response_class,
+                status_code=_value(kwargs.get("status_code")) or 200,
+            )
+        super().__init__(path, endpoint_, **kwargs)
+
+
+def json_serializer(
+    response_model: Any,
+    by_alias: bool = True,
+    exclude_unset: bool = False,
+    exclude_defaults: bool = False,
+    exclude_none: bool = False,
+) -> Callable[[Any], bytes]:
+    """
+    Create a function that encodes content as JSON with a response model's
+    serializer (without validating it).
+
+    :param response_model: the response model (like `List[Aggregate]`)
+    :param by_alias: use the fields' aliases
+    :param exclude_unset: leave out fields that weren't set
+    :param exclude_defaults: leave out fields that have their default values
+    :param exclude_none: leave out fields that are `None`
+    """
+    adapter = TypeAdapter(response_model)
+    # Services return tuples, which a list's serializer would warn about
+    # (and encode the slow way).
+    listed = get_origin(response_model) is list
+
+    def serialize(content: Any) -> bytes:
+        if listed and isinstance(content, tuple):
+            content = list(content)
+        return adapter.dump_json(
+            content,
+            by_alias=by_alias,
+            exclude_unset=exclude_unset,
+            exclude_defaults=exclude_defaults,
+            exclude_none=exclude_none,
+        )
+
+    return serialize
+
+
+def _encodes(
+    endpoint: Callable,
+    encode: Callable[[Any], bytes],
+    response_class: type,
+    status_code: int,
+) -> Callable:
+    """
+    Wrap an endpoint so it returns a response with its content encoded.
+
+    :param endpoint: the endpoint (a function or coroutine function)
+    :param encode: encodes the content
+    :param response_class: the response class
+    :param status_code: the response's status code
+    """
+
+    def respond(content: Any, kwargs: dict) -> Response:
+        if isinstance(content, Response):
+            return content
+        response = response_class(encode(content), status_code=status_code)
+        # Since we return a response, FastAPI won't copy the headers (and
+        # status) the endpoint set on the response it was given, so we do.
+        for value in kwargs.values():
+            if isinstance(value, Response):
+                if value.status_code:
+                    response.status_code = value.status_code
+                response.headers.raw.extend(value.headers.raw)
+        return response
+
+    if inspect.iscoroutinefunction(endpoint):
+
+        @wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            return respond(await endpoint(*args, **kwargs), kwargs)
+
+        return async_wrapper
+
+    @wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        return respond(endpoint(*args, **kwargs), kwargs)
+
+    return wrapper
+
+
+def _value(value: Any) -> Any:
+    """
+    Get a route argument's value (even if it's FastAPI's placeholder for a
+    default).
+
+    :param value: the argument
+    """
+    return value.value if isinstance(value, DefaultPlaceholder) else value
+
+
+class ETagRoute(TimedRoute):
+    """
+    A route that supports conditional `GET` requests.
+
+    Successful `GET` responses get a strong `ETag` derived from a version
+    (supplied by subclasses) and the request's path and query parameters.
+    If the request's `If-None-Match` header matches, we answer with
+    `304 Not Modified` before the endpoint runs.  (`If-None-Match: *`
+    matches any current representation, so the endpoint has to run first to
+    show that there is one.)
+    """
+
+    #: This is the `Cache-Control` header value for responses (if any).
+    cache_control: Optional[str] = None
+
+    async def version(self, request: Request) -> Optional[Any]:
+        """
+        Get the version of the data behind a response.
+
+        :param request: the current request
+        :returns: the version (or `None` if the response shouldn't have an
+            `ETag`)
+        """
+        return None
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            # Only `GET` responses can be served from a client's cache.
+            if request.method != "GET":
+                return await handler(request)
+            version = await self.version(request)
+            if version is None:
+                return await handler(request)
+            etag = make_etag(version, request)
+            headers = {"ETag": etag}
+            if self.cache_control:
+                headers["Cache-Control"] = self.cache_control
+            if_none_match = request.headers.get("if-none-match")
+            if etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers=headers)
+            response = await handler(request)
+            if response.status_code == 200 and _wildcard(if_none_match):
+                return Response(status_code=304, headers=headers)
+            if 200 <= response.status_code < 300:
+                response.headers.update(headers)
+            return response
+
+        return route_handler
+
+
+def make_etag(version: Any, request: Request) -> str:
+    """
+    Create a strong entity tag for a response.
+
+    :param version: the version of the data behind the response
+    :param request: the request
+    """
+    # Sort the query parameters so that equivalent URLs get the same tag.
+    query = sorted(request.query_params.multi_items())
+    key = repr((version, request.url.path, query)).encode()
+    return f'"{hashlib.sha256(key).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an `If-None-Match` header against an entity tag.
+
+    `*` doesn't match here: it only matches once we know the resource
+    exists.
+
+    :param if_none_match: the header value
+    :param etag: the entity tag
+    """
+    if not if_none_match:
+        return False
+    # `If-None-Match` uses the weak comparison, so ignore `W/` prefixes.
+    tags = (t.strip().removeprefix("W/") for t in if_none_match.split(","))
+    return etag in tags
+
+
+def _wildcard(if_none_match: Optional[str]) -> bool:
+    """
+    Is an `If-None-Match` header `*`?
+
+    :param if_none_match: the header value
+    """
+    return if_none_match is not None and if_none_match.strip() == "*"
@@ -0,0 +1,377 @@
+import threading
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import Literal
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from pydantic import Field
+
+from urban_sdk_homework.core.models import BaseModel
+
+#: These are the default histogram bucket boundaries (in seconds).
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Bucket(BaseModel):
+    """A histogram bucket."""
+
+    le: Optional[float] = Field(
+        description=(
+            "This is the bucket's upper bound.  (The last bucket has no upper "
+            "bound.)"
+        )
+    )
+    count: int = Field(
+        description=(
+            "This is the number of observations less than or equal to the "
+            "upper bound."
+        )
+    )
+
+
+class HistogramSnapshot(BaseModel):
+    """A point-in-time copy of a histogram."""
+
+    buckets: Tuple[Bucket, ...] = Field(
+        description="These are the cumulative bucket counts."
+    )
+    count: int = Field(description="This is the number of observations.")
+    sum: float = Field(description="This is the sum of all observations.")
+
+
+class Histogram:
+    """
+    A cumulative histogram of observed values.
+
+    The histogram is safe to update from multiple threads.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        Create a new instance.
+
+        :param buckets: the bucket upper bounds
+        """
+        self._bounds = tuple(sorted(buckets)) + (float("inf"),)
+        self._counts = [0] * len(self._bounds)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """
+        Record an observation.
+
+        :param value: the observed value
+        """
+        index = bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += value
+
+    def snapshot(self) -> HistogramSnapshot:
+        """Get a point-in-time copy of the histogram."""
+        with self._lock:
+            counts = tuple(self._counts)
+            count, sum_ = self._count, self._sum
+        # Bucket counts are reported cumulatively.
+        buckets, cumulative = [], 0
+        for le, n in zip(self._bounds, counts):
+            cumulative += n
+            buckets.append(
+                Bucket(le=le if le != float("inf") else None, count=cumulative)
+            )
+        return HistogramSnapshot(buckets=tuple(buckets), count=count, sum=sum_)
+
+
+class Counter:
+    """
+    A count that only goes up.
+
+    The counter is safe to update from multiple threads.
+    """
+
+    def __init__(self):
+        """Create a new instance."""
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        """
+        Increment the count.
+
+        :param amount: the amount to add
+        """
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        """Get the current count."""
+        return self._value
+
+
+class Gauge:
+    """
+    A value that can go up and down.
+
+    The gauge is safe to update from multiple threads.
+    """
+
+    def __init__(self):
+        """Create a new instance."""
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        """
+        Increase the value.
+
+        :param amount: the amount to add
+        """
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        """
+        Decrease the value.
+
+        :param amount: the amount to subtract
+        """
+        self.inc(-amount)
+
+    def set(self, value: float):
+        """
+        Set the value.
+
+        :param value: the new value
+        """
+        with self._lock:
+            self._value = value
+
+    @property
+    def value(self) -> float:
+        """Get the current value."""
+        return self._value
+
+
+#: These are the kinds of metric a family may hold.
+MetricKind = Literal["counter", "gauge", "histogram"]
+
+#: This is the content type of the Prometheus text exposition format.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Family:
+    """
+    A named metric with labels.
+
+    Each distinct set of label values gets its own counter, gauge or
+    histogram, created the first time it's used.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help_: str,
+        kind: MetricKind,
+        labels: Sequence[str] = (),
+        factory: Callable[[], Any] = None,
+    ):
+        """
+        Create a new instance.
+
+        :param name: the metric name
+        :param help_: a description of the metric
+        :param kind: the kind of metric
+        :param labels: the label names
+        :param factory: a function that creates a metric for a new set of
+            label values
+        """
+        self.name = name
+        self.help = help_
+        self.kind = kind
+        self.label_names = tuple(labels)
+        self._factory = factory or {"counter": Counter, "gauge": Gauge}[kind]
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: Any) -> Any:
+        """
+        Get the metric for a set of label values.
+
+        :param values: the label values (in the same order as the names)
+        """
+        key = tuple(str(v) for v in values)
+        if len(key) != len(self.label_names):
+            raise ValueError(
+                f"{self.name} expects the labels {self.label_names}."
+            )
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._factory())
+        return child
+
+    def render(self) -> Iterator[str]:
+        """Render the family in the Prometheus text exposition format."""
+        yield f"# HELP {self.name} {_escape(self.help, quotes=False)}"
+        yield f"# TYPE {self.name} {self.kind}"
+        # Other threads may add children while we render, so we render a
+        # copy.
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in sorted(children):
+            labels = tuple(zip(self.label_names, key))
+            if self.kind != "histogram":
+                yield f"{self.name}{_labels(labels)} {_number(child.value)}"
+                continue
+            snapshot = child.snapshot()
+            for bucket in snapshot.buckets:
+                le = "+Inf" if bucket.le is None else _number(bucket.le)
+                yield (
+                    f"{self.name}_bucket{_labels(labels + (('le', le),))} "
+                    f"{bucket.count}"
+                )
+            yield f"{self.name}_sum{_labels(labels)} {_number(snapshot.sum)}"
+            yield f"{self.name}_count{_labels(labels)} {snapshot.count}"
+
+
+class Registry:
+    """A collection of metric families."""
+
+    def __init__(self):
+        """Create a new instance."""
+        self._families: Dict[str, Family] = {}
+        self._lock = threading.Lock()
+
+    def counter(
+        self, name: str, help_: str, labels: Sequence[str] = ()
+    ) -> Family:
+        """
+        Get (or create) a family of counters.
+
+        :param name: the metric name (which should end with `_total`)
+        :param help_: a description of the metric
+        :param labels: the label names
+        """
+        return self._family(Family(name, help_, "counter", labels))
+
+    def gauge(
+        self, name: str, help_: str, labels: Sequence[str] = ()
+    ) -> Family:
+        """
+        Get (or create) a family of gauges.
+
+        :param name: the metric name
+        :param help_: a description of the metric
+        :param labels: the label names
+        """
+        return self._family(Family(name, help_, "gauge", labels))
+
+    def histogram(
+        self,
+        name: str,
+        help_: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Family:
+        """
+        Get (or create) a family of histograms.
+
+        :param name: the metric name
+        :param help_: a description of the metric
+        :param labels: the label names
+        :param buckets: the bucket upper bounds
+        """
+        return self._family(
+            Family(
+                name,
+                help_,
+                "histogram",
+                labels,
+                factory=lambda: Histogram(buckets),
+            )
+        )
+
+    def _family(self, family: Family) -> Family:
+        """
+        Register a family (unless one with the same name already exists).
+
+        :param family: the family
+        :returns: the registered family
+        """
+        with self._lock:
+            return self._families.setdefault(family.name, family)
+
+    def render(self) -> str:
+        """Render every family in the Prometheus text exposition format."""
+        with self._lock:
+            families = dict(self._families)
+        lines = []
+        for name in sorted(families):
+            lines.extend(families[name].render())
+        return "\n".join(lines) + "\n"
+
+
+@lru_cache(maxsize=1)
+def registry() -> Registry:
+    """Get the application's metric registry."""
+    return Registry()
+
+
+def _labels(labels: Sequence[Tuple[str, str]]) -> str:
+    """
+    Format label pairs (like `{method="GET",status="200"}`).
+
+    :param labels: the label names and values
+    """
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+    return f"{{{pairs}}}"
+
+
+def _escape(value: str, quotes: bool = True) -> str:
+    """
+    Escape a label value (or help text).
+
+    :param value: the value
+    :param quotes: escape double quotes too
+    """
+    value = value.replace("\\", "\\\\").replace("\n", "\\n")
+    return value.replace('"', '\\"') if quotes else value
+
+
+def _number(value: float) -> str:
+    """
+    Format a sample value.
+
+    :param value: the value
+    """
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
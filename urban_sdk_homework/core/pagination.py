@@ -0,0 +1,99 @@
+import base64
+import binascii
+import json
+from typing import Any
+from typing import Callable
+from typing import Optional
+from typing import Sequence
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from urban_sdk_homework.core.errors import AppException
+
+
+class InvalidCursorException(AppException):
+    """The paging cursor is invalid."""
+
+    code = 400
+
+
+def encode_cursor(key: Any) -> str:
+    """
+    Encode a keyset pagination key as an opaque cursor.
+
+    :param key: the key of the last item on the current page
+    :returns: the cursor
+    """
+    token = json.dumps({"k": key}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(token).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> Any:
+    """
+    Decode an opaque cursor.
+
+    :param cursor: the cursor
+    :returns: the key of the last item on the previous page
+    :raises InvalidCursorException: if the cursor can't be decoded
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded))["k"]
+    except (binascii.Error, KeyError, TypeError, ValueError):
+        raise InvalidCursorException()
+
+
+def next_link(
+    request: Request,
+    count: int,
+    limit: int,
+    last: Any,
+    param: str = "cursor",
+) -> Optional[str]:
+    """
+    Get an RFC 8288 `Link` header value for the next page (if there may be
+    one).
+
+    :param request: the current request
+    :param count: the number of items on the current page
+    :param limit: the page size
+    :param last: the key of the last item on the current page
+    :param param: the name of the cursor query parameter
+    """
+    # A short page is the last page.
+    if not count or count < limit:
+        return None
+    url = request.url.include_query_params(**{param: encode_cursor(last)})
+    return f'<{url}>; rel="next"'
+
+
+def paginate(
+    request: Request,
+    response: Response,
+    items: Sequence[Any],
+    limit: int,
+    key: Callable[[Any], Any],
+    param: str = "cursor",
+):
+    """
+    Add a link to the next page to a response (if there may be one).
+
+    The link is added as an RFC 8288 `Link` header with `rel="next"`.
+
+    :param request: the current request
+    :param response: the response
+    :param items: the items on the current page
+    :param limit: the page size
+    :param key: a function that gets the pagination key from an item
+    :param param: the name of the cursor query parameter
+    """
+    link = next_link(
+        request,
+        count=len(items),
+        limit=limit,
+        last=key(items[-1]) if items else None,
+        param=param,
+    )
+    if link:
+        response.headers["Link"] = link
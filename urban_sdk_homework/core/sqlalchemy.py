@@ -0,0 +1,243 @@
+import inspect
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable
+from typing import Type
+from typing import TypeVar
+
+from pydantic import Field
+from sqlalchemy import Engine
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.pool import Pool
+from sqlalchemy.pool import QueuePool
+
+from urban_sdk_homework.core import timing
+from urban_sdk_homework.core.metrics import Histogram
+from urban_sdk_homework.core.metrics import HistogramSnapshot
+from urban_sdk_homework.core.metrics import registry
+from urban_sdk_homework.core.models import BaseModel
+
+T = TypeVar("T")
+
+#: This is the (service) method on whose behalf statements are executed.
+_method: ContextVar[str] = ContextVar("method", default="other")
+
+#: This is the connection `info` key under which statement start times are
+#: kept.
+_STARTED = "statement_started"
+
+
+class PoolStats(BaseModel):
+    """Connection pool statistics."""
+
+    size: int = Field(
+        description="This is the number of persistent connections allowed."
+    )
+    max_overflow: int = Field(
+        description=(
+            "This is the number of connections allowed beyond the pool size."
+        )
+    )
+    capacity: int = Field(
+        description=(
+            "This is the most connections the pool will ever open.  Multiply "
+            "it by the number of worker processes to get the number of "
+            "database connections a deployment may need."
+        )
+    )
+    checked_in: int = Field(
+        description="This is the number of idle connections in the pool."
+    )
+    checked_out: int = Field(
+        description="This is the number of connections currently in use."
+    )
+    overflow: int = Field(
+        description=(
+            "This is the number of open connections beyond the pool size."
+        )
+    )
+    wait: HistogramSnapshot = Field(
+        description=(
+            "This is a histogram of how long callers waited (in seconds) to "
+            "check out a connection."
+        )
+    )
+
+
+class _WaitTimeMixin:
+    """Records how long callers wait to check out connections."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_times = Histogram()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_times.observe(time.perf_counter() - start)
+
+    def recreate(self):
+        # Keep the history when the engine replaces the pool (for example,
+        # when it's disposed).
+        pool = super().recreate()
+        pool.wait_times = self.wait_times
+        return pool
+
+
+class InstrumentedQueuePool(_WaitTimeMixin, QueuePool):
+    """A queue pool that records connection wait times."""
+
+
+class InstrumentedAsyncQueuePool(_WaitTimeMixin, AsyncAdaptedQueuePool):
+    """An asyncio queue pool that records connection wait times."""
+
+
+def pool_stats(pool: Pool) -> PoolStats:
+    """
+    Get connection pool statistics.
+
+    :param pool: an instrumented queue pool
+    """
+    size = pool.size()
+    max_overflow = pool._max_overflow
+    return PoolStats(
+        size=size,
+        max_overflow=max_overflow,
+        capacity=size + max_overflow if max_overflow >= 0 else -1,
+        checked_in=pool.checkedin(),
+        checked_out=pool.checkedout(),
+        # The pool counts overflow from `-size`, so it's negative until the
+        # pool is full.
+        overflow=max(pool.overflow(), 0),
+        wait=pool.wait_times.snapshot(),
+    )
+
+
+def instrument(engine: Engine):
+    """
+    Record how long each statement an engine executes takes.
+
+    Statements are labelled with the service method that executed them (see
+    `instrumented`), and their time counts toward the current request's `db`
+    timing.  For an asynchronous engine, pass its `sync_engine`.
+
+    :param engine: the engine
+    """
+    seconds = registry().histogram(
+        "db_statement_duration_seconds",
+        "Time spent executing database statements.",
+        labels=("method",),
+    )
+    errors = registry().counter(
+        "db_statement_errors_total",
+        "Database statements that failed.",
+        labels=("method",),
+    )
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def started(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault(_STARTED, []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def finished(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info[_STARTED].pop()
+        seconds.labels(_method.get()).observe(elapsed)
+        timing.record("db", elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def failed(context):
+        conn = context.connection
+        if conn is not None and conn.info.get(_STARTED):
+            conn.info[_STARTED].pop()
+        errors.labels(_method.get()).inc()
+
+
+def labelled(name: str, method: Callable) -> Callable:
+    """
+    Wrap a method so that the statements it executes are labelled with its
+    name.
+
+    :param name: the label
+    :param method: the method (a function, coroutine function, generator
+        function or asynchronous generator function)
+    """
+    if inspect.isasyncgenfunction(method):
+
+        @wraps(method)
+        async def agen_wrapper(*args, **kwargs):
+            items = method(*args, **kwargs)
+            try:
+                while True:
+                    # The caller may resume us from another context, so we
+                    # only hold the label while we're producing an item.
+                    token = _method.set(name)
+                    try:
+                        item = await anext(items)
+                    except StopAsyncIteration:
+                        return
+                    finally:
+                        _method.reset(token)
+                    yield item
+            finally:
+                await items.aclose()
+
+        return agen_wrapper
+
+    if inspect.isgeneratorfunction(method):
+
+        @wraps(method)
+        def gen_wrapper(*args, **kwargs):
+            items = method(*args, **kwargs)
+            try:
+                while True:
+                    token = _method.set(name)
+                    try:
+                        item = next(items)
+                    except StopIteration:
+                        return
+                    finally:
+                        _method.reset(token)
+                    yield item
+            finally:
+                items.close()
+
+        return gen_wrapper
+
+    if inspect.iscoroutinefunction(method):
+
+        @wraps(method)
+        async def async_wrapper(*args, **kwargs):
+            token = _method.set(name)
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                _method.reset(token)
+
+        return async_wrapper
+
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        token = _method.set(name)
+        try:
+            return method(*args, **kwargs)
+        finally:
+            _method.reset(token)
+
+    return wrapper
+
+
+def instrumented(cls: Type[T]) -> Type[T]:
+    """
+    Label the statements executed by a class's public methods with the
+    methods' names.
+
+    :param cls: the class
+    """
+    for name, attr in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.isfunction(attr):
+            setattr(cls, name, labelled(name, attr))
+    return cls
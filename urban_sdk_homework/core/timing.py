@@ -0,0 +1,155 @@
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from contextlib import nullcontext
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable
+from typing import ContextManager
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+
+# Note to the Future: Timings are collected per request (in a context
+# variable, so they follow the request into worker threads and tasks) and
+# reported in the `Server-Timing` header.  When nothing is collecting (the
+# header is turned off, or we're not handling a request), `phase()` hands back
+# a shared no-op context manager, so the instrumented code costs next to
+# nothing.
+
+#: These are the phases reported first (in this order).  Any others follow.
+PHASES = ("db", "decode", "validate", "serialize")
+
+#: This is the no-op context manager returned when timings aren't collected.
+_NOOP = nullcontext()
+
+
+class Timings:
+    """
+    The time spent in each phase of handling a request.
+
+    Timings are safe to update from multiple threads.
+    """
+
+    def __init__(self):
+        """Create a new instance."""
+        self.started = time.perf_counter()
+        #: This is when the endpoint returned (if it has).
+        self.returned: Optional[float] = None
+        self._phases: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, seconds: float):
+        """
+        Add time to a phase.
+
+        :param phase: the phase
+        :param seconds: the time spent
+        """
+        with self._lock:
+            self._phases[phase] = self._phases.get(phase, 0.0) + seconds
+
+    def header(self) -> str:
+        """Format the timings as a `Server-Timing` header value."""
+        now = time.perf_counter()
+        with self._lock:
+            phases = dict(self._phases)
+        names = [p for p in PHASES if p in phases]
+        names.extend(sorted(p for p in phases if p not in PHASES))
+        metrics = [f"{name};dur={phases[name] * 1000:.3f}" for name in names]
+        metrics.append(f"total;dur={(now - self.started) * 1000:.3f}")
+        return ", ".join(metrics)
+
+
+class _Phase:
+    """Adds the time spent in a block of code to a phase."""
+
+    __slots__ = ("_timings", "_name", "_started")
+
+    def __init__(self, timings: Timings, name: str):
+        self._timings = timings
+        self._name = name
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self._timings.add(self._name, time.perf_counter() - self._started)
+
+
+#: These are the current request's timings (if they're being collected).
+_timings: ContextVar[Optional[Timings]] = ContextVar("timings", default=None)
+
+
+@contextmanager
+def collecting() -> Iterator[Timings]:
+    """Collect timings for the code in the block (like a request)."""
+    timings = Timings()
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def current() -> Optional[Timings]:
+    """Get the current request's timings (if they're being collected)."""
+    return _timings.get()
+
+
+def phase(name: str) -> ContextManager:
+    """
+    Time a block of code as part of a phase.
+
+    :param name: the phase (like `decode`)
+    """
+    timings = _timings.get()
+    return _NOOP if timings is None else _Phase(timings, name)
+
+
+def record(name: str, seconds: float):
+    """
+    Add time to a phase.
+
+    :param name: the phase (like `db`)
+    :param seconds: the time spent
+    """
+    timings = _timings.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+def returns(endpoint: Callable) -> Callable:
+    """
+    Wrap an endpoint so the current timings note when it returns.  (Whatever
+    happens between then and the response is serialization.)
+
+    :param endpoint: the endpoint (a function or coroutine function)
+    """
+    if inspect.iscoroutinefunction(endpoint):
+
+        @wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _returned()
+
+        return async_wrapper
+
+    @wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            _returned()
+
+    return wrapper
+
+
+def _returned():
+    """Note that the endpoint has returned."""
+    timings = _timings.get()
+    if timings is not None:
+        timings.returned = time.perf_counter()
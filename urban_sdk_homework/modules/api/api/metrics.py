@@ -0,0 +1,23 @@
+from fastapi.responses import PlainTextResponse
+
+from urban_sdk_homework.core.fastapi import APIRouter
+from urban_sdk_homework.core.metrics import CONTENT_TYPE
+from urban_sdk_homework.core.metrics import registry
+from urban_sdk_homework.modules.api.settings import ApiSettings
+
+# Note to the Future: Metrics are kept per worker process, so with several
+# workers each scrape sees whichever worker answered.  Scrape the workers
+# individually (or run one worker per container) if that matters.
+router = APIRouter(tags=["Metrics"], enabled=ApiSettings().metrics)
+
+
+@router.get(
+    "/metrics",
+    name="get-metrics",
+    response_class=PlainTextResponse,
+)
+async def get_metrics() -> PlainTextResponse:
+    """
+    Get the worker's metrics in the Prometheus text exposition format.
+    """
+    return PlainTextResponse(registry().render(), media_type=CONTENT_TYPE)
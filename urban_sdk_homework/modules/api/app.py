@@ -1,12 +1,20 @@
 from functools import lru_cache
 
 from fastapi import FastAPI
+from fastapi import Request
 from fastapi.concurrency import asynccontextmanager
+from fastapi.responses import JSONResponse
 from fastapi.responses import RedirectResponse
 from starlette.middleware.cors import CORSMiddleware
 
+from urban_sdk_homework.core.errors import AppException
 from urban_sdk_homework.core.fastapi import APIRouter
+from urban_sdk_homework.core.logging import logger
 from urban_sdk_homework.core.project.metadata import metadata
+from urban_sdk_homework.modules.api.middleware import MetricsMiddleware
+from urban_sdk_homework.modules.api.middleware import (
+    ServerTimingMiddleware,
+)
 from urban_sdk_homework.modules.api.settings import ApiSettings
 
 
@@ -16,8 +24,32 @@ def settings() -> ApiSettings:
     return ApiSettings()
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Manage the application lifespan."""
+    # Perform "startup" tasks.
+    if settings().warm_up:
+        await warm_up()
+    yield
+    # Perform "shutdown" tasks.
+
+
+async def warm_up():
+    """Warm up the routers' services before the worker takes requests."""
+    for router in APIRouter.instances(condition=lambda r: r.enabled):
+        try:
+            await router.warm_up()
+        except Exception as ex:
+            # A worker that can't reach the database yet can still start
+            # (and connect when the first request arrives).
+            logger().warning(
+                "Warm-up failed.", tags=router.tags, error=str(ex)
+            )
+
+
 #: This is the FastAPI application.
 app = FastAPI(
+    lifespan=lifespan,
     version=str(metadata().version),
     title=settings().title or metadata().name,
     docs_url=settings().docs_url,
@@ -26,9 +58,27 @@ app = FastAPI(
     swagger_ui_parameters={"docExpansion": "none"},
 )
 
+
+@app.exception_handler(AppException)
+async def app_exception_handler(
+    request: Request, exc: AppException
+) -> JSONResponse:
+    """Convert application exceptions to error responses."""
+    return JSONResponse(status_code=exc.code, content={"detail": exc.message})
+
+
 # Set up CORS.
 app.add_middleware(CORSMiddleware, **settings().cors.model_dump())
 
+# Break each response's time down by phase.
+if settings().server_timing:
+    app.add_middleware(ServerTimingMiddleware)
+
+# Record request metrics.  (Middleware added last runs first, so this times
+# everything else.)
+if settings().metrics:
+    app.add_middleware(MetricsMiddleware)
+
 # Get all of the available routers and add them to the app.
 for router in APIRouter.instances(condition=lambda r: r.enabled):
     app.include_router(router)
@@ -39,11 +89,3 @@ for router in APIRouter.instances(condition=lambda r: r.enabled):
 async def root():
     """Redirect to OpenAPI documentation."""
     return RedirectResponse(url="/openapi")
-
-
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Manage the application lifespan."""
-    # Perform "startup" tasks.
-    yield
-    # Perform "shutdown" tasks.
@@ -1,10 +1,15 @@
 from pathlib import Path
+from typing import Tuple
 
 import click
+import rich
 from click import pass_context
 from click import pass_obj
+from rich.table import Table
 
 from urban_sdk_homework.cli import main
+from urban_sdk_homework.modules.api import loadtest as loadtest_
+from urban_sdk_homework.modules.api.models import LoadTestReport
 from urban_sdk_homework.modules.api.services import ApiService
 
 
@@ -31,3 +36,169 @@ def api_(ctx):
 def start(service: ApiService, envfile: str, reload: bool):
     """Create a tenant database."""
     service.start(envfile=Path(envfile) if envfile else None, reload=reload)
+
+
+def _mix(ctx, param, value: str):
+    """Parse the request mix option."""
+    try:
+        return loadtest_.parse_mix(value)
+    except ValueError as ex:
+        raise click.BadParameter(str(ex)) from ex
+
+
+@api_.command()
+@click.option(
+    "-u",
+    "--url",
+    help="The API's base URL.  (By default, the address the API binds to.)",
+)
+@click.option(
+    "-c",
+    "--concurrency",
+    type=click.IntRange(min=1),
+    help="Keep this many requests in flight (a closed-loop test).",
+)
+@click.option(
+    "-r",
+    "--rate",
+    type=click.FloatRange(min=0, min_open=True),
+    help="Start this many requests per second (an open-loop test).",
+)
+@click.option(
+    "-m",
+    "--mix",
+    default=",".join(f"{k}={v}" for k, v in loadtest_.MIX.items()),
+    show_default=True,
+    callback=_mix,
+    help=(
+        "The relative weight of each kind of request "
+        f"({', '.join(loadtest_.ROUTES)})."
+    ),
+)
+@click.option(
+    "-d",
+    "--duration",
+    type=click.FloatRange(min=0, min_open=True),
+    default=30.0,
+    show_default=True,
+    help="The number of seconds to measure.",
+)
+@click.option(
+    "-W",
+    "--warm-up",
+    type=click.FloatRange(min=0),
+    default=5.0,
+    show_default=True,
+    help="The number of seconds to send requests before measuring.",
+)
+@click.option(
+    "-t",
+    "--timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    default=30.0,
+    show_default=True,
+    help="The number of seconds to wait for a response.",
+)
+@click.option(
+    "--max-in-flight",
+    type=click.IntRange(min=1),
+    default=1000,
+    show_default=True,
+    help="The most requests an open-loop test keeps in flight.",
+)
+@click.option(
+    "--extent",
+    type=(float, float, float, float),
+    default=loadtest_.EXTENT,
+    show_default=True,
+    help="The area random bounding boxes are drawn from.",
+)
+@click.option(
+    "--bbox-size",
+    type=click.FloatRange(min=0, min_open=True),
+    default=0.02,
+    show_default=True,
+    help="The width (and height) of random bounding boxes (in degrees).",
+)
+@click.option("--seed", type=int, help="The random seed.")
+@click.option(
+    "-j",
+    "--json",
+    "json_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Also write the report (as JSON) to this file ('-' for stdout).",
+)
+@pass_obj
+def loadtest(
+    service: ApiService,
+    url: str,
+    concurrency: int,
+    rate: float,
+    mix: dict,
+    duration: float,
+    warm_up: float,
+    timeout: float,
+    max_in_flight: int,
+    extent: Tuple[float, float, float, float],
+    bbox_size: float,
+    seed: int,
+    json_path: Path,
+):
+    """
+    Load test a running API and report the throughput and latency of each
+    route.
+
+    Give either --concurrency or --rate.
+    """
+    if (concurrency is None) == (rate is None):
+        raise click.UsageError("Give either --concurrency or --rate.")
+    report = service.loadtest(
+        url=url,
+        mix=mix,
+        concurrency=concurrency,
+        rate=rate,
+        duration=duration,
+        warm_up=warm_up,
+        timeout=timeout,
+        max_in_flight=max_in_flight,
+        extent=extent,
+        bbox_size=bbox_size,
+        seed=seed,
+    )
+    if json_path is not None and str(json_path) == "-":
+        click.echo(report.model_dump_json(indent=2))
+        return
+    rich.print(_table(report))
+    if json_path is not None:
+        json_path.write_text(report.model_dump_json(indent=2))
+
+
+def _table(report: LoadTestReport) -> Table:
+    """Format a load test report as a table."""
+    load = (
+        f"{report.concurrency} in flight"
+        if report.concurrency
+        else f"{report.rate:g} requests/s"
+    )
+    table = Table(
+        title=f"{report.url} ({load}, {report.seconds:g}s)",
+        caption=(
+            f"{report.dropped} requests dropped" if report.dropped else None
+        ),
+    )
+    table.add_column("Route", no_wrap=True)
+    for column in ("Requests", "Errors", "Req/s", "p50", "p95", "p99", "Max"):
+        table.add_column(column, justify="right")
+    for i, row in enumerate((*report.routes, report.total)):
+        table.add_row(
+            row.route,
+            str(row.requests),
+            str(row.errors),
+            f"{row.throughput:.1f}",
+            *(
+                "-" if value is None else f"{value:.1f}ms"
+                for value in (row.p50, row.p95, row.p99, row.max)
+            ),
+            end_section=i == len(report.routes) - 1,
+        )
+    return table
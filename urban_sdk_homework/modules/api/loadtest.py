@@ -0,0 +1,411 @@
+import asyncio
+import random
+from collections import defaultdict
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Mapping
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import httpx
+import numpy as np
+
+from urban_sdk_homework.modules.api.models import LoadTestReport
+from urban_sdk_homework.modules.api.models import LoadTestRoute
+from urban_sdk_homework.modules.traffic.models import DayOfWeek
+from urban_sdk_homework.modules.traffic.models import TimePeriod
+
+# Note to the Future: A closed-loop test (`concurrency`) keeps a fixed number
+# of requests in flight, so it finds the most a worker can do.  An open-loop
+# test (`rate`) starts requests on a (Poisson) schedule whether or not the
+# earlier ones have finished, like real traffic, so it shows how latency
+# grows as the arrival rate approaches that limit.  Open-loop latencies are
+# measured from when each request was *scheduled* to start, so a stalled
+# server can't hide its queue by slowing the client down (coordinated
+# omission).
+
+#: These are the kinds of requests (and the routes they exercise).
+ROUTES: Mapping[str, str] = {
+    "aggregates": "GET /aggregates",
+    "link": "GET /link/{link_id}",
+    "link_aggregates": "GET /aggregates/{link_id}",
+    "profile": "GET /aggregates/{link_id}/profile",
+    "bbox": "POST /aggregates/spatial_filter",
+}
+
+#: This is the default request mix (as relative weights).
+MIX: Mapping[str, int] = {"aggregates": 4, "link": 3, "bbox": 2, "profile": 1}
+
+#: This is the area random bounding boxes are drawn from (Jacksonville).
+EXTENT: Tuple[float, float, float, float] = (-81.8, 30.1, -81.6, 30.3)
+
+#: This is the number of links sampled for the link lookups.
+SAMPLE_SIZE = 1000
+
+
+class Request(NamedTuple):
+    """A request to send."""
+
+    route: str
+    method: str
+    url: str
+    params: Optional[Dict[str, Any]] = None
+    json: Optional[Dict[str, Any]] = None
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    """
+    Parse a request mix (like `aggregates=4,link=3,bbox=2`).
+
+    :param text: the request mix
+    :raises ValueError: if the mix is malformed or names an unknown kind of
+        request
+    """
+    mix = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        kind, _, weight = item.partition("=")
+        kind = kind.strip()
+        if kind not in ROUTES:
+            raise ValueError(
+                f"{kind!r} isn't a kind of request.  (Choose from "
+                f"{', '.join(ROUTES)}.)"
+            )
+        mix[kind] = int(weight) if weight else 1
+        if mix[kind] < 0:
+            raise ValueError(f"The weight of {kind!r} is negative.")
+    if not any(mix.values()):
+        raise ValueError("The mix doesn't include any requests.")
+    return mix
+
+
+class Sampler:
+    """Draws random requests from a mix."""
+
+    def __init__(
+        self,
+        mix: Mapping[str, int],
+        link_ids: Sequence[int],
+        extent: Tuple[float, float, float, float] = EXTENT,
+        bbox_size: float = 0.02,
+        seed: int = None,
+    ):
+        """
+        Create a new instance.
+
+        :param mix: the relative weight of each kind of request
+        :param link_ids: the link IDs to look up
+        :param extent: the area bounding boxes are drawn from
+        :param bbox_size: the width (and height) of bounding boxes (in
+            degrees)
+        :param seed: the random seed
+        """
+        self._kinds = [kind for kind, weight in mix.items() if weight]
+        self._weights = [mix[kind] for kind in self._kinds]
+        self._link_ids = link_ids
+        self._extent = extent
+        self._bbox_size = bbox_size
+        self._random = random.Random(seed)
+
+    def __call__(self) -> Request:
+        """Draw a request."""
+        kind = self._random.choices(self._kinds, self._weights)[0]
+        route = ROUTES[kind]
+        method = route.split()[0]
+        day = self._random.choice(list(DayOfWeek))
+        period = self._random.choice(list(TimePeriod))
+        if kind == "aggregates":
+            return Request(
+                route,
+                method,
+                "/aggregates",
+                params={"day": day.value, "period": period.value},
+            )
+        if kind == "bbox":
+            min_x, min_y, max_x, max_y = self._extent
+            x = self._random.uniform(
+                min_x, max(max_x - self._bbox_size, min_x)
+            )
+            y = self._random.uniform(
+                min_y, max(max_y - self._bbox_size, min_y)
+            )
+            return Request(
+                route,
+                method,
+                "/aggregates/spatial_filter",
+                json={
+                    "day": int(day),
+                    "period": int(period),
+                    "bbox": [x, y, x + self._bbox_size, y + self._bbox_size],
+                },
+            )
+        link_id = self._random.choice(self._link_ids)
+        if kind == "link":
+            return Request(route, method, f"/link/{link_id}")
+        if kind == "link_aggregates":
+            return Request(
+                route,
+                method,
+                f"/aggregates/{link_id}",
+                params={"day": day.value, "period": period.value},
+            )
+        return Request(route, method, f"/aggregates/{link_id}/profile")
+
+
+class _Recorder:
+    """Collects the outcome of each request in the measurement window."""
+
+    def __init__(self, measure_from: float, measure_to: float):
+        """
+        Create a new instance.
+
+        :param measure_from: when (by the event loop clock) measurement starts
+        :param measure_to: when (by the event loop clock) measurement stops
+        """
+        self.measure_from = measure_from
+        self.measure_to = measure_to
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.dropped = 0
+
+    def measures(self, started: float) -> bool:
+        """
+        Does a request that started at a time count?
+
+        :param started: when (by the event loop clock) the request started
+        """
+        return self.measure_from <= started < self.measure_to
+
+    async def send(
+        self, client: httpx.AsyncClient, request: Request, started: float
+    ):
+        """
+        Send a request and record how long it took.
+
+        :param client: the client
+        :param request: the request
+        :param started: when (by the event loop clock) the request started
+            (or was scheduled to)
+        """
+        try:
+            response = await client.request(
+                request.method,
+                request.url,
+                params=request.params,
+                json=request.json,
+            )
+            # Read the whole body: the client waits for all of it.
+            await response.aread()
+            ok = response.is_success
+        except httpx.HTTPError:
+            ok = False
+        if not self.measures(started):
+            return
+        if ok:
+            self.latencies[request.route].append(
+                asyncio.get_running_loop().time() - started
+            )
+        else:
+            self.errors[request.route] += 1
+
+
+async def sample_link_ids(
+    client: httpx.AsyncClient, limit: int = SAMPLE_SIZE
+) -> Tuple[int, ...]:
+    """
+    Get some link IDs to look up.
+
+    :param client: the client
+    :param limit: the most link IDs to get
+    """
+    response = await client.get(
+        "/links", params={"limit": limit, "resolution": "low"}
+    )
+    response.raise_for_status()
+    return tuple(link["link_id"] for link in response.json())
+
+
+async def run(
+    url: str,
+    mix: Mapping[str, int] = MIX,
+    concurrency: int = None,
+    rate: float = None,
+    duration: float = 30.0,
+    warm_up: float = 5.0,
+    timeout: float = 30.0,
+    max_in_flight: int = 1000,
+    extent: Tuple[float, float, float, float] = EXTENT,
+    bbox_size: float = 0.02,
+    seed: int = None,
+) -> LoadTestReport:
+    """
+    Load test the API.
+
+    Give either `concurrency` (for a closed-loop test) or `rate` (for an
+    open-loop test).
+
+    :param url: the API's base URL
+    :param mix: the relative weight of each kind of request
+    :param concurrency: the number of requests to keep in flight
+    :param rate: the number of requests to start per second
+    :param duration: the number of seconds to measure
+    :param warm_up: the number of seconds to send requests before measuring
+    :param timeout: the number of seconds to wait for a response
+    :param max_in_flight: the most requests an open-loop test keeps in
+        flight (it drops the rest)
+    :param extent: the area bounding boxes are drawn from
+    :param bbox_size: the width (and height) of bounding boxes (in degrees)
+    :param seed: the random seed
+    """
+    if (concurrency is None) == (rate is None):
+        raise ValueError("Give either a concurrency or a rate.")
+    connections = concurrency or max_in_flight
+    async with httpx.AsyncClient(
+        base_url=url,
+        timeout=timeout,
+        limits=httpx.Limits(
+            max_connections=connections, max_keepalive_connections=connections
+        ),
+    ) as client:
+        link_ids = ()
+        if any(
+            mix.get(kind) for kind in ROUTES if "{link_id}" in ROUTES[kind]
+        ):
+            link_ids = await sample_link_ids(client)
+            if not link_ids:
+                raise ValueError("There are no links to look up.")
+        sample = Sampler(
+            mix, link_ids, extent=extent, bbox_size=bbox_size, seed=seed
+        )
+        loop = asyncio.get_running_loop()
+        begin = loop.time()
+        recorder = _Recorder(begin + warm_up, begin + warm_up + duration)
+        if concurrency is not None:
+            await _closed_loop(client, sample, recorder, concurrency)
+        else:
+            await _open_loop(
+                client, sample, recorder, rate, max_in_flight, seed
+            )
+    return LoadTestReport(
+        url=url,
+        concurrency=concurrency,
+        rate=rate,
+        mix=dict(mix),
+        seconds=duration,
+        dropped=recorder.dropped,
+        total=_summarize(
+            "Total",
+            [x for xs in recorder.latencies.values() for x in xs],
+            sum(recorder.errors.values()),
+            duration,
+        ),
+        routes=tuple(
+            _summarize(
+                route,
+                recorder.latencies.get(route, []),
+                recorder.errors.get(route, 0),
+                duration,
+            )
+            for route in ROUTES.values()
+            if route in recorder.latencies or route in recorder.errors
+        ),
+    )
+
+
+async def _closed_loop(
+    client: httpx.AsyncClient,
+    sample: Sampler,
+    recorder: _Recorder,
+    concurrency: int,
+):
+    """
+    Keep a number of requests in flight until the measurement window ends.
+
+    :param client: the client
+    :param sample: draws the requests
+    :param recorder: records the outcomes
+    :param concurrency: the number of requests to keep in flight
+    """
+    loop = asyncio.get_running_loop()
+
+    async def user():
+        while (started := loop.time()) < recorder.measure_to:
+            await recorder.send(client, sample(), started)
+
+    async with asyncio.TaskGroup() as tasks:
+        for _ in range(concurrency):
+            tasks.create_task(user())
+
+
+async def _open_loop(
+    client: httpx.AsyncClient,
+    sample: Sampler,
+    recorder: _Recorder,
+    rate: float,
+    max_in_flight: int,
+    seed: int = None,
+):
+    """
+    Start requests at random (Poisson) intervals until the measurement
+    window ends.
+
+    :param client: the client
+    :param sample: draws the requests
+    :param recorder: records the outcomes
+    :param rate: the average number of requests to start per second
+    :param max_in_flight: the most requests to keep in flight
+    :param seed: the random seed
+    """
+    loop = asyncio.get_running_loop()
+    arrivals = random.Random(seed)
+    in_flight = set()
+    scheduled = loop.time()
+    while scheduled < recorder.measure_to:
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= max_in_flight:
+            if recorder.measures(scheduled):
+                recorder.dropped += 1
+        else:
+            task = asyncio.create_task(
+                recorder.send(client, sample(), scheduled)
+            )
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        scheduled += arrivals.expovariate(rate)
+    if in_flight:
+        await asyncio.gather(*in_flight)
+
+
+def _summarize(
+    route: str, latencies: Sequence[float], errors: int, seconds: float
+) -> LoadTestRoute:
+    """
+    Summarize the outcomes of a route's requests.
+
+    :param route: the route
+    :param latencies: the latencies (in seconds) of the successful requests
+    :param errors: the number of failed requests
+    :param seconds: the length of the measurement window
+    """
+    requests = len(latencies) + errors
+    figures = {}
+    if latencies:
+        ms = np.asarray(latencies) * 1000
+        p50, p95, p99 = np.percentile(ms, (50, 95, 99))
+        figures = {
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3),
+            "max": round(float(ms.max()), 3),
+        }
+    return LoadTestRoute(
+        route=route,
+        requests=requests,
+        errors=errors,
+        throughput=round(requests / seconds, 3) if seconds else 0.0,
+        **figures,
+    )
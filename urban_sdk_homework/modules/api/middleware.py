@@ -0,0 +1,120 @@
+import time
+from typing import Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp
+from starlette.types import Message
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+from urban_sdk_homework.core import timing
+from urban_sdk_homework.core.metrics import registry
+
+#: These are the response size histogram bucket boundaries (in bytes).
+SIZE_BUCKETS: Tuple[float, ...] = tuple(4**n * 256 for n in range(9))
+
+#: This is the route label for requests that didn't match a route (so that
+#: random paths can't create new label values).
+UNMATCHED = "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Record request latency, requests in flight and response sizes.
+
+    Requests are labelled with the route's path template (like
+    `/link/{link_id}`) rather than the requested path.
+    """
+
+    def __init__(self, app: ASGIApp):
+        """
+        Create a new instance.
+
+        :param app: the application
+        """
+        self.app = app
+        self._seconds = registry().histogram(
+            "http_request_duration_seconds",
+            "Time spent handling HTTP requests.",
+            labels=("method", "route", "status"),
+        )
+        self._in_flight = registry().gauge(
+            "http_requests_in_flight",
+            "HTTP requests currently being handled.",
+        )
+        self._sizes = registry().histogram(
+            "http_response_size_bytes",
+            "Sizes of HTTP response bodies.",
+            labels=("method", "route"),
+            buckets=SIZE_BUCKETS,
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status, size = 500, 0
+
+        async def send_(message: Message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        in_flight = self._in_flight.labels()
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_flight.dec()
+            # The router leaves the matched route in the scope.
+            route = scope.get("route")
+            path = getattr(route, "path", UNMATCHED)
+            self._seconds.labels(scope["method"], path, status).observe(
+                elapsed
+            )
+            self._sizes.labels(scope["method"], path).observe(size)
+
+
+class ServerTimingMiddleware:
+    """
+    Report where each request's time went in a `Server-Timing` header.
+
+    The phases are `db` (executing statements), `decode` (parsing the
+    GeoJSON the database returns), `validate` (building models) and
+    `serialize` (everything between the endpoint returning and the response
+    starting), plus the `total`.  Streamed responses start before their rows
+    are read, so their header only covers the work done up to that point.
+    """
+
+    def __init__(self, app: ASGIApp):
+        """
+        Create a new instance.
+
+        :param app: the application
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with timing.collecting() as timings:
+
+            async def send_(message: Message):
+                if message["type"] == "http.response.start":
+                    if timings.returned is not None:
+                        timings.add(
+                            "serialize", time.perf_counter() - timings.returned
+                        )
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", timings.header())
+                await send(message)
+
+            await self.app(scope, receive, send_)
@@ -0,0 +1,89 @@
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+from pydantic import Field
+
+from urban_sdk_homework.core.models import BaseModel
+
+
+class LoadTestRoute(BaseModel):
+    """The throughput and latency of one route during a load test."""
+
+    route: str = Field(description="The route.", title="Route")
+    requests: int = Field(
+        description="The number of requests that completed.", title="Requests"
+    )
+    errors: int = Field(
+        description=(
+            "The number of requests that failed (or didn't get a 2xx "
+            "response)."
+        ),
+        title="Errors",
+    )
+    throughput: float = Field(
+        description="The number of requests completed per second.",
+        title="Throughput",
+    )
+    p50: Optional[float] = Field(
+        default=None,
+        description="The median latency (in milliseconds).",
+        title="p50",
+    )
+    p95: Optional[float] = Field(
+        default=None,
+        description="The 95th percentile latency (in milliseconds).",
+        title="p95",
+    )
+    p99: Optional[float] = Field(
+        default=None,
+        description="The 99th percentile latency (in milliseconds).",
+        title="p99",
+    )
+    max: Optional[float] = Field(
+        default=None,
+        description="The slowest request (in milliseconds).",
+        title="Max",
+    )
+
+
+class LoadTestReport(BaseModel):
+    """The outcome of a load test."""
+
+    url: str = Field(description="The API's base URL.", title="URL")
+    concurrency: Optional[int] = Field(
+        default=None,
+        description=(
+            "The number of requests kept in flight (for a closed-loop test)."
+        ),
+        title="Concurrency",
+    )
+    rate: Optional[float] = Field(
+        default=None,
+        description=(
+            "The number of requests started per second (for an open-loop "
+            "test)."
+        ),
+        title="Rate",
+    )
+    mix: Dict[str, int] = Field(
+        description="The relative weight of each kind of request.",
+        title="Mix",
+    )
+    seconds: float = Field(
+        description="The time measured (after the warm-up).", title="Seconds"
+    )
+    dropped: int = Field(
+        default=0,
+        description=(
+            "The number of requests an open-loop test didn't start because "
+            "too many were already in flight."
+        ),
+        title="Dropped",
+    )
+    total: LoadTestRoute = Field(
+        description="The figures for every request together.", title="Total"
+    )
+    routes: Tuple[LoadTestRoute, ...] = Field(
+        description="The figures for each route.", title="Routes"
+    )
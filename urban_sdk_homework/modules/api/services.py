@@ -1,10 +1,15 @@
+import asyncio
 from pathlib import Path
+from typing import Mapping
 from typing import Optional
+from typing import Tuple
 
 import uvicorn
 from dotenv import load_dotenv
 
 from urban_sdk_homework.core.services import Service
+from urban_sdk_homework.modules.api import loadtest as loadtest_
+from urban_sdk_homework.modules.api.models import LoadTestReport
 from urban_sdk_homework.modules.api.settings import ApiSettings
 
 
@@ -33,3 +38,57 @@ class ApiService(Service):
             reload=(settings.reload if reload is None else reload),
             env_file=envfile_,
         )
+
+    def loadtest(
+        self,
+        url: Optional[str] = None,
+        mix: Mapping[str, int] = loadtest_.MIX,
+        concurrency: Optional[int] = None,
+        rate: Optional[float] = None,
+        duration: float = 30.0,
+        warm_up: float = 5.0,
+        timeout: float = 30.0,
+        max_in_flight: int = 1000,
+        extent: Tuple[float, float, float, float] = loadtest_.EXTENT,
+        bbox_size: float = 0.02,
+        seed: Optional[int] = None,
+    ) -> LoadTestReport:
+        """
+        Load test a running web API service.
+
+        Give either `concurrency` (for a closed-loop test) or `rate` (for an
+        open-loop test).
+
+        :param url: the service's base URL (by default, the one it binds to)
+        :param mix: the relative weight of each kind of request
+        :param concurrency: the number of requests to keep in flight
+        :param rate: the number of requests to start per second
+        :param duration: the number of seconds to measure
+        :param warm_up: the number of seconds to send requests before
+            measuring
+        :param timeout: the number of seconds to wait for a response
+        :param max_in_flight: the most requests an open-loop test keeps in
+            flight
+        :param extent: the area bounding boxes are drawn from
+        :param bbox_size: the width (and height) of bounding boxes (in
+            degrees)
+        :param seed: the random seed
+        """
+        if url is None:
+            settings = ApiSettings()
+            url = f"http://{settings.bind}:{settings.port}"
+        return asyncio.run(
+            loadtest_.run(
+                url,
+                mix=mix,
+                concurrency=concurrency,
+                rate=rate,
+                duration=duration,
+                warm_up=warm_up,
+                timeout=timeout,
+                max_in_flight=max_in_flight,
+                extent=extent,
+                bbox_size=bbox_size,
+                seed=seed,
+            )
+        )
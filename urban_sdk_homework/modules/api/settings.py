@@ -39,6 +39,13 @@ class APICORSConfig(BaseSettings):
             "These are the permitted HTTP headers for cross-origin requests"
         ),
     )
+    expose_headers: Tuple[str, ...] = Field(
+        default=("Link", "ETag", "Server-Timing"),
+        description=(
+            "These are the response headers that cross-origin scripts may "
+            "read."
+        ),
+    )
 
 
 class ApiSettings(BaseSettings):
@@ -111,6 +118,39 @@ class ApiSettings(BaseSettings):
         default="/openapi.json",
         description="This is the URI of OpenAPI definition.",
     )
+    cache_control: Optional[str] = Field(
+        default="no-cache",
+        description=(
+            "This is the `Cache-Control` header for responses that have an "
+            "`ETag`.  The default lets clients keep responses but makes them "
+            "check (with `If-None-Match`) that they're current, which is "
+            "cheap."
+        ),
+        examples=["public, max-age=60"],
+    )
+    warm_up: bool = Field(
+        default=True,
+        description=(
+            "Open database connections (and load anything else the routes "
+            "need) when a worker starts, before it accepts requests, rather "
+            "than during its first requests."
+        ),
+    )
+    metrics: bool = Field(
+        default=True,
+        description=(
+            "Record request and database statement metrics and serve them "
+            "(in the Prometheus text format) at `/metrics`."
+        ),
+    )
+    server_timing: bool = Field(
+        default=True,
+        description=(
+            "Add a `Server-Timing` header that breaks each response's time "
+            "down into database, decoding, validation and serialization "
+            "phases.  (It's cheap enough to leave on.)"
+        ),
+    )
     cors: APICORSConfig = Field(
         default_factory=APICORSConfig, description=APICORSConfig.__doc__
     )
@@ -0,0 +1,51 @@
+import sys
+
+import click
+from click import pass_context
+from click import pass_obj
+
+from urban_sdk_homework.cli import main
+from urban_sdk_homework.core.console import pprint
+from urban_sdk_homework.modules.db.services import DbService
+
+
+@main.group()
+@pass_context
+def db(ctx):
+    """Database schema subcommands."""
+    ctx.obj = DbService.connect()
+
+
+@db.command()
+@click.option(
+    "-t",
+    "--to",
+    "target",
+    type=click.INT,
+    help="Stop after this migration version (rather than the latest).",
+)
+@pass_obj
+def upgrade(service: DbService, target: int):
+    """Apply the migrations that haven't been applied yet."""
+    pprint(service.upgrade(target=target))
+
+
+@db.command()
+@pass_obj
+def status(service: DbService):
+    """List the migrations and when they were applied."""
+    pprint(service.get_migrations())
+
+
+@db.command()
+@pass_obj
+def check(service: DbService):
+    """
+    Check that the database is up to date and has the expected indexes.
+
+    (The command exits with a non-zero status if it doesn't.)
+    """
+    result = service.check()
+    pprint(result)
+    if not result.ok:
+        sys.exit(1)
@@ -0,0 +1,60 @@
+from datetime import datetime
+from typing import Optional
+from typing import Tuple
+
+from pydantic import Field
+
+from urban_sdk_homework.core.models import BaseModel
+
+
+class MigrationStatus(BaseModel):
+    """A migration and whether it has been applied."""
+
+    version: int = Field(description="The migration version.", title="Version")
+    description: str = Field(
+        description="What the migration changes.", title="Description"
+    )
+    applied_at: Optional[datetime] = Field(
+        default=None,
+        description=(
+            "Indicates when the migration was applied (or `None` if it "
+            "hasn't been)."
+        ),
+        title="Applied At",
+    )
+
+
+class SchemaIndex(BaseModel):
+    """An index on one of the traffic tables."""
+
+    table: str = Field(description="The table.", title="Table")
+    name: str = Field(description="The index.", title="Name")
+
+
+class SchemaCheck(BaseModel):
+    """The outcome of comparing the live database to the migrations."""
+
+    version: int = Field(
+        description="The newest migration applied to the database.",
+        title="Version",
+    )
+    latest: int = Field(
+        description="The newest migration there is.", title="Latest"
+    )
+    missing: Tuple[SchemaIndex, ...] = Field(
+        default=(),
+        description="These indexes should exist but don't.",
+        title="Missing Indexes",
+    )
+    unexpected: Tuple[SchemaIndex, ...] = Field(
+        default=(),
+        description="These indexes exist but shouldn't.",
+        title="Unexpected Indexes",
+    )
+    ok: bool = Field(
+        description=(
+            "Indicates the database is up to date and has exactly the "
+            "expected indexes."
+        ),
+        title="OK",
+    )
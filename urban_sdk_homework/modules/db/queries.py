@@ -0,0 +1,73 @@
+from sqlalchemy import text
+from sqlalchemy import TextClause
+
+from urban_sdk_homework.modules.db.migrations import SCHEMA
+from urban_sdk_homework.modules.db.migrations import TABLE
+
+#: This is the key of the advisory lock held while migrations are applied (so
+#: two upgrades can't run at once).
+LOCK_KEY = 0x7D8A5E31
+
+
+def create_migrations_table() -> TextClause:
+    """Create the migration bookkeeping table (if it doesn't exist)."""
+    return text(
+        f'CREATE TABLE IF NOT EXISTS "{SCHEMA}"."{TABLE}"('
+        '"version" INTEGER PRIMARY KEY, '
+        '"description" TEXT NOT NULL, '
+        '"applied_at" TIMESTAMPTZ NOT NULL DEFAULT NOW())'
+    )
+
+
+def lock() -> TextClause:
+    """Wait for the migration lock (until the transaction ends)."""
+    return text("SELECT pg_advisory_xact_lock(:key)").bindparams(key=LOCK_KEY)
+
+
+def applied() -> TextClause:
+    """Select the migrations that have been applied."""
+    return text(
+        'SELECT "version", "description", "applied_at" '
+        f'FROM "{SCHEMA}"."{TABLE}" ORDER BY "version"'
+    )
+
+
+def record(version: int, description: str) -> TextClause:
+    """
+    Record that a migration has been applied.
+
+    :param version: the migration version
+    :param description: the migration description
+    """
+    return text(
+        f'INSERT INTO "{SCHEMA}"."{TABLE}"("version", "description") '
+        "VALUES (:version, :description)"
+    ).bindparams(version=version, description=description)
+
+
+def migrations_table_exists() -> TextClause:
+    """Check whether the migration bookkeeping table exists."""
+    return text("SELECT to_regclass(:name) IS NOT NULL").bindparams(
+        name=f'"{SCHEMA}"."{TABLE}"'
+    )
+
+
+def indexes(schema: str = "traffic") -> TextClause:
+    """
+    Select the indexes (other than primary keys) on a schema's tables.
+
+    Partitions' copies of their parents' indexes are left out.
+
+    :param schema: the schema
+    """
+    return text(
+        'SELECT t.relname AS "table", i.relname AS "name" '
+        "FROM pg_index AS x "
+        "JOIN pg_class AS i ON i.oid = x.indexrelid "
+        "JOIN pg_class AS t ON t.oid = x.indrelid "
+        "JOIN pg_namespace AS n ON n.oid = t.relnamespace "
+        "WHERE n.nspname = :schema "
+        "AND NOT x.indisprimary "
+        "AND NOT t.relispartition "
+        "ORDER BY t.relname, i.relname"
+    ).bindparams(schema=schema)
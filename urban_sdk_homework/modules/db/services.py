@@ -0,0 +1,125 @@
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict
+from typing import Self
+from typing import Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy import NullPool
+from sqlalchemy import text
+
+from urban_sdk_homework.core.services import Service
+from urban_sdk_homework.modules.db import migrations
+from urban_sdk_homework.modules.db import queries
+from urban_sdk_homework.modules.db.models import MigrationStatus
+from urban_sdk_homework.modules.db.models import SchemaCheck
+from urban_sdk_homework.modules.db.models import SchemaIndex
+from urban_sdk_homework.modules.traffic.settings import TrafficServiceSettings
+
+
+class DbService(Service):
+    """Database schema service."""
+
+    def __init__(self):
+        """Create a new instance."""
+        # The traffic tables are the only ones we have, so we migrate the
+        # traffic service's database.  (Migrations are run once, from the
+        # command line, so there's no point keeping connections around.)
+        self._engine = create_engine(
+            TrafficServiceSettings().sqa_conn, poolclass=NullPool
+        )
+
+    def get_migrations(self) -> Tuple[MigrationStatus, ...]:
+        """Get every migration and when (if ever) it was applied."""
+        applied = self._applied()
+        return tuple(
+            MigrationStatus(
+                version=migration.version,
+                description=migration.description,
+                applied_at=applied.get(migration.version),
+            )
+            for migration in migrations.MIGRATIONS
+        )
+
+    def upgrade(self, target: int = None) -> Tuple[MigrationStatus, ...]:
+        """
+        Apply the migrations that haven't been applied yet.
+
+        Each migration is applied (and recorded) in its own transaction, so
+        a failed migration leaves the database at the previous version.
+
+        :param target: stop after this version (rather than the latest)
+        :return: the migrations that were applied
+        """
+        with self._engine.begin() as conn:
+            conn.execute(queries.lock())
+            conn.execute(queries.create_migrations_table())
+        upgraded = []
+        for migration in migrations.MIGRATIONS:
+            if target is not None and migration.version > target:
+                break
+            with self._engine.begin() as conn:
+                # Another upgrade may have applied the migration while we
+                # were waiting for the lock.
+                conn.execute(queries.lock())
+                if migration.version in self._applied(conn):
+                    continue
+                for statement in migration.statements:
+                    conn.execute(text(statement))
+                conn.execute(
+                    queries.record(migration.version, migration.description)
+                )
+            upgraded.append(migration.version)
+        return tuple(
+            status
+            for status in self.get_migrations()
+            if status.version in upgraded
+        )
+
+    def check(self) -> SchemaCheck:
+        """Compare the live database to the migrations."""
+        applied = self._applied()
+        with self._engine.connect() as conn:
+            live = frozenset(
+                (row.table, row.name)
+                for row in conn.execute(queries.indexes())
+            )
+        version = max(applied, default=0)
+        missing = sorted(migrations.INDEXES - live)
+        unexpected = sorted(live - migrations.INDEXES)
+        return SchemaCheck(
+            version=version,
+            latest=migrations.latest(),
+            missing=tuple(
+                SchemaIndex(table=table, name=name) for table, name in missing
+            ),
+            unexpected=tuple(
+                SchemaIndex(table=table, name=name)
+                for table, name in unexpected
+            ),
+            ok=version == migrations.latest()
+            and not missing
+            and not unexpected,
+        )
+
+    def _applied(self, conn=None) -> Dict[int, datetime]:
+        """
+        Get the applied migrations' versions (and when they were applied).
+
+        :param conn: the connection to use (if we're in a transaction)
+        """
+        if conn is None:
+            with self._engine.connect() as conn_:
+                return self._applied(conn_)
+        if not conn.execute(queries.migrations_table_exists()).scalar_one():
+            return {}
+        return {
+            row.version: row.applied_at
+            for row in conn.execute(queries.applied())
+        }
+
+    @classmethod
+    @lru_cache()
+    def connect(cls) -> Self:
+        """Connect to the service."""
+        return cls()
@@ -1,4 +1,19 @@
-from urban_sdk_homework.modules.traffic.services import TrafficService
+from typing import List
+from typing import Optional
+
+from fastapi import Query
+
+from urban_sdk_homework.core.pagination import decode_cursor
+from urban_sdk_homework.core.pagination import InvalidCursorException
+from urban_sdk_homework.modules.traffic.errors import (
+    InvalidPercentileException,
+)
+from urban_sdk_homework.modules.traffic.models import GeometryOptions
+from urban_sdk_homework.modules.traffic.models import Paging
+from urban_sdk_homework.modules.traffic.models import Resolution
+from urban_sdk_homework.modules.traffic.models import ResponseFormat
+from urban_sdk_homework.modules.traffic.services import AsyncTrafficService
+from urban_sdk_homework.modules.traffic.settings import TrafficServiceSettings
 
 # Note to the Future: If we ever want to implement multi-tenancy, we can
 # uncomment the tenant parameter and pass it to the service.
@@ -11,14 +26,137 @@ from urban_sdk_homework.modules.traffic.services import TrafficService
 #     :param tenant: the tenant that owns the data
 #     :returns: the service instance
 #     """
-#     return TrafficService.connect(tenant=tenant)
+#     return AsyncTrafficService.connect(tenant=tenant)
 
 
-def service():
+async def service():
     """
     Get a traffic service instance for a tenant.
 
     :param tenant: the tenant that owns the data
     :returns: the service instance
     """
-    return TrafficService.connect()
+    return AsyncTrafficService.connect()
+
+
+async def warm_up():
+    """Open the traffic service's connections ahead of the first request."""
+    await AsyncTrafficService.connect().warm_up()
+
+
+async def paging(
+    cursor: Optional[str] = Query(
+        default=None,
+        description=(
+            "This is an opaque cursor that identifies the next page.  Follow "
+            "the `next` link in the response's `Link` header rather than "
+            "building it yourself."
+        ),
+        title="Cursor",
+    ),
+    limit: Optional[int] = Query(
+        default=None,
+        description=(
+            "This is the maximum number of items on the page.  Large values "
+            "are reduced to the configured maximum page size."
+        ),
+        ge=1,
+        title="Limit",
+    ),
+) -> Paging:
+    """
+    Get the paging parameters for a request.
+
+    :param cursor: the cursor from the previous page
+    :param limit: the requested page size
+    :returns: the paging parameters
+    """
+    settings = TrafficServiceSettings.these()
+    after = decode_cursor(cursor) if cursor else None
+    # `bool` is a subclass of `int`, so a decoded `true` would pass for one.
+    if after is not None and type(after) is not int:
+        raise InvalidCursorException()
+    return Paging(
+        after=after,
+        limit=min(limit or settings.page_size, settings.max_page_size),
+    )
+
+
+async def response_format(
+    format_: ResponseFormat = Query(
+        alias="format",
+        default=ResponseFormat.JSON,
+        description=(
+            "This is the response format.  `geojson` returns a GeoJSON "
+            "feature collection assembled by the database.  `ndjson` "
+            "(newline-delimited JSON) and `geojsonseq` (RFC 8142 GeoJSON "
+            "text sequences) stream one item at a time; they aren't paged, "
+            "so they return every item unless you pass a `limit`."
+        ),
+        title="Format",
+    ),
+) -> ResponseFormat:
+    """
+    Get the requested response format.
+
+    :param format_: the response format
+    :returns: the response format
+    """
+    return format_
+
+
+async def geometry(
+    resolution: Resolution = Query(
+        default=Resolution.FULL,
+        description=(
+            "This is the resolution of link geometry.  Lower resolutions are "
+            "simplified (with tolerances of about 1m, 10m and 100m for "
+            "`high`, `medium` and `low`) and are much smaller, which suits "
+            "overview maps."
+        ),
+        title="Resolution",
+    ),
+    precision: Optional[int] = Query(
+        default=None,
+        description=(
+            "This is the number of decimal places in coordinates.  (Five "
+            "places is roughly a meter.)"
+        ),
+        ge=0,
+        le=15,
+        title="Precision",
+    ),
+) -> GeometryOptions:
+    """
+    Get the geometry options for a request.
+
+    :param resolution: the geometry resolution
+    :param precision: the number of decimal places in coordinates
+    :returns: the geometry options
+    """
+    return GeometryOptions(resolution=resolution, precision=precision)
+
+
+async def percentiles(
+    percentiles: Optional[List[float]] = Query(
+        alias="percentile",
+        default=None,
+        description=(
+            "These are speed percentiles (between 0 and 100) to estimate for "
+            "each item.  Repeat the parameter for several percentiles (like "
+            "`percentile=15&percentile=50&percentile=85`).  Percentiles are "
+            "only returned in the default JSON format."
+        ),
+        title="Percentile",
+    ),
+) -> Optional[List[float]]:
+    """
+    Get the requested speed percentiles.
+
+    :param percentiles: the percentiles
+    :returns: the percentiles (or `None` if none were requested)
+    :raises InvalidPercentileException: if a percentile is out of range
+    """
+    if percentiles and any(p < 0 or p > 100 for p in percentiles):
+        raise InvalidPercentileException()
+    return percentiles or None
@@ -1,21 +1,147 @@
+from datetime import datetime
+from typing import AsyncIterator
 from typing import List
+from typing import Optional
 
 from fastapi import Depends
 from fastapi import Path
 from fastapi import Query
+from fastapi import Request
+from fastapi import Response
+from fastapi.responses import StreamingResponse
 
 from urban_sdk_homework.core.fastapi import APIRouter
+from urban_sdk_homework.core.fastapi import FastJSONResponse
+from urban_sdk_homework.core.pagination import next_link
+from urban_sdk_homework.core.pagination import paginate
+from urban_sdk_homework.modules.traffic.api.dependencies import geometry
+from urban_sdk_homework.modules.traffic.api.dependencies import paging
+from urban_sdk_homework.modules.traffic.api.dependencies import percentiles
+from urban_sdk_homework.modules.traffic.api.dependencies import (
+    response_format,
+)
 from urban_sdk_homework.modules.traffic.api.dependencies import service
+from urban_sdk_homework.modules.traffic.api.dependencies import warm_up
+from urban_sdk_homework.modules.traffic.api.routes import TrafficRoute
+from urban_sdk_homework.modules.traffic.errors import NotFoundException
 from urban_sdk_homework.modules.traffic.models import Aggregate
 from urban_sdk_homework.modules.traffic.models import DayOfWeek
+from urban_sdk_homework.modules.traffic.models import FeatureCollectionPage
+from urban_sdk_homework.modules.traffic.models import GeometryOptions
+from urban_sdk_homework.modules.traffic.models import Grouping
 from urban_sdk_homework.modules.traffic.models import Link
+from urban_sdk_homework.modules.traffic.models import LinkBatch
+from urban_sdk_homework.modules.traffic.models import LinkBatchRequest
+from urban_sdk_homework.modules.traffic.models import Paging
+from urban_sdk_homework.modules.traffic.models import PercentileParams
+from urban_sdk_homework.modules.traffic.models import ResponseFormat
 from urban_sdk_homework.modules.traffic.models import SpatialFilterParams
+from urban_sdk_homework.modules.traffic.models import SpeedPercentiles
+from urban_sdk_homework.modules.traffic.models import SpeedProfile
+from urban_sdk_homework.modules.traffic.models import SpeedProfileBatch
 from urban_sdk_homework.modules.traffic.models import TimePeriod
 
 # Note to the Future:  Since these traffic endpoints are currently our
 # only service endpoints, we'll mount them without a prefix.
 # router = APIRouter(tags=["traffic"], prefix="/traffic")
-router = APIRouter(tags=["traffic"])
+# Responses are encoded straight from the models the service returns (without
+# validating them again).
+router = APIRouter(
+    tags=["traffic"],
+    route_class=TrafficRoute,
+    default_response_class=FastJSONResponse,
+    warm_up=warm_up,
+)
+
+
+#: This media type identifies GeoJSON responses.
+GEOJSON = "application/geo+json"
+
+#: This media type identifies newline-delimited JSON responses.
+NDJSON = "application/x-ndjson"
+
+#: This media type identifies GeoJSON text sequences (RFC 8142).
+GEOJSON_SEQ = "application/geo+json-seq"
+
+#: This media type identifies Mapbox Vector Tiles.
+MVT = "application/vnd.mapbox-vector-tile"
+
+#: These are the media types of the streaming formats.
+_STREAMING_MEDIA_TYPES = {
+    ResponseFormat.NDJSON: NDJSON,
+    ResponseFormat.GEOJSONSEQ: GEOJSON_SEQ,
+}
+
+#: This documents the alternate response formats.
+_FORMAT_RESPONSES = {
+    200: {
+        "content": {GEOJSON: {}, NDJSON: {}, GEOJSON_SEQ: {}},
+        "description": (
+            "Successful Response (or a GeoJSON feature collection if "
+            "`format=geojson`, newline-delimited JSON if `format=ndjson` or "
+            "a GeoJSON text sequence if `format=geojsonseq`)"
+        ),
+    }
+}
+
+
+def _link_id(item: Aggregate | Link) -> int:
+    """Get the pagination key for an item."""
+    return item.link_id
+
+
+def _geojson(
+    request: Request, page: FeatureCollectionPage, limit: int
+) -> Response:
+    """
+    Create a response from a feature collection assembled by the database.
+
+    :param request: the current request
+    :param page: the feature collection
+    :param limit: the page size
+    """
+    link = next_link(
+        request, count=page.count, limit=limit, last=page.last_link_id
+    )
+    return Response(
+        content=page.body,
+        media_type=GEOJSON,
+        headers={"Link": link} if link else None,
+    )
+
+
+def _stream_limit(request: Request, paging: Paging) -> Optional[int]:
+    """
+    Get the maximum number of items to stream.
+
+    Streams aren't paged, so they're only limited if the caller asks.
+
+    :param request: the current request
+    :param paging: the paging parameters
+    """
+    return paging.limit if "limit" in request.query_params else None
+
+
+def _stream(
+    batches: AsyncIterator[List[str]], format_: ResponseFormat
+) -> StreamingResponse:
+    """
+    Create a response that streams lines of JSON text serialized by the
+    database.
+
+    :param batches: batches of lines
+    :param format_: the streaming format
+    """
+    # RFC 8142 puts a record separator before each GeoJSON text.
+    prefix = "\x1e" if format_ == ResponseFormat.GEOJSONSEQ else ""
+
+    async def body():
+        async for lines in batches:
+            yield "".join(f"{prefix}{line}\n" for line in lines)
+
+    return StreamingResponse(
+        body(), media_type=_STREAMING_MEDIA_TYPES[format_]
+    )
 
 
 @router.get(
@@ -23,18 +149,117 @@ router = APIRouter(tags=["traffic"])
     name="get-link",
     response_model=Link,
 )
-def link(
+async def link(
     link_id: int = Path(
         description="The unique identifier for the traffic link",
         example=1240632857,
         ge=0,  # Greater than or equal to 1
         title="Link ID",  # Shows up in OpenAPI schema
     ),
+    geometry: GeometryOptions = Depends(geometry),
     service=Depends(service),
 ) -> Link:
     """Get the aggregated speed per link for the given day and time period."""
-    # TODO: Handle IndexError if link_id is not found.
-    return service.get_links(link_id=link_id)[0]
+    links = await service.get_links(link_id=link_id, geometry=geometry)
+    if not links:
+        raise NotFoundException(f"Link {link_id} was not found.")
+    return links[0]
+
+
+@router.post(
+    "/links/batch",
+    name="get-link-batch",
+    response_model=LinkBatch,
+    response_model_exclude_unset=True,
+)
+async def link_batch(
+    params: LinkBatchRequest,
+    geometry: GeometryOptions = Depends(geometry),
+    service=Depends(service),
+) -> LinkBatch:
+    """
+    Look up many links at once.
+
+    The links are returned in the order they were requested.  IDs that don't
+    exist are listed in `missing` (rather than failing the request).
+    """
+    return await service.get_link_batch(
+        link_ids=params.link_ids, geometry=geometry
+    )
+
+
+@router.get(
+    "/links/",
+    name="get-links",
+    response_model=List[Link],
+    response_model_exclude_unset=True,
+    responses=_FORMAT_RESPONSES,
+)
+async def links(
+    request: Request,
+    response: Response,
+    day: Optional[DayOfWeek] = Query(
+        default=None,
+        description=(
+            "Only include links with speed records on this day (and period)"
+        ),
+        example="Monday",
+        title="Day of Week",
+    ),
+    period: Optional[TimePeriod] = Query(
+        default=None,
+        description=(
+            "Only include links with speed records in this period (and day)"
+        ),
+        example="Evening",
+        title="Time Period",
+    ),
+    format_: ResponseFormat = Depends(response_format),
+    paging: Paging = Depends(paging),
+    geometry: GeometryOptions = Depends(geometry),
+    service=Depends(service),
+) -> List[Link]:
+    """
+    Get links, optionally limited to those with speed records for a day and
+    time period.
+
+    Results are ordered by link ID.  If there are more results, the `Link`
+    response header contains a `next` link to the following page.  (Use
+    `format=ndjson` or `format=geojsonseq` to stream the whole network in
+    one response.)
+    """
+    day = int(day) if day is not None else None
+    period = int(period) if period is not None else None
+    if format_.streaming:
+        return _stream(
+            service.stream_links(
+                day=day,
+                period=period,
+                after=paging.after,
+                limit=_stream_limit(request, paging),
+                features=format_ == ResponseFormat.GEOJSONSEQ,
+                geometry=geometry,
+            ),
+            format_,
+        )
+    if format_ == ResponseFormat.GEOJSON:
+        page = await service.get_links_geojson(
+            day=day,
+            period=period,
+            after=paging.after,
+            limit=paging.limit,
+            geometry=geometry,
+        )
+        return _geojson(request, page, paging.limit)
+    items = await service.get_links(
+        day=day,
+        period=period,
+        after=paging.after,
+        limit=paging.limit,
+        geometry=geometry,
+    )
+    paginate(request, response, items, paging.limit, key=_link_id)
+    return items
 
 
 @router.get(
@@ -42,8 +267,11 @@ def link(
     name="get-aggregates",
     response_model=List[Aggregate],
     response_model_exclude_unset=True,
+    responses=_FORMAT_RESPONSES,
 )
-def aggregates(
+async def aggregates(
+    request: Request,
+    response: Response,
     day: DayOfWeek = Query(
         description="Day of the week",
         example="Monday",
@@ -52,12 +280,72 @@ def aggregates(
     period: TimePeriod = Query(
         description="Time period", example="Evening", title="Time Period"
     ),
+    start: Optional[datetime] = Query(
+        default=None,
+        description=(
+            "Only include speed records from this time on.  (With a time "
+            "window, aggregates are computed from the raw speed records.)"
+        ),
+        example="2024-01-01T00:00:00Z",
+        title="Start",
+    ),
+    end: Optional[datetime] = Query(
+        default=None,
+        description="Only include speed records from before this time.",
+        example="2024-02-01T00:00:00Z",
+        title="End",
+    ),
+    format_: ResponseFormat = Depends(response_format),
+    paging: Paging = Depends(paging),
+    percentiles: Optional[List[float]] = Depends(percentiles),
+    geometry: GeometryOptions = Depends(geometry),
     service=Depends(service),
 ) -> List[Aggregate]:
     """
     Get the aggregated speed per link for the given day and time period.
+
+    Results are ordered by link ID.  If there are more results, the `Link`
+    response header contains a `next` link to the following page.  Pass
+    `percentile` parameters to estimate speed percentiles for each link, too
+    (from the same time window as the averages).
     """
-    return service.get_aggregates(day=int(day), period=int(period))
+    if format_.streaming:
+        return _stream(
+            service.stream_aggregates(
+                day=int(day),
+                period=int(period),
+                start=start,
+                end=end,
+                after=paging.after,
+                limit=_stream_limit(request, paging),
+                features=format_ == ResponseFormat.GEOJSONSEQ,
+                geometry=geometry,
+            ),
+            format_,
+        )
+    if format_ == ResponseFormat.GEOJSON:
+        page = await service.get_aggregates_geojson(
+            day=int(day),
+            period=int(period),
+            start=start,
+            end=end,
+            after=paging.after,
+            limit=paging.limit,
+            geometry=geometry,
+        )
+        return _geojson(request, page, paging.limit)
+    items = await service.get_aggregates(
+        day=int(day),
+        period=int(period),
+        start=start,
+        end=end,
+        after=paging.after,
+        limit=paging.limit,
+        percentiles=percentiles,
+        geometry=geometry,
+    )
+    paginate(request, response, items, paging.limit, key=_link_id)
+    return items
 
 
 @router.get(
@@ -66,7 +354,7 @@ def aggregates(
     response_model=Aggregate,
     response_model_exclude_unset=True,
 )
-def aggregates_by_link(
+async def aggregates_by_link(
     link_id: int = Path(
         description="The unique identifier for the traffic link",
         example=1240632857,
@@ -81,15 +369,116 @@ def aggregates_by_link(
     period: TimePeriod = Query(
         description="Time period", example="Evening", title="Time Period"
     ),
+    percentiles: Optional[List[float]] = Depends(percentiles),
+    geometry: GeometryOptions = Depends(geometry),
     service=Depends(service),
 ) -> Aggregate:
     """
     Get the aggregated speed per link for the given day and time period.
     """
-    # TODO: Handle IndexError if link_id is not found.
-    return service.get_aggregates(
-        link_id=link_id, day=int(day), period=int(period)
-    )[0]
+    items = await service.get_aggregates(
+        link_id=link_id,
+        day=int(day),
+        period=int(period),
+        percentiles=percentiles,
+        geometry=geometry,
+    )
+    if not items:
+        raise NotFoundException(
+            f"There are no aggregates for link {link_id} on {day.value} "
+            f"({period.value})."
+        )
+    return items[0]
+
+
+@router.post(
+    "/aggregates/percentiles/",
+    name="get-speed-percentiles",
+    response_model=List[SpeedPercentiles],
+    response_model_exclude_none=True,
+)
+async def speed_percentiles(
+    params: PercentileParams,
+    request: Request,
+    response: Response,
+    paging: Paging = Depends(paging),
+    service=Depends(service),
+) -> List[SpeedPercentiles]:
+    """
+    Estimate speed percentiles for a day and time period, per link, per road
+    or for every selected link at once.
+
+    Links can be selected by ID, road name, bounding box and/or polygon.
+    When grouping by link, results are ordered by link ID and paged (so if
+    there are more results, the `Link` response header contains a `next`
+    link to the following page).  Roads and `all` aren't paged.
+    """
+    by_link = params.group_by == Grouping.LINK
+    items = await service.get_percentiles(
+        day=params.day,
+        period=params.period,
+        percentiles=params.percentiles,
+        group_by=params.group_by,
+        link_ids=params.link_ids,
+        road_name=params.road_name,
+        bbox=params.bbox,
+        polygon=params.polygon,
+        after=paging.after if by_link else None,
+        limit=paging.limit if by_link else None,
+    )
+    if by_link:
+        paginate(request, response, items, paging.limit, key=_link_id)
+    return items
+
+
+@router.get(
+    "/aggregates/{link_id}/profile",
+    name="get-speed-profile",
+    response_model=SpeedProfile,
+)
+async def speed_profile(
+    link_id: int = Path(
+        description="The unique identifier for the traffic link",
+        example=1240632857,
+        ge=0,
+        title="Link ID",
+    ),
+    geometry: GeometryOptions = Depends(geometry),
+    service=Depends(service),
+) -> SpeedProfile:
+    """
+    Get a link's average speed for every day of the week and time period.
+
+    `speeds` is a 7 × 7 matrix: one row per day (Sunday to Saturday) and one
+    column per time period (Overnight to Evening).
+    """
+    profiles = await service.get_profiles(
+        link_ids=(link_id,), geometry=geometry
+    )
+    if not profiles:
+        raise NotFoundException(f"Link {link_id} was not found.")
+    return profiles[0]
+
+
+@router.post(
+    "/aggregates/profiles",
+    name="get-speed-profile-batch",
+    response_model=SpeedProfileBatch,
+)
+async def speed_profile_batch(
+    params: LinkBatchRequest,
+    geometry: GeometryOptions = Depends(geometry),
+    service=Depends(service),
+) -> SpeedProfileBatch:
+    """
+    Get the speed profiles of many links at once.
+
+    The profiles are returned in the order they were requested.  IDs that
+    don't exist are listed in `missing` (rather than failing the request).
+    """
+    return await service.get_profile_batch(
+        link_ids=params.link_ids, geometry=geometry
+    )
 
 
 @router.get(
@@ -98,7 +487,9 @@ def aggregates_by_link(
     response_model=List[Link],
     response_model_exclude_unset=True,
 )
-def get_slow_links(
+async def get_slow_links(
+    request: Request,
+    response: Response,
     period: TimePeriod = Query(
         description="Time period", example="Evening", title="Time Period"
     ),
@@ -110,21 +501,38 @@ def get_slow_links(
     ),
     min_days: int = Query(
         description=(
-            "Minimum number of days the link must be below the threshold to "
-            "be considered consistently slo."
+            "Minimum number of days of the week the link's average speed "
+            "must be below the threshold for it to be considered "
+            "consistently slow."
         ),
         example=3,
         ge=1,
         title="Minimum Days",
     ),
+    paging: Paging = Depends(paging),
+    geometry: GeometryOptions = Depends(geometry),
     service=Depends(service),
 ) -> List[Link]:
     """
     Get links that have been consistently slow over a period of time.
+
+    A link is slow on a given day of the week when its average speed for that
+    day and period is below the threshold.  The `speed` returned is the
+    link's average speed over its slow days.
+
+    Results are ordered by link ID.  If there are more results, the `Link`
+    response header contains a `next` link to the following page.
     """
-    return service.get_slow_links(
-        period=int(period), threshold=threshold, min_days=min_days
+    items = await service.get_slow_links(
+        period=int(period),
+        threshold=threshold,
+        min_days=min_days,
+        after=paging.after,
+        limit=paging.limit,
+        geometry=geometry,
     )
+    paginate(request, response, items, paging.limit, key=_link_id)
+    return items
 
 
 @router.post(
@@ -132,15 +540,94 @@ def get_slow_links(
     name="get-aggregates-spatial-filter",
     response_model=List[Link],
     response_model_exclude_unset=True,
+    responses=_FORMAT_RESPONSES,
 )
-def get_aggregates_spatial_filter(
+async def get_aggregates_spatial_filter(
     params: SpatialFilterParams,
+    request: Request,
+    response: Response,
+    format_: ResponseFormat = Depends(response_format),
+    paging: Paging = Depends(paging),
+    geometry: GeometryOptions = Depends(geometry),
     service=Depends(service),
 ) -> List[Link]:
     """
     Get the aggregated speed per link for the given day and time period
-    within a specified bounding box.
+    within a specified bounding box and/or GeoJSON polygon.
+
+    Results are ordered by link ID.  If there are more results, the `Link`
+    response header contains a `next` link to the following page.  (Post
+    the same body to it.)
+    """
+    if format_.streaming:
+        return _stream(
+            service.stream_links(
+                bbox=params.bbox,
+                polygon=params.polygon,
+                day=params.day,
+                period=params.period,
+                after=paging.after,
+                limit=_stream_limit(request, paging),
+                features=format_ == ResponseFormat.GEOJSONSEQ,
+                geometry=geometry,
+            ),
+            format_,
+        )
+    if format_ == ResponseFormat.GEOJSON:
+        page = await service.get_links_geojson(
+            bbox=params.bbox,
+            polygon=params.polygon,
+            day=params.day,
+            period=params.period,
+            after=paging.after,
+            limit=paging.limit,
+            geometry=geometry,
+        )
+        return _geojson(request, page, paging.limit)
+    items = await service.get_links(
+        bbox=params.bbox,
+        polygon=params.polygon,
+        day=params.day,
+        period=params.period,
+        after=paging.after,
+        limit=paging.limit,
+        geometry=geometry,
+    )
+    paginate(request, response, items, paging.limit, key=_link_id)
+    return items
+
+
+@router.get(
+    "/tiles/{day}/{period}/{z}/{x}/{y}.pbf",
+    name="get-tile",
+    response_class=Response,
+    responses={
+        200: {
+            "content": {MVT: {}},
+            "description": "A Mapbox Vector Tile",
+        }
+    },
+)
+async def tile(
+    day: DayOfWeek = Path(
+        description="Day of the week", example="Monday", title="Day of Week"
+    ),
+    period: TimePeriod = Path(
+        description="Time period", example="Evening", title="Time Period"
+    ),
+    z: int = Path(description="Zoom level", example=12, ge=0, le=30),
+    x: int = Path(description="Tile column", example=1117, ge=0),
+    y: int = Path(description="Tile row", example=1691, ge=0),
+    service=Depends(service),
+) -> Response:
+    """
+    Get a Mapbox Vector Tile of the aggregated speed per link for the given
+    day and time period.
+
+    The tile has a single `links` layer whose features carry `link_id`,
+    `road_name`, `length` and `speed` attributes.
     """
-    return service.get_links(
-        bbox=params.bbox, day=params.day, period=params.period
+    content = await service.get_tile(
+        day=int(day), period=int(period), z=z, x=x, y=y
     )
+    return Response(content=content, media_type=MVT)
@@ -0,0 +1,33 @@
+import inspect
+from functools import cached_property
+from typing import Optional
+
+from fastapi import Request
+
+from urban_sdk_homework.core.fastapi import ETagRoute
+from urban_sdk_homework.modules.api.settings import ApiSettings
+from urban_sdk_homework.modules.traffic.api.dependencies import service
+
+
+class TrafficRoute(ETagRoute):
+    """
+    A traffic API route.
+
+    Responses are tagged with the traffic data version, so clients that
+    poll for unchanged data get `304 Not Modified`.
+    """
+
+    @cached_property
+    def cache_control(self) -> Optional[str]:
+        """Get the `Cache-Control` header value for responses."""
+        # Routes are made when the modules are imported, which may be before
+        # `homework api start` loads its environment file, so we read the
+        # setting when the first request arrives.
+        return ApiSettings().cache_control
+
+    async def version(self, request: Request) -> Optional[int]:
+        # Honor dependency overrides so the service can be swapped out.
+        service_ = request.app.dependency_overrides.get(service, service)()
+        if inspect.isawaitable(service_):
+            service_ = await service_
+        return await service_.data_version()
@@ -0,0 +1,35 @@
+from fastapi import Depends
+
+from urban_sdk_homework.core.fastapi import APIRouter
+from urban_sdk_homework.core.sqlalchemy import PoolStats
+from urban_sdk_homework.modules.traffic.api.dependencies import service
+from urban_sdk_homework.modules.traffic.models import TrafficCacheStats
+
+# Note to the Future:  These statistics change with every request, so
+# (unlike the traffic data endpoints) they're never tagged for caching.
+router = APIRouter(tags=["traffic"])
+
+
+@router.get(
+    "/stats/pool",
+    name="get-pool-stats",
+    response_model=PoolStats,
+)
+async def get_pool_stats(service=Depends(service)) -> PoolStats:
+    """
+    Get database connection pool statistics for the worker that handles
+    the request.
+    """
+    return service.pool_stats()
+
+
+@router.get(
+    "/stats/cache",
+    name="get-cache-stats",
+    response_model=TrafficCacheStats,
+)
+async def get_cache_stats(service=Depends(service)) -> TrafficCacheStats:
+    """
+    Get cache statistics for the worker that handles the request.
+    """
+    return service.cache_stats()
@@ -1,24 +1,319 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import click
 from click import pass_context
 from click import pass_obj
+from rich.progress import BarColumn
+from rich.progress import MofNCompleteColumn
+from rich.progress import Progress
+from rich.progress import TextColumn
+from rich.progress import TimeElapsedColumn
+from rich.progress import TimeRemainingColumn
 
 from urban_sdk_homework.cli import main
-from urban_sdk_homework.core.click import multi_tenant
 from urban_sdk_homework.core.console import pprint
+from urban_sdk_homework.modules.traffic import loader
+from urban_sdk_homework.modules.traffic import queries
+from urban_sdk_homework.modules.traffic import synth as synth_
+from urban_sdk_homework.modules.traffic.models import LoadResult
+from urban_sdk_homework.modules.traffic.models import SynthResult
+from urban_sdk_homework.modules.traffic.models import SynthStats
 from urban_sdk_homework.modules.traffic.services import TrafficService
+from urban_sdk_homework.modules.traffic.settings import TrafficServiceSettings
 
 
 @main.group()
-@multi_tenant
 @pass_context
-def traffic(ctx, tenant: str):
+def traffic(ctx):
     """Traffic subcommands."""
-    ctx.obj = TrafficService.connect(tenant=tenant)
+    ctx.obj = TrafficService.connect()
 
 
 @traffic.command()
+@click.option(
+    "-F",
+    "--full",
+    is_flag=True,
+    help="Rebuild the aggregates from all of the speed records.",
+)
 @pass_obj
-def say_hello(
+def refresh(service: TrafficService, full: bool):
+    """Merge new speed records into the aggregates table."""
+    pprint(service.refresh_aggregates(full=full))
+
+
+@traffic.command()
+@click.option(
+    "-l",
+    "--links",
+    "links_path",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    default=Path("data/link_info.parquet.gz"),
+    show_default=True,
+    help="The links Parquet file (optionally gzipped).",
+)
+@click.option(
+    "-s",
+    "--speeds",
+    "speeds_path",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    default=Path("data/duval_jan1_2024.parquet.gz"),
+    show_default=True,
+    help="The speed records Parquet file (optionally gzipped).",
+)
+@click.option(
+    "-w",
+    "--workers",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="The number of connections that copy rows at once.",
+)
+@click.option(
+    "-b",
+    "--batch-size",
+    type=click.IntRange(min=1),
+    default=50000,
+    show_default=True,
+    help="The number of rows read (and copied) at a time.",
+)
+@pass_obj
+def load(
     service: TrafficService,
+    links_path: Path,
+    speeds_path: Path,
+    workers: int,
+    batch_size: int,
+):
+    """
+    Replace the links and speed records with the contents of Parquet files,
+    then rebuild everything derived from them.
+    """
+    dsn = loader.dsn(TrafficServiceSettings())
+    with loader.open_parquet(links_path) as links, loader.open_parquet(
+        speeds_path
+    ) as speeds:
+        # Make sure every month in the file has a partition before we copy
+        # the records (so none of them land in the default partition).
+        service.create_partitions(*loader.time_range(speeds))
+        service.create_staging()
+        load_stats = _load(dsn, links, speeds, workers, batch_size)
+    # Until now, the data we had is untouched (even if the copy failed).
+    # Reads wait from here until the new data is swapped in.
+    refresh = service.replace_data()
+    pprint(
+        LoadResult(
+            links=load_stats[0],
+            speed_records=load_stats[1],
+            refresh=refresh,
+        )
+    )
+
+
+def _load(dsn, links, speeds, workers, batch_size):
+    """Copy the links and speed records (showing progress as we go)."""
+    with Progress(
+        TextColumn("{task.description}"),
+        BarColumn(),
+        MofNCompleteColumn(),
+        TextColumn("rows"),
+        TimeElapsedColumn(),
+        TimeRemainingColumn(),
+    ) as progress:
+
+        async def copy(table, columns, parquet, fields, convert):
+            task = progress.add_task(
+                f"{loader.SCHEMA}.{table}", total=parquet.metadata.num_rows
+            )
+            return await loader.copy(
+                dsn,
+                table=table,
+                columns=columns,
+                parquet=parquet,
+                fields=fields,
+                convert=convert,
+                workers=workers,
+                batch_size=batch_size,
+                on_rows=lambda n: progress.advance(task, n),
+            )
+
+        async def run():
+            links_stats = await copy(
+                "links",
+                queries.LINK_COLUMNS,
+                links,
+                loader.LINK_FIELDS,
+                loader.link_rows,
+            )
+            speeds_stats = await copy(
+                "speed_records",
+                queries.SPEED_RECORD_COLUMNS,
+                speeds,
+                loader.SPEED_RECORD_FIELDS,
+                loader.speed_record_rows,
+            )
+            return links_stats, speeds_stats
+
+        return asyncio.run(run())
+
+
+@traffic.command()
+@click.option(
+    "-o",
+    "--out",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=Path("data/synth"),
+    show_default=True,
+    help="The directory the Parquet files are written to.",
+)
+@click.option(
+    "-n",
+    "--links",
+    type=click.IntRange(min=1),
+    default=100_000,
+    show_default=True,
+    help="The number of links.",
+)
+@click.option(
+    "--start",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    default="2024-01-01",
+    show_default=True,
+    help="The first day of speed records.",
+)
+@click.option(
+    "--end",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    default="2024-01-31",
+    show_default=True,
+    help="The last day of speed records.",
+)
+@click.option(
+    "--seed",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+    help="The random seed.  (The same seed always makes the same files.)",
+)
+@click.option(
+    "-w",
+    "--workers",
+    type=click.IntRange(min=1),
+    default=os.cpu_count() or 1,
+    show_default=True,
+    help="The number of processes that generate rows at once.",
+)
+def synth(
+    out: Path,
+    links: int,
+    start: datetime,
+    end: datetime,
+    seed: int,
+    workers: int,
 ):
-    """Get a friendly greeting."""
-    pprint(service.say_hello())
+    """
+    Generate a synthetic street network and a speed record for each of its
+    links in every period of every day from START to END.
+
+    The files have the same columns as `link_info.parquet` and
+    `duval_jan1_2024.parquet`, so `homework traffic load` can load them.
+    """
+    if end < start:
+        raise click.BadParameter("The end is before the start.")
+    network = synth_.Network(links=links, seed=seed)
+    days = synth_.days(start.date(), end.date())
+    out.mkdir(parents=True, exist_ok=True)
+    with Progress(
+        TextColumn("{task.description}"),
+        BarColumn(),
+        MofNCompleteColumn(),
+        TextColumn("rows"),
+        TimeElapsedColumn(),
+        TimeRemainingColumn(),
+    ) as progress, ProcessPoolExecutor(max_workers=workers) as executor:
+
+        def write(path, schema, total, tasks):
+            task = progress.add_task(path.name, total=total)
+            started = time.perf_counter()
+            rows = synth_.write(
+                path,
+                schema,
+                executor,
+                tasks,
+                window=workers * 2,
+                on_rows=lambda n: progress.advance(task, n),
+            )
+            seconds = time.perf_counter() - started
+            return SynthStats(
+                path=path,
+                rows=rows,
+                seconds=seconds,
+                rows_per_second=rows / seconds if seconds else 0.0,
+            )
+
+        links_stats = write(
+            out / "link_info.parquet",
+            synth_.LINK_SCHEMA,
+            links,
+            (
+                (synth_.links, (network, first, last))
+                for first, last in network.chunks()
+            ),
+        )
+        # Records are written a day at a time, so they're (roughly) in time
+        # order, like the real data.
+        speeds_stats = write(
+            out / "speed_records.parquet",
+            synth_.SPEED_RECORD_SCHEMA,
+            links * len(days) * 7,
+            (
+                (synth_.speed_records, (network, day, first, last))
+                for day in days
+                for first, last in network.chunks()
+            ),
+        )
+    pprint(SynthResult(links=links_stats, speed_records=speeds_stats))
+
+
+@traffic.group()
+def partition():
+    """Manage the monthly partitions of the speed records table."""
+
+
+@partition.command("list")
+@pass_obj
+def list_partitions(service: TrafficService):
+    """List the speed record partitions."""
+    pprint(service.get_partitions())
+
+
+@partition.command()
+@click.argument("start", type=click.DateTime(formats=["%Y-%m"]))
+@click.argument("end", type=click.DateTime(formats=["%Y-%m"]), required=False)
+@pass_obj
+def create(service: TrafficService, start: datetime, end: datetime):
+    """Create the partitions for the months from START to END (YYYY-MM)."""
+    pprint(service.create_partitions(start, end or start))
+
+
+@partition.command()
+@click.argument("month", type=click.DateTime(formats=["%Y-%m"]))
+@click.option(
+    "-D",
+    "--drop",
+    is_flag=True,
+    help="Drop the partition rather than keeping it as a standalone table.",
+)
+@pass_obj
+def detach(service: TrafficService, month: datetime, drop: bool):
+    """
+    Detach a month's speed records (YYYY-MM) and rebuild the aggregates
+    without them.
+    """
+    service.detach_partition(month.date(), drop=drop)
+    pprint(service.refresh_aggregates(full=True))
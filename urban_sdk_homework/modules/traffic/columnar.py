@@ -0,0 +1,264 @@
+from typing import Any
+from typing import Iterable
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+
+from urban_sdk_homework.core import timing
+from urban_sdk_homework.modules.traffic.models import Aggregate
+from urban_sdk_homework.modules.traffic.models import Link
+
+#: This is the number of days in a week (and the number of periods in a day).
+_DAYS = 7
+
+# Note to the Future: This module keeps the speed records in memory as a
+# handful of typed NumPy arrays so that aggregates can be computed with
+# vectorized masks and `np.bincount` group-bys rather than SQL.  A county's
+# worth of records fits comfortably in RAM.
+
+
+class SpeedColumns:
+    """
+    Speed records stored column-wise in contiguous arrays.
+
+    Rather than storing link IDs with every record, each record stores an
+    index into :py:attr:`link_ids` (which is sorted), so group-bys on links
+    are just `np.bincount` calls.
+    """
+
+    def __init__(
+        self,
+        link_ids: np.ndarray,
+        link_index: np.ndarray,
+        day: np.ndarray,
+        period: np.ndarray,
+        speed: np.ndarray,
+    ):
+        """
+        Create a new instance.
+
+        :param link_ids: the distinct link IDs (in ascending order)
+        :param link_index: the index of each record's link in `link_ids`
+        :param day: each record's day of the week (1-7)
+        :param period: each record's time period (1-7)
+        :param speed: each record's speed
+        """
+        self.link_ids = link_ids
+        self.link_index = link_index
+        self.day = day
+        self.period = period
+        self.speed = speed
+
+    @classmethod
+    def from_batches(
+        cls, batches: Iterable[Sequence[Tuple[int, int, int, float]]]
+    ) -> "SpeedColumns":
+        """
+        Build the columns from batches of `(link_id, day, period, speed)`
+        rows.
+
+        :param batches: the batches of rows
+        """
+        builder = SpeedColumnsBuilder()
+        for rows in batches:
+            builder.add(rows)
+        return builder.build()
+
+    @property
+    def nbytes(self) -> int:
+        """Get the memory used by the columns (in bytes)."""
+        return sum(
+            a.nbytes
+            for a in (
+                self.link_ids,
+                self.link_index,
+                self.day,
+                self.period,
+                self.speed,
+            )
+        )
+
+    def __len__(self) -> int:
+        return len(self.speed)
+
+    def aggregates(
+        self,
+        day: int,
+        period: int,
+        link_id: int = None,
+        link_ids: Sequence[int] = None,
+        after: int = None,
+        limit: int = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Compute the average speed per link for a day and period.
+
+        :param day: the day of the week
+        :param period: the time period
+        :param link_id: limit the results to a single link
+        :param link_ids: limit the results to these links
+        :param after: only include links with IDs greater than this one
+        :param limit: the maximum number of links
+        :returns: the link IDs (in ascending order) and their speeds
+        """
+        mask = (self.day == day) & (self.period == period)
+        index = self.link_index[mask]
+        n = len(self.link_ids)
+        counts = np.bincount(index, minlength=n)
+        totals = np.bincount(index, weights=self.speed[mask], minlength=n)
+        selected = (counts > 0) & self._links(link_id, link_ids, after)
+        ids = self.link_ids[selected][:limit]
+        speeds = (totals[selected] / counts[selected])[:limit]
+        return ids, speeds
+
+    def slow_links(
+        self,
+        period: int,
+        threshold: float,
+        min_days: int = 3,
+        after: int = None,
+        limit: int = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find links that have been consistently slow during a period.
+
+        A link is slow on a given day of the week when its average speed for
+        that day and period falls below the threshold (which is how the
+        SQL queries count days, too).
+
+        :param period: the time period
+        :param threshold: the speed threshold
+        :param min_days: the minimum number of slow days
+        :param after: only include links with IDs greater than this one
+        :param limit: the maximum number of links
+        :returns: the link IDs (in ascending order) and their average speeds
+            on the slow days
+        """
+        mask = self.period == period
+        # Group by link and day at once by numbering the (link, day) cells.
+        cells = self.link_index[mask].astype(np.int64) * _DAYS + (
+            self.day[mask] - 1
+        )
+        size = len(self.link_ids) * _DAYS
+        counts = np.bincount(cells, minlength=size).reshape(-1, _DAYS)
+        totals = np.bincount(
+            cells, weights=self.speed[mask], minlength=size
+        ).reshape(-1, _DAYS)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slow = (counts > 0) & (totals / counts < threshold)
+        selected = (slow.sum(axis=1) >= min_days) & self._links(after=after)
+        ids = self.link_ids[selected][:limit]
+        speeds = (
+            np.where(slow, totals, 0).sum(axis=1)[selected]
+            / np.where(slow, counts, 0).sum(axis=1)[selected]
+        )[:limit]
+        return ids, speeds
+
+    def _links(
+        self,
+        link_id: Optional[int] = None,
+        link_ids: Optional[Sequence[int]] = None,
+        after: Optional[int] = None,
+    ) -> Any:
+        """
+        Select links by ID.
+
+        :param link_id: select a single link
+        :param link_ids: select these links
+        :param after: select links with IDs greater than this one
+        :returns: a mask over :py:attr:`link_ids` (or `True` for all links)
+        """
+        selected = True
+        if link_id is not None:
+            selected = selected & (self.link_ids == link_id)
+        if link_ids is not None:
+            selected = selected & np.isin(self.link_ids, link_ids)
+        if after is not None:
+            selected = selected & (self.link_ids > after)
+        return selected
+
+
+class SpeedColumnsBuilder:
+    """
+    Builds :py:class:`SpeedColumns` a batch of rows at a time (so we never
+    hold more than one batch of database rows in memory).
+    """
+
+    def __init__(self):
+        """Create a new instance."""
+        self._link_ids = []
+        self._days = []
+        self._periods = []
+        self._speeds = []
+
+    def add(self, rows: Sequence[Tuple[int, int, int, float]]):
+        """
+        Add a batch of `(link_id, day, period, speed)` rows.
+
+        :param rows: the rows
+        """
+        n = len(rows)
+        self._link_ids.append(np.fromiter((r[0] for r in rows), np.int64, n))
+        self._days.append(np.fromiter((r[1] for r in rows), np.int8, n))
+        self._periods.append(np.fromiter((r[2] for r in rows), np.int8, n))
+        self._speeds.append(np.fromiter((r[3] for r in rows), np.float64, n))
+
+    def build(self) -> SpeedColumns:
+        """Build the columns."""
+        # Replace the link IDs with indexes into the distinct (sorted) IDs.
+        link_ids, link_index = np.unique(
+            _concat(self._link_ids, np.int64), return_inverse=True
+        )
+        return SpeedColumns(
+            link_ids=link_ids,
+            link_index=link_index.astype(np.int32),
+            day=_concat(self._days, np.int8),
+            period=_concat(self._periods, np.int8),
+            speed=_concat(self._speeds, np.float64),
+        )
+
+
+def to_aggregates(
+    link_ids: np.ndarray,
+    speeds: np.ndarray,
+    day: int,
+    period: int,
+    links: Iterable[Link],
+) -> Tuple[Aggregate, ...]:
+    """
+    Combine speeds computed from the columns with the links they belong to.
+
+    :param link_ids: the link IDs
+    :param speeds: the links' speeds
+    :param day: the day of the week
+    :param period: the time period
+    :param links: the links
+    """
+    # Like the SQL join, we skip speeds for links that don't exist.
+    found = {link.link_id: link for link in links}
+    with timing.phase("validate"):
+        return tuple(
+            Aggregate(
+                link_id=link_id,
+                day_of_week=day,
+                period=period,
+                speed=speed,
+                road_name=found[link_id].road_name,
+                length=found[link_id].length,
+                geom=found[link_id].geom,
+            )
+            for link_id, speed in zip(link_ids.tolist(), speeds.tolist())
+            if link_id in found
+        )
+
+
+def _concat(chunks: Sequence[np.ndarray], dtype: Any) -> np.ndarray:
+    """
+    Concatenate chunks of a column.
+
+    :param chunks: the chunks
+    :param dtype: the column's type (in case there are no chunks)
+    """
+    return np.concatenate(chunks) if chunks else np.empty(0, dtype)
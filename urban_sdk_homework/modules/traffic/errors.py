@@ -4,4 +4,29 @@ from urban_sdk_homework.core.errors import AppException
 class NotFoundException(AppException):
     """The requested resource was not found."""
 
-    status_code = 404
+    code = 404
+
+
+class TileNotFoundException(NotFoundException):
+    """The requested tile does not exist."""
+
+
+class BatchTooLargeException(AppException):
+    """The batch has too many items."""
+
+    code = 422
+
+
+class PartitionDetachedException(AppException):
+    """
+    A standalone table (like a detached partition) already has the month's
+    partition name.  Rename or drop it first.
+    """
+
+    code = 409
+
+
+class InvalidPercentileException(AppException):
+    """Percentiles must be between 0 and 100."""
+
+    code = 422
@@ -0,0 +1,105 @@
+from typing import Dict
+from typing import Iterable
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+#: This is the width of a speed histogram bin (in miles per hour).
+BIN_WIDTH = 0.5
+
+# Note to the Future: We summarize the speeds for each link, day and period
+# as a histogram of fixed-width bins (the `traffic.link_speed_bins` table)
+# rather than as t-digests or KLL sketches.  Fixed bins merge exactly (we
+# just add the counts, which Postgres can do with a `GROUP BY`), so any
+# grouping of links can be summarized on the fly, and with half-mile-an-hour
+# bins a percentile is never off by more than half a mile an hour.
+
+
+class SpeedHistogram:
+    """A mergeable histogram of speeds."""
+
+    def __init__(self, counts: Dict[int, int] = None):
+        """
+        Create a new instance.
+
+        :param counts: the number of speeds in each bin (keyed by bin)
+        """
+        self._counts: Dict[int, int] = dict(counts or {})
+
+    @classmethod
+    def from_bins(cls, bins: Iterable[Tuple[int, int]]) -> "SpeedHistogram":
+        """
+        Create a histogram from `(bin, count)` pairs.
+
+        :param bins: the bins and their counts
+        """
+        histogram = cls()
+        for bin_, count in bins:
+            histogram.add(bin_, count)
+        return histogram
+
+    @property
+    def count(self) -> int:
+        """Get the number of speeds in the histogram."""
+        return sum(self._counts.values())
+
+    def add(self, bin_: int, count: int = 1):
+        """
+        Add speeds to a bin.
+
+        :param bin_: the bin
+        :param count: the number of speeds
+        """
+        self._counts[bin_] = self._counts.get(bin_, 0) + count
+
+    def merge(self, other: "SpeedHistogram") -> "SpeedHistogram":
+        """
+        Merge another histogram into a copy of this one.
+
+        :param other: the other histogram
+        """
+        merged = SpeedHistogram(self._counts)
+        for bin_, count in other._counts.items():
+            merged.add(bin_, count)
+        return merged
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a quantile.
+
+        Speeds are assumed to be spread evenly across each bin.
+
+        :param q: the quantile (between 0 and 1)
+        :returns: the estimate (or `None` if the histogram is empty)
+        """
+        total = self.count
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for bin_ in sorted(self._counts):
+            count = self._counts[bin_]
+            if count and seen + count >= rank:
+                return (bin_ + (rank - seen) / count) * BIN_WIDTH
+            seen += count
+        return (max(self._counts) + 1) * BIN_WIDTH
+
+    def percentiles(self, percentiles: Sequence[float]) -> Dict[str, float]:
+        """
+        Estimate several percentiles.
+
+        :param percentiles: the percentiles (between 0 and 100)
+        :returns: the estimates keyed by name (like `p85`)
+        """
+        if not self.count:
+            return {}
+        return {label(p): self.quantile(p / 100) for p in percentiles}
+
+
+def label(percentile: float) -> str:
+    """
+    Get the name of a percentile (like `p85` or `p99.9`).
+
+    :param percentile: the percentile
+    """
+    return f"p{percentile:g}"
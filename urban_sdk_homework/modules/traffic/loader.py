@@ -0,0 +1,269 @@
+import asyncio
+import gzip
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from datetime import timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import asyncpg
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import shapely
+from sqlalchemy import make_url
+
+from urban_sdk_homework.modules.traffic.models import LoadStats
+from urban_sdk_homework.modules.traffic.queries import staging
+from urban_sdk_homework.modules.traffic.settings import TrafficServiceSettings
+
+# Note to the Future: This module replaces `ogr2ogr` (and the second copy
+# `etl.sql` made of its tables).  We read the Parquet files a record batch at
+# a time, convert each batch with vectorized Arrow and Shapely functions, and
+# stream the rows into unlogged staging tables with binary `COPY` over
+# several connections at once.  The traffic service then swaps them in with
+# one transaction, so a load that fails part way leaves the data as it was.
+# (Reads wait while the swap runs, but they never see a partial load.)
+
+#: This is the schema of the traffic tables.
+SCHEMA = "traffic"
+
+#: These are the columns we read from the links file.
+LINK_FIELDS = ("link_id", "road_name", "_length", "geo_json")
+
+#: These are the columns we read from the speed records file.
+SPEED_RECORD_FIELDS = (
+    "link_id",
+    "average_speed",
+    "day_of_week",
+    "period",
+    "date_time",
+)
+
+#: This is the spatial reference (WGS 84) of the link geometries.
+_SRID = 4326
+
+
+def dsn(settings: TrafficServiceSettings) -> str:
+    """
+    Get an asyncpg connection string from the traffic service settings.
+
+    :param settings: the traffic service settings
+    """
+    return (
+        make_url(settings.sqa_conn)
+        .set(drivername="postgresql")
+        .render_as_string(hide_password=False)
+    )
+
+
+@contextmanager
+def open_parquet(path: Path) -> Iterator[pq.ParquetFile]:
+    """
+    Open a Parquet file, decompressing it first if it's gzipped.
+
+    (Parquet readers need to seek, so a gzipped file is decompressed to a
+    temporary file rather than read as a stream.)
+
+    :param path: the path to the file
+    """
+    if path.suffix != ".gz":
+        yield pq.ParquetFile(path)
+        return
+    with tempfile.NamedTemporaryFile(suffix=".parquet") as tmp:
+        with gzip.open(path, "rb") as f:
+            shutil.copyfileobj(f, tmp)
+        tmp.flush()
+        yield pq.ParquetFile(tmp.name)
+
+
+def link_rows(batch: pa.RecordBatch) -> List[Tuple[Any, ...]]:
+    """
+    Convert a batch of the links file to `traffic.links` rows.
+
+    :param batch: the batch
+    """
+    geoms = shapely.from_geojson(
+        batch.column("geo_json").to_numpy(zero_copy_only=False)
+    )
+    # The data came in as MultiLineStrings, but each one holds a single
+    # line.
+    lines = shapely.set_srid(shapely.get_geometry(geoms, 0), _SRID)
+    # PostGIS accepts extended WKB (with the SRID) as a geometry's binary
+    # representation.
+    wkb = shapely.to_wkb(lines, include_srid=True)
+    return list(
+        zip(
+            batch.column("link_id").to_pylist(),
+            batch.column("road_name").to_pylist(),
+            _decimals(batch.column("_length")),
+            wkb.tolist(),
+        )
+    )
+
+
+def speed_record_rows(batch: pa.RecordBatch) -> List[Tuple[Any, ...]]:
+    """
+    Convert a batch of the speed records file to `traffic.speed_records`
+    rows.
+
+    :param batch: the batch
+    """
+    return list(
+        zip(
+            batch.column("link_id").to_pylist(),
+            batch.column("average_speed").to_pylist(),
+            batch.column("day_of_week").to_pylist(),
+            batch.column("period").to_pylist(),
+            _timestamps(batch.column("date_time")).to_pylist(),
+        )
+    )
+
+
+def _decimals(column: pa.Array) -> List[Optional[Decimal]]:
+    """
+    Convert a column of numbers to decimals for a `NUMERIC` column.
+
+    asyncpg copies a float into a `NUMERIC` column as `Decimal(float)`,
+    which keeps every binary digit (so 214.248 would be stored as
+    214.24799999999999045...).  We convert each float through its shortest
+    text form instead, so it's stored as it was written.
+
+    :param column: the column (of integers, floats or decimals)
+    """
+    if pa.types.is_decimal(column.type):
+        return column.to_pylist()
+    return [
+        None if value is None else Decimal(repr(value))
+        for value in pc.cast(column, pa.float64()).to_pylist()
+    ]
+
+
+def _timestamps(column: pa.Array) -> pa.Array:
+    """
+    Convert a column of dates and times to UTC timestamps.
+
+    :param column: the column (text or timestamps)
+    """
+    if pa.types.is_string(column.type) or pa.types.is_large_string(
+        column.type
+    ):
+        column = pc.cast(column, pa.timestamp("us"))
+    if column.type.tz is None:
+        # Like Postgres (running in UTC), we read times without a zone as
+        # UTC.
+        column = pc.assume_timezone(column, "UTC")
+    return column
+
+
+def time_range(parquet: pq.ParquetFile) -> Tuple[datetime, datetime]:
+    """
+    Find the earliest and latest times in the speed records file.
+
+    :param parquet: the speed records file
+    """
+    earliest = latest = None
+    for batch in parquet.iter_batches(columns=["date_time"]):
+        bounds = pc.min_max(_timestamps(batch.column("date_time")))
+        low, high = bounds["min"].as_py(), bounds["max"].as_py()
+        if low is not None:
+            earliest = low if earliest is None else min(earliest, low)
+            latest = high if latest is None else max(latest, high)
+    if earliest is None:
+        now = datetime.now(timezone.utc)
+        return now, now
+    return earliest, latest
+
+
+async def copy(
+    dsn_: str,
+    table: str,
+    columns: Sequence[str],
+    parquet: pq.ParquetFile,
+    fields: Sequence[str],
+    convert: Callable[[pa.RecordBatch], List[Tuple[Any, ...]]],
+    workers: int = 4,
+    batch_size: int = 50000,
+    on_rows: Callable[[int], None] = None,
+) -> LoadStats:
+    """
+    Copy a Parquet file into a table's staging table (see
+    :py:func:`~urban_sdk_homework.modules.traffic.queries.create_staging`).
+
+    One task reads and converts record batches while `workers` connections
+    copy them into the staging table.
+
+    :param dsn_: the asyncpg connection string
+    :param table: the table (rather than its staging table)
+    :param columns: the table columns
+    :param parquet: the Parquet file
+    :param fields: the Parquet columns to read
+    :param convert: a function that converts a record batch to table rows
+    :param workers: the number of connections that copy rows
+    :param batch_size: the number of rows in each batch
+    :param on_rows: a function called with the number of rows in each batch
+        once it has been copied
+    """
+    # The queue is bounded so the reader can't get too far ahead of the
+    # workers (and fill up memory).
+    queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+    batches = parquet.iter_batches(batch_size=batch_size, columns=list(fields))
+    copied = 0
+
+    async def read():
+        while True:
+            batch = await asyncio.to_thread(next, batches, None)
+            if batch is None:
+                break
+            await queue.put(await asyncio.to_thread(convert, batch))
+        for _ in range(workers):
+            await queue.put(None)
+
+    async def write():
+        nonlocal copied
+        conn = await asyncpg.connect(dsn_)
+        try:
+            if "geom" in columns:
+                # Pass geometries (as extended WKB) through untouched.
+                await conn.set_type_codec(
+                    "geometry",
+                    encoder=bytes,
+                    decoder=bytes,
+                    schema="public",
+                    format="binary",
+                )
+            while (rows := await queue.get()) is not None:
+                await conn.copy_records_to_table(
+                    staging(table),
+                    records=rows,
+                    columns=list(columns),
+                    schema_name=SCHEMA,
+                )
+                copied += len(rows)
+                if on_rows:
+                    on_rows(len(rows))
+        finally:
+            await conn.close()
+
+    started = time.perf_counter()
+    async with asyncio.TaskGroup() as tasks:
+        tasks.create_task(read())
+        for _ in range(workers):
+            tasks.create_task(write())
+    seconds = time.perf_counter() - started
+    return LoadStats(
+        table=f"{SCHEMA}.{table}",
+        rows=copied,
+        seconds=seconds,
+        rows_per_second=copied / seconds if seconds else 0.0,
+    )
@@ -1,14 +1,19 @@
 from datetime import datetime
 from enum import Enum
+from pathlib import Path
+from typing import Dict
 from typing import List
+from typing import Optional
 
 from geoalchemy2 import Geometry
 from pydantic import BaseModel
 from pydantic import ConfigDict
 from pydantic import field_validator
+from pydantic import model_validator
 from sqlmodel import Field
 from sqlmodel import SQLModel
 
+from urban_sdk_homework.core.cache import CacheStats
 from urban_sdk_homework.core.geometry import geojson
 
 
@@ -90,8 +95,80 @@ class TimePeriod(str, Enum):
         return list(TimePeriod).index(self) + 1  # Convert 0-based to 1-based
 
 
+class ResponseFormat(str, Enum):
+    """Response formats for traffic data."""
+
+    JSON = "json"
+    GEOJSON = "geojson"
+    NDJSON = "ndjson"
+    GEOJSONSEQ = "geojsonseq"
+
+    @property
+    def streaming(self) -> bool:
+        """Is this a format that's streamed one item at a time?"""
+        return self in (ResponseFormat.NDJSON, ResponseFormat.GEOJSONSEQ)
+
+
+class Engine(str, Enum):
+    """Engines that compute aggregates."""
+
+    SQL = "sql"
+    NUMPY = "numpy"
+
+
+class Grouping(str, Enum):
+    """How speed percentiles are grouped."""
+
+    LINK = "link"
+    ROAD = "road"
+    ALL = "all"
+
+
+class Resolution(str, Enum):
+    """Geometry resolutions."""
+
+    FULL = "full"
+    HIGH = "high"
+    MEDIUM = "medium"
+    LOW = "low"
+
+    @property
+    def tolerance(self) -> float:
+        """
+        Get the simplification tolerance (in degrees) of the geometry at
+        this resolution.
+
+        (These must match the tolerances used in `scripts/etl.sql`.)
+        """
+        return _TOLERANCES[self]
+
+    @property
+    def column(self) -> str:
+        """
+        Get the name of the `traffic.links` column that holds geometry at
+        this resolution.
+        """
+        return "geom" if self == Resolution.FULL else f"geom_{self.value}"
+
+
+#: These are the simplification tolerances (in degrees) for each resolution.
+#: (At Jacksonville's latitude, 0.00001 degrees is roughly a meter.)
+_TOLERANCES = {
+    Resolution.FULL: 0.0,
+    Resolution.HIGH: 0.00001,
+    Resolution.MEDIUM: 0.0001,
+    Resolution.LOW: 0.001,
+}
+
+
 class TrafficSQLModel(SQLModel):
-    """Base class for traffic SQLModel models."""
+    """
+    Base class for traffic SQLModel models.
+
+    The models only map the tables; the tables themselves (with their
+    indexes and partitions) are made by the migrations in
+    `urban_sdk_homework/modules/db/migrations.py`.
+    """
 
     __table_args__ = {"schema": "traffic"}
 
@@ -113,6 +190,23 @@ class Link(TrafficSQLModel, table=True):
         description="This is the link geometry.",
         sa_type=Geometry("LineString", 4326),
     )
+    # These simplified copies of the geometry are filled in by the ETL.
+    # They're only used to build responses, so they're never serialized.
+    geom_high: Optional[geojson.LineString] = Field(
+        default=None,
+        sa_type=Geometry("LineString", 4326, spatial_index=False),
+        exclude=True,
+    )
+    geom_medium: Optional[geojson.LineString] = Field(
+        default=None,
+        sa_type=Geometry("LineString", 4326, spatial_index=False),
+        exclude=True,
+    )
+    geom_low: Optional[geojson.LineString] = Field(
+        default=None,
+        sa_type=Geometry("LineString", 4326, spatial_index=False),
+        exclude=True,
+    )
 
 
 class SpeedRecord(TrafficSQLModel, table=True):
@@ -120,19 +214,21 @@ class SpeedRecord(TrafficSQLModel, table=True):
 
     __tablename__ = "speed_records"
 
-    id: int | None = Field(default=None, primary_key=True)
+    # A partitioned table's primary key has to include the partition key.
+    id: int | None = Field(
+        default=None,
+        primary_key=True,
+        sa_column_kwargs={"autoincrement": True},
+    )
     link_id: int = Field(
         description="The ID of the link to which this traffic count belongs.",
         foreign_key="traffic.links.link_id",
-        index=True,
     )
     day_of_week: int = Field(
         description="The day of the week for this traffic count.",
-        index=True,
     )
     period: int = Field(
         description="The time period for this traffic count.",
-        index=True,
     )
     speed: float = Field(
         description=(
@@ -143,7 +239,119 @@ class SpeedRecord(TrafficSQLModel, table=True):
     timestamp: datetime = Field(
         default=None,
         description="Indicates when this record was created.",
-        index=True,
+        primary_key=True,
+    )
+
+
+class LinkAggregate(TrafficSQLModel, table=True):
+    """Pre-computed speed statistics for a link, day and period."""
+
+    __tablename__ = "link_aggs"
+
+    link_id: int = Field(
+        description="The ID of the link to which these statistics belong.",
+        foreign_key="traffic.links.link_id",
+        primary_key=True,
+    )
+    day_of_week: int = Field(
+        description="The day of the week for these statistics.",
+        primary_key=True,
+    )
+    period: int = Field(
+        description="The time period for these statistics.",
+        primary_key=True,
+    )
+    speed: float = Field(
+        description="The average speed for the link, day and period.",
+    )
+    total: float = Field(
+        description=(
+            "This is the sum of all speeds.  We keep it so that new records "
+            "can be merged into the average incrementally."
+        ),
+    )
+    count: int = Field(
+        description="The number of speed records in the aggregate.",
+    )
+    min_speed: float = Field(
+        description="The lowest recorded speed.",
+    )
+    max_speed: float = Field(
+        description="The highest recorded speed.",
+    )
+
+
+class LinkSpeedBin(TrafficSQLModel, table=True):
+    """
+    The number of speed records that fall in a speed bin for a link, day and
+    period.
+
+    Together, the bins for a link, day and period form a histogram of its
+    speeds.  Histograms merge by adding up their bins' counts.
+    """
+
+    __tablename__ = "link_speed_bins"
+
+    link_id: int = Field(
+        description="The ID of the link to which this bin belongs.",
+        foreign_key="traffic.links.link_id",
+        primary_key=True,
+    )
+    day_of_week: int = Field(
+        description="The day of the week for this bin.",
+        primary_key=True,
+    )
+    period: int = Field(
+        description="The time period for this bin.",
+        primary_key=True,
+    )
+    bin: int = Field(
+        description=(
+            "This is the bin (the speed divided by the bin width, rounded "
+            "down)."
+        ),
+        primary_key=True,
+    )
+    count: int = Field(
+        description="The number of speed records in the bin.",
+    )
+
+
+class LinkAggregateState(TrafficSQLModel, table=True):
+    """Bookkeeping for incremental refreshes of the aggregates table."""
+
+    __tablename__ = "link_aggs_state"
+
+    id: int = Field(default=1, primary_key=True)
+    last_record_id: int = Field(
+        default=0,
+        description=(
+            "This is the highest speed record ID that has been merged into "
+            "the aggregates table."
+        ),
+    )
+    refreshed_at: datetime | None = Field(
+        default=None,
+        description="Indicates when the aggregates were last refreshed.",
+    )
+
+
+class DataVersion(TrafficSQLModel, table=True):
+    """A marker that changes whenever the traffic data changes."""
+
+    __tablename__ = "data_version"
+
+    id: int = Field(default=1, primary_key=True)
+    version: int = Field(
+        default=0,
+        description=(
+            "This is the data version.  It's incremented by the ETL and by "
+            "aggregate refreshes."
+        ),
+    )
+    updated_at: datetime | None = Field(
+        default=None,
+        description="Indicates when the data last changed.",
     )
 
 
@@ -188,6 +396,14 @@ class Aggregate(BaseModel):
         description="The geometry of the link.",
         title="Link Geometry",
     )
+    percentiles: Optional[Dict[str, float]] = Field(
+        default=None,
+        description=(
+            "These are the requested speed percentiles (keyed by name, like "
+            "`p85`)."
+        ),
+        title="Speed Percentiles",
+    )
 
     @field_validator("day_of_week", mode="before")
     @classmethod
@@ -228,6 +444,53 @@ class Aggregate(BaseModel):
             )
 
 
+class FeatureCollectionPage(BaseModel):
+    """A page of results assembled as a GeoJSON feature collection."""
+
+    body: str = Field(
+        description="This is the serialized GeoJSON feature collection.",
+    )
+    count: int = Field(
+        description="This is the number of features in the collection.",
+    )
+    last_link_id: Optional[int] = Field(
+        default=None,
+        description="This is the ID of the last link in the collection.",
+    )
+
+
+class Paging(BaseModel):
+    """Keyset pagination parameters."""
+
+    after: Optional[int] = Field(
+        default=None,
+        description="Only include links with IDs greater than this one.",
+        title="After",
+    )
+    limit: int = Field(
+        description="The maximum number of items on the page.",
+        ge=1,
+        title="Limit",
+    )
+
+
+class GeometryOptions(BaseModel):
+    """Options that control how link geometry is returned."""
+
+    resolution: Resolution = Field(
+        default=Resolution.FULL,
+        description="This is the resolution of the geometry.",
+        title="Resolution",
+    )
+    precision: Optional[int] = Field(
+        default=None,
+        description="This is the number of decimal places in coordinates.",
+        ge=0,
+        le=15,
+        title="Precision",
+    )
+
+
 class SpatialFilterParams(BaseModel):
     """Request model for spatial filtering."""
 
@@ -255,10 +518,330 @@ class SpatialFilterParams(BaseModel):
         le=7,
         title="Time Period",
     )
-    bbox: List[float] = Field(
+    bbox: Optional[List[float]] = Field(
+        default=None,
         description="Bounding box to filter links (minx, miny, maxx, maxy)",
         # example=[-81.8, 30.1, -81.6, 30.3],
         title="Bounding Box",
         min_length=4,
         max_length=4,
     )
+    polygon: Optional[geojson.Polygon] = Field(
+        default=None,
+        description=(
+            "GeoJSON polygon to filter links (If there's also a bounding "
+            "box, links must intersect both.)"
+        ),
+        title="Polygon",
+    )
+
+    @model_validator(mode="after")
+    def check_filter(self) -> "SpatialFilterParams":
+        """Make sure there's something to filter by."""
+        if self.bbox is None and self.polygon is None:
+            raise ValueError("Supply a bounding box, a polygon or both.")
+        return self
+
+
+class PercentileParams(BaseModel):
+    """Request model for speed percentiles."""
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "day": 2,
+                "period": 3,
+                "percentiles": [15, 50, 85],
+                "group_by": "road",
+                "bbox": [-81.8, 30.1, -81.6, 30.3],
+            }
+        }
+    )
+
+    day: int = Field(
+        description="Day of the week",
+        ge=1,
+        le=7,
+        title="Day of Week",
+    )
+    period: int = Field(
+        description="Time period",
+        ge=1,
+        le=7,
+        title="Time Period",
+    )
+    percentiles: List[float] = Field(
+        default_factory=lambda: [15.0, 50.0, 85.0],
+        description="These are the percentiles (between 0 and 100).",
+        min_length=1,
+        title="Percentiles",
+    )
+    group_by: Grouping = Field(
+        default=Grouping.LINK,
+        description=(
+            "This is how links are grouped: `link` for each link, `road` for "
+            "each road or `all` for every selected link at once."
+        ),
+        title="Group By",
+    )
+    link_ids: Optional[List[int]] = Field(
+        default=None,
+        description="Only include these links.",
+        title="Link IDs",
+    )
+    road_name: Optional[str] = Field(
+        default=None,
+        description="Only include links on this road.",
+        title="Road Name",
+    )
+    bbox: Optional[List[float]] = Field(
+        default=None,
+        description="Bounding box to filter links (minx, miny, maxx, maxy)",
+        title="Bounding Box",
+        min_length=4,
+        max_length=4,
+    )
+    polygon: Optional[geojson.Polygon] = Field(
+        default=None,
+        description="GeoJSON polygon to filter links",
+        title="Polygon",
+    )
+
+    @field_validator("percentiles")
+    @classmethod
+    def check_percentiles(cls, v: List[float]) -> List[float]:
+        """Make sure the percentiles are between 0 and 100."""
+        if any(p < 0 or p > 100 for p in v):
+            raise ValueError("Percentiles must be between 0 and 100.")
+        return v
+
+
+class SpeedPercentiles(BaseModel):
+    """Speed percentiles for a group of links."""
+
+    link_id: Optional[int] = Field(
+        default=None,
+        description="The ID of the link (when grouping by link).",
+        title="Link ID",
+    )
+    road_name: Optional[str] = Field(
+        default=None,
+        description="The name of the road (when grouping by road).",
+        title="Road Name",
+    )
+    count: int = Field(
+        description="The number of speed records in the group.",
+        title="Count",
+    )
+    percentiles: Dict[str, float] = Field(
+        description=(
+            "These are the speed percentiles (keyed by name, like `p85`)."
+        ),
+        title="Speed Percentiles",
+    )
+
+
+class LinkBatchRequest(BaseModel):
+    """Request model for batch link lookups."""
+
+    model_config = ConfigDict(
+        json_schema_extra={"example": {"link_ids": [1240632857, 1240632858]}}
+    )
+
+    link_ids: List[int] = Field(
+        description="These are the IDs of the links to look up.",
+        min_length=1,
+        title="Link IDs",
+    )
+
+
+class LinkBatch(BaseModel):
+    """The result of a batch link lookup."""
+
+    links: List[Link] = Field(
+        description=(
+            "These are the links that were found (in the order they were "
+            "requested)."
+        ),
+        title="Links",
+    )
+    missing: List[int] = Field(
+        description="These are the requested link IDs that don't exist.",
+        title="Missing",
+    )
+
+
+class SpeedProfile(BaseModel):
+    """A link's average speed for every day of the week and time period."""
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "link_id": 123,
+                "road_name": "Main St",
+                "length": 1500.0,
+                "days": [d.value for d in DayOfWeek],
+                "periods": [p.value for p in TimePeriod],
+                "speeds": [[41.2, 44.0, 30.5, None, 38.1, 27.9, 40.3]] * 7,
+            }
+        }
+    )
+
+    link_id: int = Field(
+        description="The ID of the link.",
+        title="Link ID",
+    )
+    road_name: Optional[str] = Field(
+        default=None,
+        description="The name of the road to which this link belongs.",
+        title="Road Name",
+    )
+    length: Optional[float] = Field(
+        default=None,
+        description="The length of the link in meters.",
+        title="Link Length",
+    )
+    days: List[DayOfWeek] = Field(
+        default_factory=lambda: list(DayOfWeek),
+        description="These are the days (the rows of `speeds`).",
+        title="Days",
+    )
+    periods: List[TimePeriod] = Field(
+        default_factory=lambda: list(TimePeriod),
+        description="These are the time periods (the columns of `speeds`).",
+        title="Time Periods",
+    )
+    speeds: List[List[Optional[float]]] = Field(
+        description=(
+            "These are the average speeds by day (row) and time period "
+            "(column).  Missing values are `null`."
+        ),
+        title="Speeds",
+    )
+    geom: Optional[geojson.LineString] = Field(
+        default=None,
+        description="The geometry of the link.",
+        title="Link Geometry",
+    )
+
+
+class SpeedProfileBatch(BaseModel):
+    """The result of a batch speed profile lookup."""
+
+    profiles: List[SpeedProfile] = Field(
+        description=(
+            "These are the profiles of the links that were found (in the "
+            "order they were requested)."
+        ),
+        title="Profiles",
+    )
+    missing: List[int] = Field(
+        description="These are the requested link IDs that don't exist.",
+        title="Missing",
+    )
+
+
+class AggregateRefresh(BaseModel):
+    """The outcome of an aggregates table refresh."""
+
+    full: bool = Field(
+        description="Indicates the aggregates were rebuilt from scratch.",
+        title="Full Refresh",
+    )
+    records: int = Field(
+        description="The number of speed records merged by the refresh.",
+        title="Records",
+    )
+    last_record_id: int = Field(
+        description="The highest speed record ID merged so far.",
+        title="Last Record ID",
+    )
+
+
+class LoadStats(BaseModel):
+    """Throughput statistics for a table loaded by the bulk loader."""
+
+    table: str = Field(description="The table.", title="Table")
+    rows: int = Field(description="The number of rows copied.", title="Rows")
+    seconds: float = Field(
+        description="The time it took to copy the rows.", title="Seconds"
+    )
+    rows_per_second: float = Field(
+        description="The number of rows copied per second.",
+        title="Rows per Second",
+    )
+
+
+class LoadResult(BaseModel):
+    """The outcome of a bulk load."""
+
+    links: LoadStats = Field(
+        description="The statistics for the links.", title="Links"
+    )
+    speed_records: LoadStats = Field(
+        description="The statistics for the speed records.",
+        title="Speed Records",
+    )
+    refresh: AggregateRefresh = Field(
+        description="The outcome of rebuilding the aggregates.",
+        title="Refresh",
+    )
+
+
+class SynthStats(BaseModel):
+    """Throughput statistics for a generated file."""
+
+    path: Path = Field(description="The file.", title="Path")
+    rows: int = Field(description="The number of rows written.", title="Rows")
+    seconds: float = Field(
+        description="The time it took to write the rows.", title="Seconds"
+    )
+    rows_per_second: float = Field(
+        description="The number of rows written per second.",
+        title="Rows per Second",
+    )
+
+
+class SynthResult(BaseModel):
+    """The outcome of generating a synthetic dataset."""
+
+    links: SynthStats = Field(
+        description="The statistics for the links.", title="Links"
+    )
+    speed_records: SynthStats = Field(
+        description="The statistics for the speed records.",
+        title="Speed Records",
+    )
+
+
+class SpeedRecordPartition(BaseModel):
+    """A partition of the speed records table."""
+
+    name: str = Field(description="The partition's name.", title="Name")
+    parent: str = Field(
+        description="The partitioned table it belongs to.", title="Parent"
+    )
+    bounds: str = Field(
+        description="The values the partition holds.", title="Bounds"
+    )
+    rows: int = Field(
+        description="The (estimated) number of rows in the partition.",
+        title="Rows",
+    )
+
+
+class TrafficCacheStats(BaseModel):
+    """Traffic service cache statistics."""
+
+    data_version: Optional[int] = Field(
+        description="This is the data version the caches hold.",
+        title="Data Version",
+    )
+    responses: CacheStats = Field(
+        description="These are the statistics for cached query results.",
+        title="Responses",
+    )
+    tiles: CacheStats = Field(
+        description="These are the statistics for cached vector tiles.",
+        title="Tiles",
+    )
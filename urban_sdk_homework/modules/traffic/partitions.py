@@ -0,0 +1,181 @@
+from datetime import date
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy import TextClause
+
+# Note to the Future: `traffic.speed_records` is partitioned by month (on
+# "timestamp") and, optionally, each month is sub-partitioned by day of the
+# week.  Postgres skips partitions that can't match a query's time window (or
+# day), and old months can be detached (and archived or dropped) without
+# touching the rest of the table.
+
+#: This is the schema of the speed records table.
+SCHEMA = "traffic"
+
+#: This is the name of the (partitioned) speed records table.
+TABLE = "speed_records"
+
+#: This is the name of the partition that holds records outside every month.
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+#: This is the key of the advisory lock held while partitions are created
+#: (so two callers can't create the same one).
+LOCK_KEY = 0x7D8A5E33
+
+
+def lock() -> TextClause:
+    """Wait for the partition lock (until the transaction ends)."""
+    return text("SELECT pg_advisory_xact_lock(:key)").bindparams(key=LOCK_KEY)
+
+
+def months(start: datetime, end: datetime) -> List[date]:
+    """
+    Get the first day of every month in a time range.
+
+    :param start: the start of the range
+    :param end: the end of the range (inclusive)
+    """
+    month, last = date(start.year, start.month, 1), date(
+        end.year, end.month, 1
+    )
+    result = []
+    while month <= last:
+        result.append(month)
+        month = _next(month)
+    return result
+
+
+def name(month: date) -> str:
+    """
+    Get the name of a month's partition (like `speed_records_2024_01`).
+
+    :param month: the month
+    """
+    return f"{TABLE}_{month:%Y_%m}"
+
+
+def create(month: date, by_day: bool = False) -> List[TextClause]:
+    """
+    Create a month's partition (which mustn't already exist).
+
+    Records for the month may already be in the default partition (if they
+    arrived before the partition existed), and Postgres won't add a
+    partition that would leave them there.  So we build the partition as a
+    standalone table, move the month's records into it from the default
+    partition, and then attach it.
+
+    :param month: the month
+    :param by_day: sub-partition the month by day of the week
+    :returns: the statements to execute (in order, in one transaction)
+    """
+    partition = name(month)
+    start, end = _bound(month), _bound(_next(month))
+    statements = [
+        text(
+            f'CREATE TABLE "{SCHEMA}"."{partition}" '
+            f'(LIKE "{SCHEMA}"."{TABLE}" '
+            "INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            + (' PARTITION BY LIST ("day_of_week")' if by_day else "")
+        )
+    ]
+    if by_day:
+        statements.extend(
+            text(
+                f'CREATE TABLE "{SCHEMA}"."{partition}_d{day}" '
+                f'PARTITION OF "{SCHEMA}"."{partition}" FOR VALUES IN ({day})'
+            )
+            for day in range(1, 8)
+        )
+    statements.append(
+        text(
+            "WITH moved AS ("
+            f'DELETE FROM "{SCHEMA}"."{DEFAULT_PARTITION}" '
+            f'WHERE "timestamp" >= {start} AND "timestamp" < {end} '
+            "RETURNING *) "
+            f'INSERT INTO "{SCHEMA}"."{partition}" SELECT * FROM moved'
+        )
+    )
+    statements.append(
+        text(
+            f'ALTER TABLE "{SCHEMA}"."{TABLE}" '
+            f'ATTACH PARTITION "{SCHEMA}"."{partition}" '
+            f"FOR VALUES FROM ({start}) TO ({end})"
+        )
+    )
+    return statements
+
+
+def attached(month: date) -> TextClause:
+    """
+    Check whether a month's partition is attached.
+
+    The result is `NULL` if there's no table with the partition's name, or
+    `FALSE` if there's a standalone one (like a detached partition).
+
+    :param month: the month
+    """
+    return text(
+        "SELECT c.relispartition FROM pg_class AS c "
+        "JOIN pg_namespace AS n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = :schema AND c.relname = :name"
+    ).bindparams(schema=SCHEMA, name=name(month))
+
+
+def detach(month: date) -> TextClause:
+    """
+    Detach a month's partition from the speed records table.
+
+    The partition is kept as a standalone table.
+
+    :param month: the month
+    """
+    return text(
+        f'ALTER TABLE "{SCHEMA}"."{TABLE}" '
+        f'DETACH PARTITION "{SCHEMA}"."{name(month)}"'
+    )
+
+
+def drop(month: date) -> TextClause:
+    """
+    Drop a (detached) month's partition.
+
+    :param month: the month
+    """
+    return text(f'DROP TABLE IF EXISTS "{SCHEMA}"."{name(month)}"')
+
+
+def tree() -> TextClause:
+    """Select the partitions of the speed records table."""
+    return text(
+        "SELECT "
+        "t.relid::TEXT AS name, "
+        "t.parentrelid::TEXT AS parent, "
+        "pg_get_expr(c.relpartbound, c.oid) AS bounds, "
+        "GREATEST(c.reltuples, 0)::BIGINT AS rows "
+        f'FROM pg_partition_tree(\'"{SCHEMA}"."{TABLE}"\') AS t '
+        "JOIN pg_class AS c ON c.oid = t.relid "
+        "WHERE t.level > 0 "
+        "ORDER BY t.relid::TEXT"
+    )
+
+
+def _bound(month: date) -> str:
+    """
+    Get the start of a month as a partition bound (a UTC timestamp literal).
+
+    :param month: the first day of a month
+    """
+    return f"'{month:%Y-%m-%d} 00:00:00+00'"
+
+
+def _next(month: date) -> date:
+    """
+    Get the first day of the following month.
+
+    :param month: the first day of a month
+    """
+    if month.month == 12:
+        return date(month.year + 1, 1, 1)
+    return date(month.year, month.month + 1, 1)
@@ -0,0 +1,1159 @@
+import json
+from datetime import datetime
+from itertools import groupby
+from typing import Any
+from typing import Iterable
+from typing import List
+from typing import Sequence
+from typing import Tuple
+
+from sqlalchemy import any_
+from sqlalchemy import BigInteger
+from sqlalchemy import bindparam
+from sqlalchemy import cast
+from sqlalchemy import func
+from sqlalchemy import Integer
+from sqlalchemy import JSON
+from sqlalchemy import literal_column
+from sqlalchemy import null
+from sqlalchemy import Select
+from sqlalchemy import Subquery
+from sqlalchemy import Text
+from sqlalchemy import text
+from sqlalchemy import TextClause
+from sqlalchemy import Update
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import array
+from sqlalchemy.dialects.postgresql import Insert
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import select
+
+from urban_sdk_homework.core import timing
+from urban_sdk_homework.core.geometry import geojson
+from urban_sdk_homework.modules.traffic.histograms import BIN_WIDTH
+from urban_sdk_homework.modules.traffic.histograms import SpeedHistogram
+from urban_sdk_homework.modules.traffic.models import Aggregate
+from urban_sdk_homework.modules.traffic.models import DataVersion
+from urban_sdk_homework.modules.traffic.models import DayOfWeek
+from urban_sdk_homework.modules.traffic.models import FeatureCollectionPage
+from urban_sdk_homework.modules.traffic.models import GeometryOptions
+from urban_sdk_homework.modules.traffic.models import Grouping
+from urban_sdk_homework.modules.traffic.models import Link
+from urban_sdk_homework.modules.traffic.models import LinkAggregate
+from urban_sdk_homework.modules.traffic.models import LinkAggregateState
+from urban_sdk_homework.modules.traffic.models import LinkSpeedBin
+from urban_sdk_homework.modules.traffic.models import Resolution
+from urban_sdk_homework.modules.traffic.models import SpeedPercentiles
+from urban_sdk_homework.modules.traffic.models import SpeedProfile
+from urban_sdk_homework.modules.traffic.models import SpeedRecord
+from urban_sdk_homework.modules.traffic.models import TimePeriod
+
+# Note to the Future: These functions build the statements shared by the
+# synchronous and asynchronous traffic services.  The services only decide
+# how the statements are executed.
+
+
+#: This is the name of the layer in vector tiles.
+TILE_LAYER = "links"
+
+#: This is the size of a vector tile in tile coordinates.
+TILE_EXTENT = 4096
+
+#: This is the number of tile coordinates geometries extend past the edge
+#: of a tile (so lines aren't clipped visibly at the seams).
+TILE_BUFFER = 64
+
+#: This is the fraction of a tile we search beyond its edges (to match the
+#: buffer).
+TILE_MARGIN = TILE_BUFFER / TILE_EXTENT
+
+#: This is the key of the advisory lock held while the aggregates are
+#: refreshed (so two refreshes can't run at once).
+REFRESH_LOCK_KEY = 0x7D8A5E32
+
+#: These are the columns of `traffic.links` the loader fills in.
+LINK_COLUMNS = ("link_id", "road_name", "length", "geom")
+
+#: These are the columns of `traffic.speed_records` the loader fills in.
+SPEED_RECORD_COLUMNS = (
+    "link_id",
+    "speed",
+    "day_of_week",
+    "period",
+    "timestamp",
+)
+
+#: These are the tables the loader fills in (through staging tables), in
+#: the order they're filled, and their columns.
+_LOADED = (("links", LINK_COLUMNS), ("speed_records", SPEED_RECORD_COLUMNS))
+
+#: This is the width of the world in Web Mercator (meters).
+_WORLD = 40075016.68557849
+
+
+def aggregates(
+    day: int,
+    period: int,
+    link_id: int = None,
+    link_ids: Sequence[int] = None,
+    bbox: Tuple[float, float, float, float] = None,
+    start: datetime = None,
+    end: datetime = None,
+    after: int = None,
+    limit: int = 10,
+    materialized: bool = True,
+    geometry: GeometryOptions = None,
+) -> Select:
+    """
+    Select the aggregated speed per link for a day and period.
+
+    If there's a time window, the aggregates are always computed from the
+    raw speed records (and Postgres only reads the partitions that overlap
+    the window).
+
+    :param day: the day of the week
+    :param period: the time period
+    :param link_id: limit the results to a single link
+    :param link_ids: limit the results to several links
+    :param bbox: limit the results to links within a bounding box
+    :param start: only include speed records from this time on
+    :param end: only include speed records from before this time
+    :param after: only select links with IDs greater than this one
+    :param limit: the maximum number of rows
+    :param materialized: read from the pre-computed aggregates table
+    :param geometry: the geometry resolution and precision
+    """
+    # The pre-computed aggregates cover all time.
+    materialized = materialized and start is None and end is None
+    geom = _as_geojson(geometry)
+    statement = (
+        _materialized_aggregates(day=day, period=period, geom=geom)
+        if materialized
+        else _raw_aggregates(day=day, period=period, geom=geom)
+    )
+    # We page through the results by seeking on the link ID of the table
+    # that drives the query (rather than the joined links) so the planner
+    # can use its index.
+    key = LinkAggregate.link_id if materialized else SpeedRecord.link_id
+    # Only add link_id filter if the argument was supplied.
+    if link_id is not None:
+        statement = statement.where(key == link_id)
+    if link_ids is not None:
+        statement = statement.where(key == any_(_ids(link_ids)))
+    # Add spatial filter if bbox is provided
+    if bbox is not None:
+        statement = statement.where(_intersects(bbox))
+    if start is not None:
+        statement = statement.where(SpeedRecord.timestamp >= start)
+    if end is not None:
+        statement = statement.where(SpeedRecord.timestamp < end)
+    # Build the rest of the statement.
+    return _page(statement, key=key, after=after, limit=limit)
+
+
+def _materialized_aggregates(day: int, period: int, geom: Any) -> Select:
+    """
+    Select aggregates from the pre-computed `traffic.link_aggs` table.
+
+    :param day: the day of the week
+    :param period: the time period
+    :param geom: the geometry column
+    """
+    return (
+        select(
+            LinkAggregate.link_id,
+            LinkAggregate.day_of_week,
+            LinkAggregate.period,
+            LinkAggregate.speed,
+            Link.road_name,
+            Link.length,
+            geom,
+        )
+        .join(Link, LinkAggregate.link_id == Link.link_id)
+        .where(
+            LinkAggregate.day_of_week == day,
+            LinkAggregate.period == period,
+        )
+    )
+
+
+def _raw_aggregates(day: int, period: int, geom: Any) -> Select:
+    """
+    Select aggregates computed from the raw speed records.
+
+    :param day: the day of the week
+    :param period: the time period
+    :param geom: the geometry column
+    """
+    return (
+        select(
+            SpeedRecord.link_id,
+            SpeedRecord.day_of_week,
+            SpeedRecord.period,
+            func.avg(SpeedRecord.speed).label("speed"),
+            Link.road_name,
+            Link.length,
+            geom,
+        )
+        .join(Link, SpeedRecord.link_id == Link.link_id)
+        .where(
+            SpeedRecord.day_of_week == day,
+            SpeedRecord.period == period,
+        )
+        .group_by(
+            SpeedRecord.link_id,
+            SpeedRecord.day_of_week,
+            SpeedRecord.period,
+            Link.link_id,
+        )
+    )
+
+
+def links(
+    link_id: int = None,
+    link_ids: Sequence[int] = None,
+    bbox: Tuple[float, float, float, float] = None,
+    day: int = None,
+    period: int = None,
+    after: int = None,
+    limit: int = 10,
+    materialized: bool = True,
+    geometry: GeometryOptions = None,
+) -> Select:
+    """
+    Select links by ID, or all links if no ID is provided.
+
+    :param link_id: the ID of the link to retrieve
+    :param link_ids: the IDs of several links to retrieve
+    :param bbox: limit the results to links within a bounding box
+    :param day: limit the results to links with records on this day
+    :param period: limit the results to links with records in this period
+    :param after: only select links with IDs greater than this one
+    :param limit: the maximum number of rows
+    :param materialized: read from the pre-computed aggregates table
+    :param geometry: the geometry resolution and precision
+    """
+    # TODO: Use a more efficient query to fetch only the necessary
+    # fields. This query fetches the link_id, road_name, and geometry
+    # as GeoJSON and we convert it to a `LineString`.  We can do this
+    # automatically to prevent repetitive code.
+    statement = select(
+        Link.link_id,
+        Link.road_name,
+        Link.length,
+        _as_geojson(geometry),
+    )
+    # Only add link_id filter if the caller has supplied one.
+    if link_id is not None:
+        statement = statement.where(Link.link_id == link_id)
+    # Look up many links with a single array parameter (`= ANY(:ids)`)
+    # rather than a parameter for each one.
+    if link_ids is not None:
+        statement = statement.where(Link.link_id == any_(_ids(link_ids)))
+    # If a bounding box is provided, use it to filter the links.
+    if bbox is not None:
+        statement = statement.where(_intersects(bbox))
+    # If day and period are provided, only select links that have speed
+    # records for them.  (We use a semi-join so that each link appears only
+    # once no matter how many records it has.)
+    if day is not None and period is not None:
+        records = LinkAggregate if materialized else SpeedRecord
+        statement = statement.where(
+            select(records.link_id)
+            .where(
+                records.link_id == Link.link_id,
+                records.day_of_week == day,
+                records.period == period,
+            )
+            .exists()
+        )
+    # Add ordering and limit to the query.
+    return _page(statement, key=Link.link_id, after=after, limit=limit)
+
+
+def profiles(
+    link_ids: Sequence[int],
+    materialized: bool = True,
+    geometry: GeometryOptions = None,
+) -> Select:
+    """
+    Select the average speed for every day and period of several links.
+
+    Each link is a single row: the day, period and speed of every aggregate
+    are collected into parallel arrays so that the geometry is only
+    selected once.
+
+    :param link_ids: the IDs of the links
+    :param materialized: read from the pre-computed aggregates table
+    :param geometry: the geometry resolution and precision
+    """
+    ids = _ids(link_ids)
+    if materialized:
+        source = select(
+            LinkAggregate.link_id,
+            LinkAggregate.day_of_week,
+            LinkAggregate.period,
+            LinkAggregate.speed,
+        ).where(LinkAggregate.link_id == any_(ids))
+    else:
+        source = (
+            select(
+                SpeedRecord.link_id,
+                SpeedRecord.day_of_week,
+                SpeedRecord.period,
+                func.avg(SpeedRecord.speed).label("speed"),
+            )
+            .where(SpeedRecord.link_id == any_(ids))
+            .group_by(
+                SpeedRecord.link_id,
+                SpeedRecord.day_of_week,
+                SpeedRecord.period,
+            )
+        )
+    source = source.subquery("source")
+    # We use an outer join so links without any speeds still have (empty)
+    # profiles.
+    return (
+        select(
+            Link.link_id,
+            Link.road_name,
+            Link.length,
+            _as_geojson(geometry),
+            func.array_agg(source.c.day_of_week).label("days"),
+            func.array_agg(source.c.period).label("periods"),
+            func.array_agg(source.c.speed).label("speeds"),
+        )
+        .outerjoin(source, source.c.link_id == Link.link_id)
+        .where(Link.link_id == any_(ids))
+        .group_by(Link.link_id)
+        .order_by(Link.link_id)
+    )
+
+
+def slow_links(
+    period: int,
+    threshold: float,
+    min_days: int = 3,
+    after: int = None,
+    limit: int = 10,
+    materialized: bool = True,
+    geometry: GeometryOptions = None,
+) -> Select:
+    """
+    Select links that have been consistently slow during a period.
+
+    A link is slow on a given day of the week when its average speed for
+    that day and period falls below the threshold; the speed selected is
+    the average over its slow days.
+
+    :param period: the time period
+    :param threshold: the speed threshold
+    :param min_days: the minimum number of slow days
+    :param after: only select links with IDs greater than this one
+    :param limit: the maximum number of rows
+    :param materialized: read from the pre-computed aggregates table
+    :param geometry: the geometry resolution and precision
+    """
+    builder = _materialized_slow_links if materialized else _raw_slow_links
+    statement = builder(
+        period=period,
+        threshold=threshold,
+        min_days=min_days,
+        geom=_as_geojson(geometry),
+    )
+    return _page(statement, key=Link.link_id, after=after, limit=limit)
+
+
+def _materialized_slow_links(
+    period: int, threshold: float, min_days: int, geom: Any
+) -> Select:
+    """
+    Select slow links from the pre-computed `traffic.link_aggs` table.
+
+    A link is slow on a given day of the week when its average speed for
+    that day and period falls below the threshold.
+
+    :param period: the time period
+    :param threshold: the speed threshold
+    :param min_days: the minimum number of slow days
+    :param geom: the geometry column
+    """
+    return (
+        select(
+            Link.link_id,
+            Link.road_name,
+            Link.length,
+            (
+                func.sum(LinkAggregate.total) / func.sum(LinkAggregate.count)
+            ).label("speed"),
+            geom,
+        )
+        .join(LinkAggregate, LinkAggregate.link_id == Link.link_id)
+        .where(
+            LinkAggregate.period == period,
+            LinkAggregate.speed < threshold,
+        )
+        .group_by(Link.link_id)
+        .having(func.count() >= min_days)
+    )
+
+
+def _raw_slow_links(
+    period: int, threshold: float, min_days: int, geom: Any
+) -> Select:
+    """
+    Select slow links from the raw speed records.
+
+    Days are counted the same way :py:func:`_materialized_slow_links` counts
+    them: by the average speed for each day of the week.
+
+    :param period: the time period
+    :param threshold: the speed threshold
+    :param min_days: the minimum number of slow days
+    :param geom: the geometry column
+    """
+    days = (
+        select(
+            SpeedRecord.link_id,
+            func.sum(SpeedRecord.speed).label("total"),
+            func.count(SpeedRecord.speed).label("count"),
+        )
+        .where(SpeedRecord.period == period)
+        .group_by(SpeedRecord.link_id, SpeedRecord.day_of_week)
+        .having(func.avg(SpeedRecord.speed) < threshold)
+        .subquery("days")
+    )
+    return (
+        select(
+            Link.link_id,
+            Link.road_name,
+            Link.length,
+            (func.sum(days.c.total) / func.sum(days.c.count)).label("speed"),
+            geom,
+        )
+        .join(days, days.c.link_id == Link.link_id)
+        .group_by(Link.link_id)
+        .having(func.count() >= min_days)
+    )
+
+
+def tile(
+    day: int,
+    period: int,
+    z: int,
+    x: int,
+    y: int,
+    materialized: bool = True,
+) -> Select:
+    """
+    Select a Mapbox Vector Tile of the aggregated speed per link for a day
+    and period.
+
+    The tile has a single layer (`links`) with `link_id`, `road_name`,
+    `length` and `speed` attributes.
+
+    :param day: the day of the week
+    :param period: the time period
+    :param z: the tile's zoom level
+    :param x: the tile's column
+    :param y: the tile's row
+    :param materialized: read from the pre-computed aggregates table
+    """
+    # This is the tile's extent in Web Mercator.
+    envelope = func.ST_TileEnvelope(z, x, y)
+    geom = func.ST_AsMVTGeom(
+        func.ST_Transform(_geometry(_tile_resolution(z)), 3857),
+        envelope,
+        TILE_EXTENT,
+        TILE_BUFFER,
+    ).label("geom")
+    source = (
+        _materialized_aggregates(day=day, period=period, geom=geom)
+        if materialized
+        else _raw_aggregates(day=day, period=period, geom=geom)
+    ).where(
+        # We compare in the links' own SRS so the spatial index is used.
+        func.ST_Intersects(
+            Link.geom,
+            func.ST_Transform(
+                func.ST_Expand(envelope, TILE_MARGIN * _WORLD / 2**z), 4326
+            ),
+        )
+    )
+    source = source.subquery("source")
+    features = (
+        select(
+            source.c.link_id,
+            source.c.road_name,
+            source.c.length,
+            source.c.speed,
+            source.c.geom,
+        )
+        .where(source.c.geom.is_not(None))
+        .subquery("features")
+    )
+    return select(
+        func.coalesce(
+            func.ST_AsMVT(
+                features.table_valued(),
+                _const(TILE_LAYER),
+                TILE_EXTENT,
+                _const("geom"),
+            ),
+            literal_column("''::bytea"),
+        ).label("tile")
+    )
+
+
+def speed_bins(
+    day: int,
+    period: int,
+    group_by: Grouping = Grouping.LINK,
+    link_ids: Sequence[int] = None,
+    road_name: str = None,
+    start: datetime = None,
+    end: datetime = None,
+    after: int = None,
+    limit: int = None,
+) -> Select:
+    """
+    Select merged speed histograms: the number of speed records in each bin
+    for each group of links.
+
+    Rows are ordered by group and then by bin.
+
+    :param day: the day of the week
+    :param period: the time period
+    :param group_by: how links are grouped
+    :param link_ids: only include these links
+    :param road_name: only include links on this road
+    :param start: only count speed records from this time on
+    :param end: only count speed records from before this time
+    :param after: only include links with IDs greater than this one (when
+        grouping by link)
+    :param limit: the maximum number of links (when grouping by link)
+    """
+    # The pre-computed histograms cover all time, so a time window has to
+    # be binned from the records.
+    bins = (
+        LinkSpeedBin.__table__
+        if start is None and end is None
+        else _windowed_bins(start=start, end=end)
+    )
+    key = {
+        Grouping.LINK: bins.c.link_id,
+        Grouping.ROAD: Link.road_name,
+        Grouping.ALL: null(),
+    }[group_by]
+    filters = [
+        bins.c.day_of_week == day,
+        bins.c.period == period,
+    ]
+    if link_ids is not None:
+        filters.append(bins.c.link_id == any_(_ids(link_ids)))
+    if road_name is not None:
+        filters.append(Link.road_name == road_name)
+    if group_by == Grouping.LINK and (after is not None or limit is not None):
+        # Page through the links (rather than the bins).
+        page = _page(
+            _bins(select(bins.c.link_id), bins, road_name, group_by)
+            .where(*filters)
+            .distinct(),
+            key=bins.c.link_id,
+            after=after,
+            limit=limit,
+        )
+        filters.append(bins.c.link_id.in_(page.scalar_subquery()))
+    # Merging histograms is just adding up the counts in each bin.  (`SUM`
+    # of a `BIGINT` is a `numeric`, which we'd get back as a `Decimal`.)
+    count = cast(func.sum(bins.c.count), BigInteger)
+    statement = _bins(
+        select(key.label("key"), bins.c.bin, count.label("count")),
+        bins,
+        road_name,
+        group_by,
+    ).where(*filters)
+    if group_by == Grouping.ALL:
+        return statement.group_by(bins.c.bin).order_by(bins.c.bin)
+    return statement.group_by(key, bins.c.bin).order_by(key, bins.c.bin)
+
+
+def _windowed_bins(start: datetime = None, end: datetime = None) -> Subquery:
+    """
+    Select speed histograms (shaped like `traffic.link_speed_bins`) from the
+    speed records in a time window.
+
+    :param start: only count speed records from this time on
+    :param end: only count speed records from before this time
+    """
+    bin_ = _speed_bin()
+    statement = select(
+        SpeedRecord.link_id,
+        SpeedRecord.day_of_week,
+        SpeedRecord.period,
+        # This matches the type of the table's `bin` column.
+        cast(bin_, Integer).label("bin"),
+        func.count().label("count"),
+    ).where(SpeedRecord.speed.is_not(None))
+    if start is not None:
+        statement = statement.where(SpeedRecord.timestamp >= start)
+    if end is not None:
+        statement = statement.where(SpeedRecord.timestamp < end)
+    return statement.group_by(
+        SpeedRecord.link_id,
+        SpeedRecord.day_of_week,
+        SpeedRecord.period,
+        bin_,
+    ).subquery("bins")
+
+
+def _bins(
+    statement: Select, bins: Any, road_name: str, group_by: Grouping
+) -> Select:
+    """
+    Join the links to a statement that selects speed bins (if the links are
+    needed).
+
+    :param statement: the statement
+    :param bins: the table (or subquery) the bins come from
+    :param road_name: the road name filter
+    :param group_by: how links are grouped
+    """
+    if road_name is None and group_by != Grouping.ROAD:
+        return statement
+    return statement.join(Link, bins.c.link_id == Link.link_id)
+
+
+def _speed_bin() -> Any:
+    """Get the speed bin of a speed record."""
+    # The width is a literal (rather than a parameter) so that the grouping
+    # expression matches the selected one exactly.
+    return func.floor(SpeedRecord.speed / literal_column(repr(BIN_WIDTH)))
+
+
+def aggregate_upsert(*where: Any) -> Insert:
+    """
+    Merge the speed records that match some conditions into the aggregates.
+
+    Records without a speed are skipped, like `AVG` skips them.
+
+    :param where: the conditions
+    """
+    total = func.sum(SpeedRecord.speed)
+    n = func.count(SpeedRecord.speed)
+    upsert = insert(LinkAggregate).from_select(
+        [
+            "link_id",
+            "day_of_week",
+            "period",
+            "speed",
+            "total",
+            "count",
+            "min_speed",
+            "max_speed",
+        ],
+        select(
+            SpeedRecord.link_id,
+            SpeedRecord.day_of_week,
+            SpeedRecord.period,
+            total / n,
+            total,
+            n,
+            func.min(SpeedRecord.speed),
+            func.max(SpeedRecord.speed),
+        )
+        .where(SpeedRecord.speed.is_not(None), *where)
+        .group_by(
+            SpeedRecord.link_id,
+            SpeedRecord.day_of_week,
+            SpeedRecord.period,
+        ),
+    )
+    # Merge the new statistics into any that already exist.
+    table, new = LinkAggregate.__table__.c, upsert.excluded
+    return upsert.on_conflict_do_update(
+        index_elements=["link_id", "day_of_week", "period"],
+        set_={
+            "speed": (table.total + new.total) / (table.count + new.count),
+            "total": table.total + new.total,
+            "count": table.count + new.count,
+            "min_speed": func.least(table.min_speed, new.min_speed),
+            "max_speed": func.greatest(table.max_speed, new.max_speed),
+        },
+    )
+
+
+def speed_bin_upsert(*where: Any) -> Insert:
+    """
+    Merge the speed records that match some conditions into the speed bins.
+
+    :param where: the conditions
+    """
+    bin_ = _speed_bin()
+    upsert = insert(LinkSpeedBin).from_select(
+        ["link_id", "day_of_week", "period", "bin", "count"],
+        select(
+            SpeedRecord.link_id,
+            SpeedRecord.day_of_week,
+            SpeedRecord.period,
+            bin_,
+            func.count(),
+        )
+        .where(SpeedRecord.speed.is_not(None), *where)
+        .group_by(
+            SpeedRecord.link_id,
+            SpeedRecord.day_of_week,
+            SpeedRecord.period,
+            bin_,
+        ),
+    )
+    count = LinkSpeedBin.__table__.c.count
+    return upsert.on_conflict_do_update(
+        index_elements=["link_id", "day_of_week", "period", "bin"],
+        set_={"count": count + upsert.excluded.count},
+    )
+
+
+def speed_columns() -> Select:
+    """
+    Select the speed record columns the NumPy engine keeps in memory.
+    """
+    return select(
+        SpeedRecord.link_id,
+        SpeedRecord.day_of_week,
+        SpeedRecord.period,
+        SpeedRecord.speed,
+    ).where(SpeedRecord.speed.is_not(None))
+
+
+def link_geometries() -> Select:
+    """
+    Select every link's ID and geometry (as well-known binary) for the
+    in-memory spatial index.
+    """
+    return select(Link.link_id, func.ST_AsBinary(Link.geom))
+
+
+def simplify_links() -> Update:
+    """
+    Fill in the simplified copies of every link's geometry.
+
+    Links that would simplify to a point are kept as two-point lines so they
+    don't disappear.
+    """
+    return update(Link).values(
+        {
+            resolution.column: func.ST_Simplify(
+                Link.geom, resolution.tolerance, True
+            )
+            for resolution in Resolution
+            if resolution != Resolution.FULL
+        }
+    )
+
+
+def staging(table: str) -> str:
+    """
+    Get the name of the staging table the loader copies a table's rows into.
+
+    :param table: the table
+    """
+    return f"{table}_load"
+
+
+def create_staging() -> List[TextClause]:
+    """
+    Create empty staging tables for the loader (replacing any a failed load
+    left behind).
+
+    They're unlogged and have no indexes or constraints, so copying into
+    them is cheap.
+
+    :returns: the statements to execute (in order)
+    """
+    statements = []
+    for table, columns in _LOADED:
+        statements.append(
+            text(f'DROP TABLE IF EXISTS "traffic"."{staging(table)}"')
+        )
+        statements.append(
+            text(
+                f'CREATE UNLOGGED TABLE "traffic"."{staging(table)}" AS '
+                f"SELECT {_columns(columns)} "
+                f'FROM "traffic"."{table}" WITH NO DATA'
+            )
+        )
+    return statements
+
+
+def replace_from_staging() -> List[TextClause]:
+    """
+    Replace the links and speed records (and empty everything derived from
+    them) with the contents of the staging tables, then drop the staging
+    tables.
+
+    `TRUNCATE` locks the tables (even against reads) until the transaction
+    ends.
+
+    :returns: the statements to execute (in order, in one transaction)
+    """
+    statements = [
+        text(
+            'TRUNCATE "traffic"."links", "traffic"."speed_records" '
+            "RESTART IDENTITY CASCADE"
+        )
+    ]
+    for table, columns in _LOADED:
+        statements.append(
+            text(
+                f'INSERT INTO "traffic"."{table}"({_columns(columns)}) '
+                f"SELECT {_columns(columns)} "
+                f'FROM "traffic"."{staging(table)}"'
+            )
+        )
+        statements.append(text(f'DROP TABLE "traffic"."{staging(table)}"'))
+    return statements
+
+
+def _columns(columns: Sequence[str]) -> str:
+    """
+    Quote and join column names.
+
+    :param columns: the column names
+    """
+    return ", ".join(f'"{column}"' for column in columns)
+
+
+def data_version() -> Select:
+    """Select the current data version."""
+    return select(DataVersion.version).where(DataVersion.id == 1)
+
+
+def refresh_lock() -> TextClause:
+    """Wait for the aggregate refresh lock (until the transaction ends)."""
+    return text("SELECT pg_advisory_xact_lock(:key)").bindparams(
+        key=REFRESH_LOCK_KEY
+    )
+
+
+def aggregate_state() -> Insert:
+    """Create the aggregate refresh bookkeeping row (if it doesn't exist)."""
+    return (
+        insert(LinkAggregateState)
+        .values(id=1, last_record_id=0)
+        .on_conflict_do_nothing(index_elements=["id"])
+    )
+
+
+def bump_data_version() -> Insert:
+    """Increment the data version (and return the new one)."""
+    version = DataVersion.__table__.c.version
+    return (
+        insert(DataVersion)
+        .values(id=1, version=1, updated_at=func.now())
+        .on_conflict_do_update(
+            index_elements=["id"],
+            set_={"version": version + 1, "updated_at": func.now()},
+        )
+        .returning(version)
+    )
+
+
+def feature_collection(statement: Select) -> Select:
+    """
+    Wrap a statement so that it selects a single GeoJSON feature collection.
+
+    The collection is assembled by Postgres and returned as text, along with
+    the number of features and the last link ID (for pagination), so that
+    we never have to parse the individual rows.
+
+    :param statement: a statement created by :py:func:`aggregates` or
+        :py:func:`links`
+    """
+    page = statement.subquery("page")
+    feature = _feature(page)
+    features = func.coalesce(
+        func.json_agg(aggregate_order_by(feature, page.c.link_id)),
+        cast(_const("[]"), JSON),
+    )
+    return select(
+        cast(
+            func.json_build_object(
+                _const("type"),
+                _const("FeatureCollection"),
+                _const("features"),
+                features,
+            ),
+            Text,
+        ).label("body"),
+        func.count().label("count"),
+        func.max(page.c.link_id).label("last_link_id"),
+    )
+
+
+def lines(statement: Select, features: bool = False) -> Select:
+    """
+    Wrap a statement so that it selects each row as a line of JSON text.
+
+    Each row is serialized by Postgres, so we can stream the results
+    straight to the caller without building models for them.
+
+    :param statement: a statement created by :py:func:`aggregates` or
+        :py:func:`links`
+    :param features: select GeoJSON features rather than plain objects
+    """
+    page = statement.subquery("page")
+    line = (
+        _feature(page)
+        if features
+        else func.json_build_object(
+            *_properties(page),
+            _const("geom"),
+            cast(page.c.as_geojson, JSON),
+        )
+    )
+    return select(cast(line, Text).label("line")).order_by(page.c.link_id)
+
+
+def _feature(page: Subquery):
+    """
+    Build a GeoJSON feature from a row of a subquery.
+
+    :param page: the subquery
+    """
+    return func.json_build_object(
+        _const("type"),
+        _const("Feature"),
+        _const("id"),
+        page.c.link_id,
+        _const("geometry"),
+        cast(page.c.as_geojson, JSON),
+        _const("properties"),
+        func.json_build_object(*_properties(page)),
+    )
+
+
+def _properties(page: Subquery) -> List[Any]:
+    """
+    Get the `json_build_object` arguments for every column of a subquery
+    except the geometry.
+
+    :param page: the subquery
+    """
+    properties = []
+    for column in page.c:
+        if column.key == "as_geojson":
+            continue
+        value = _NAMES.get(column.key, lambda c: c)(column)
+        properties.extend((_const(column.key), value))
+    return properties
+
+
+def _const(value: str):
+    """
+    Render a constant string inline.
+
+    Postgres can't infer the types of parameters passed to functions like
+    `json_build_object`, so we write the constants into the statement.
+
+    :param value: the string (which must come from our code, never from a
+        caller)
+    """
+    return literal_column("'{}'".format(value.replace("'", "''")))
+
+
+#: These functions convert day and period columns to the names we use in
+#: responses.
+_NAMES = {
+    "day_of_week": lambda c: array([_const(d.value) for d in DayOfWeek])[c],
+    "period": lambda c: array([_const(p.value) for p in TimePeriod])[c],
+}
+
+
+def _page(
+    statement: Select, key: Any, after: int = None, limit: int = None
+) -> Select:
+    """
+    Add keyset pagination to a statement.
+
+    Rather than skipping rows with `OFFSET` (which gets slower the deeper we
+    go), we seek past the last key on the previous page.
+
+    :param statement: the statement
+    :param key: the column to order and seek by
+    :param after: only select rows with keys greater than this one
+    :param limit: the maximum number of rows
+    """
+    if after is not None:
+        statement = statement.where(key > after)
+    return statement.order_by(key).limit(limit)
+
+
+def _as_geojson(geometry: GeometryOptions = None):
+    """
+    Select a link's geometry as GeoJSON text.
+
+    :param geometry: the geometry resolution and precision
+    """
+    geometry = geometry or GeometryOptions()
+    column = _geometry(geometry.resolution)
+    # Without a precision, `ST_AsGeoJSON` writes up to nine decimal places.
+    if geometry.precision is None:
+        return func.ST_AsGeoJSON(column).label("as_geojson")
+    return func.ST_AsGeoJSON(column, geometry.precision).label("as_geojson")
+
+
+def _geometry(resolution: Resolution):
+    """
+    Select a link's geometry at a resolution.
+
+    :param resolution: the resolution
+    """
+    if resolution == Resolution.FULL:
+        return Link.geom
+    # Fall back to the full geometry for links the ETL hasn't simplified.
+    return func.coalesce(getattr(Link, resolution.column), Link.geom)
+
+
+def _tile_resolution(z: int) -> Resolution:
+    """
+    Get the coarsest resolution that still looks right at a zoom level.
+
+    :param z: the zoom level
+    """
+    # This is the (equatorial) width of a tile coordinate in degrees.
+    # Simplifying any less than this wouldn't change the tile.
+    unit = 360 / (TILE_EXTENT * 2**z)
+    return max(
+        (r for r in Resolution if r.tolerance <= unit),
+        key=lambda r: r.tolerance,
+    )
+
+
+def _ids(link_ids: Sequence[int]):
+    """
+    Create a single array parameter for a list of link IDs.
+
+    :param link_ids: the link IDs
+    """
+    return bindparam("link_ids", list(link_ids), type_=ARRAY(BigInteger))
+
+
+def _intersects(bbox: Tuple[float, float, float, float]):
+    """
+    Create a filter for links that intersect a bounding box.
+
+    :param bbox: the bounding box (minx, miny, maxx, maxy)
+    """
+    bbox_geom = func.ST_MakeEnvelope(bbox[0], bbox[1], bbox[2], bbox[3], 4326)
+    return func.ST_Intersects(Link.geom, bbox_geom)
+
+
+def to_geom(as_geojson: str | None) -> geojson.LineString | None:
+    """
+    Convert the GeoJSON text returned by `ST_AsGeoJSON` to a model.
+
+    :param as_geojson: the GeoJSON text
+    """
+    if not as_geojson:
+        return None
+    with timing.phase("decode"):
+        data = json.loads(as_geojson)
+    with timing.phase("validate"):
+        return geojson.LineString.model_validate(data)
+
+
+def to_aggregate(row: Any) -> Aggregate:
+    """
+    Convert a row selected by :py:func:`aggregates` to a model.
+
+    :param row: the row
+    """
+    geom = to_geom(row.as_geojson)
+    with timing.phase("validate"):
+        return Aggregate(
+            link_id=row.link_id,
+            day_of_week=row.day_of_week,
+            period=row.period,
+            speed=row.speed,
+            road_name=row.road_name,
+            length=row.length,
+            geom=geom,
+        )
+
+
+def to_link(row: Any) -> Link:
+    """
+    Convert a row selected by :py:func:`links` to a model.
+
+    :param row: the row
+    """
+    geom = to_geom(row.as_geojson)
+    with timing.phase("validate"):
+        return Link(
+            link_id=row.link_id,
+            road_name=row.road_name,
+            length=row.length,
+            geom=geom,
+        )
+
+
+def to_profile(row: Any) -> SpeedProfile:
+    """
+    Convert a row selected by :py:func:`profiles` to a model.
+
+    :param row: the row
+    """
+    speeds = [[None] * len(TimePeriod) for _ in DayOfWeek]
+    for day, period, speed in zip(row.days, row.periods, row.speeds):
+        # Links without any speeds have a single row of nulls.
+        if day is not None:
+            speeds[day - 1][period - 1] = speed
+    geom = to_geom(row.as_geojson)
+    with timing.phase("validate"):
+        return SpeedProfile(
+            link_id=row.link_id,
+            road_name=row.road_name,
+            length=row.length,
+            speeds=speeds,
+            geom=geom,
+        )
+
+
+def to_percentiles(
+    rows: Iterable[Any], group_by: Grouping, percentiles: Sequence[float]
+) -> Tuple[SpeedPercentiles, ...]:
+    """
+    Convert the rows selected by :py:func:`speed_bins` to models.
+
+    :param rows: the rows
+    :param group_by: how links are grouped
+    :param percentiles: the percentiles (between 0 and 100)
+    """
+    results = []
+    for key, group in groupby(rows, key=lambda row: row.key):
+        histogram = SpeedHistogram.from_bins(
+            (row.bin, row.count) for row in group
+        )
+        results.append(
+            SpeedPercentiles(
+                link_id=key if group_by == Grouping.LINK else None,
+                road_name=key if group_by == Grouping.ROAD else None,
+                count=histogram.count,
+                percentiles=histogram.percentiles(percentiles),
+            )
+        )
+    return tuple(results)
+
+
+def to_feature_collection_page(row: Any) -> FeatureCollectionPage:
+    """
+    Convert a row selected by :py:func:`feature_collection` to a model.
+
+    :param row: the row
+    """
+    return FeatureCollectionPage(
+        body=row.body, count=row.count, last_link_id=row.last_link_id
+    )
@@ -1,20 +1,82 @@
-import json
+import asyncio
+import inspect
+import threading
+import time
+from contextlib import AsyncExitStack
+from datetime import date
+from datetime import datetime
+from functools import cached_property
 from functools import lru_cache
+from functools import wraps
+from typing import Any
+from typing import AsyncIterator
+from typing import Callable
+from typing import Dict
+from typing import Generator
+from typing import Hashable
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Optional
 from typing import Self
+from typing import Sequence
 from typing import Tuple
+from typing import TypeVar
 
+import numpy as np
+from pydantic import BaseModel
+from sqlalchemy import delete
+from sqlalchemy import Engine as SQLEngine
 from sqlalchemy import func
+from sqlalchemy import make_url
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.sql import Executable
 from sqlmodel import create_engine
 from sqlmodel import select
 from sqlmodel import Session
-from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from urban_sdk_homework.core.cache import LRUCache
 from urban_sdk_homework.core.geometry import geojson
 from urban_sdk_homework.core.services import Service
+from urban_sdk_homework.core.sqlalchemy import instrument
+from urban_sdk_homework.core.sqlalchemy import instrumented
+from urban_sdk_homework.core.sqlalchemy import InstrumentedAsyncQueuePool
+from urban_sdk_homework.core.sqlalchemy import InstrumentedQueuePool
+from urban_sdk_homework.core.sqlalchemy import pool_stats
+from urban_sdk_homework.core.sqlalchemy import PoolStats
+from urban_sdk_homework.modules.traffic import columnar
+from urban_sdk_homework.modules.traffic import partitions
+from urban_sdk_homework.modules.traffic import queries
+from urban_sdk_homework.modules.traffic.columnar import SpeedColumns
+from urban_sdk_homework.modules.traffic.columnar import SpeedColumnsBuilder
+from urban_sdk_homework.modules.traffic.errors import BatchTooLargeException
+from urban_sdk_homework.modules.traffic.errors import (
+    PartitionDetachedException,
+)
+from urban_sdk_homework.modules.traffic.errors import TileNotFoundException
 from urban_sdk_homework.modules.traffic.models import Aggregate
+from urban_sdk_homework.modules.traffic.models import AggregateRefresh
+from urban_sdk_homework.modules.traffic.models import Engine
+from urban_sdk_homework.modules.traffic.models import FeatureCollectionPage
+from urban_sdk_homework.modules.traffic.models import GeometryOptions
+from urban_sdk_homework.modules.traffic.models import Grouping
 from urban_sdk_homework.modules.traffic.models import Link
+from urban_sdk_homework.modules.traffic.models import LinkAggregate
+from urban_sdk_homework.modules.traffic.models import LinkAggregateState
+from urban_sdk_homework.modules.traffic.models import LinkBatch
+from urban_sdk_homework.modules.traffic.models import LinkSpeedBin
+from urban_sdk_homework.modules.traffic.models import SpeedPercentiles
+from urban_sdk_homework.modules.traffic.models import SpeedProfile
+from urban_sdk_homework.modules.traffic.models import SpeedProfileBatch
 from urban_sdk_homework.modules.traffic.models import SpeedRecord
+from urban_sdk_homework.modules.traffic.models import SpeedRecordPartition
+from urban_sdk_homework.modules.traffic.models import TrafficCacheStats
 from urban_sdk_homework.modules.traffic.settings import TrafficServiceSettings
+from urban_sdk_homework.modules.traffic.spatial import LinkIndex
+from urban_sdk_homework.modules.traffic.spatial import LinkIndexBuilder
 
 # Note to the Future: If we ever want to implement multi-tenancy, we can
 # uncomment the tenant parameter and pass it to the service.
@@ -41,211 +103,1378 @@ from urban_sdk_homework.modules.traffic.settings import TrafficServiceSettings
 #         return cls(tenant=tenant)
 
 
-class TrafficService(Service):
-    """Traffic service."""
+class _Caches:
+    """
+    The caches a traffic service keeps.
+
+    Everything is discarded when the data version changes.
+    """
+
+    def __init__(self, settings: TrafficServiceSettings):
+        """
+        Create a new instance.
+
+        :param settings: the traffic service settings
+        """
+        # A page of results can hold thousands of rows (with geometries), so
+        # the results are bounded by size as well as number.
+        self.results = LRUCache(
+            settings.cache_size,
+            ttl=settings.cache_ttl,
+            maxbytes=settings.cache_max_bytes,
+        )
+        self.tiles = LRUCache(settings.tile_cache_size)
+        # These are the speed records the NumPy engine keeps in memory.
+        self.columns: Optional[SpeedColumns] = None
+        # This is the spatial index of the links.
+        self.links: Optional[LinkIndex] = None
+        self.version: Optional[int] = None
+        self._interval = settings.data_version_interval
+        self._checked_at = float("-inf")
+
+    @property
+    def stale(self) -> bool:
+        """Is it time to check the data version again?"""
+        return time.monotonic() - self._checked_at >= self._interval
+
+    def validate(self, version: int):
+        """
+        Record the current data version, discarding everything if it has
+        changed.
+
+        :param version: the current data version
+        """
+        if version != self.version:
+            self.results.clear()
+            self.tiles.clear()
+            self.columns = None
+            self.links = None
+            self.version = version
+        self._checked_at = time.monotonic()
+
+    def stats(self) -> TrafficCacheStats:
+        """Get cache statistics."""
+        return TrafficCacheStats(
+            data_version=self.version,
+            responses=self.results.stats(),
+            tiles=self.tiles.stats(),
+        )
+
+
+#: This is the number of rows fetched at a time when the speed records (for
+#: the NumPy engine) or link geometries (for the spatial index) are loaded
+#: into memory.
+_LOAD_BATCH_SIZE = 50000
+
+#: This marks a result that isn't cached (since `None` may be a result).
+_MISSING = object()
+
+T = TypeVar("T")
+
+#: This is a plan: a generator that yields the steps a query needs performed
+#: (see :py:class:`_TrafficQueries`) and returns the query's result.
+Plan = Generator[Any, Any, T]
+
+
+class _Execute(NamedTuple):
+    """A step that executes a statement and fetches its results."""
+
+    statement: Executable
+    #: This is how the results are fetched (`all`, `one` or `first`).
+    fetch: str = "all"
+
+    #: This is the name of the service method that performs the step.
+    shim = "_execute"
+
+
+class _Compute(NamedTuple):
+    """A step that calls a CPU-bound function."""
+
+    function: Callable
+    kwargs: Dict[str, Any]
+
+    shim = "_compute"
+
+
+class _Load(NamedTuple):
+    """
+    A step that loads something we keep in memory (unless it's already
+    loaded) and returns it.
+    """
+
+    #: This is the name of the attribute of :py:class:`_Caches` it's kept in.
+    attribute: str
+    statement: Select
+    #: This creates the object that's given the rows a batch at a time (with
+    #: `add`) and then builds the result (with `build`).
+    builder: Callable[[], Any]
+
+    shim = "_load"
+
+
+def cached(plan: Callable[..., Plan]) -> Callable[..., Plan]:
+    """
+    Cache the results of a traffic query plan.
+
+    Results are keyed by the data version, the plan and its arguments
+    (normalized so that, for example, positional and keyword arguments
+    match).
+
+    :param plan: the plan
+    """
+    signature = inspect.signature(plan)
+
+    def key(version: int, args: tuple, kwargs: dict) -> Hashable:
+        bound = signature.bind(None, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = list(bound.arguments.items())[1:]  # Skip `self`.
+        return (version, plan.__name__) + tuple(
+            (name, _hashable(value)) for name, value in arguments
+        )
+
+    @wraps(plan)
+    def wrapper(self, *args, **kwargs):
+        k = key((yield from self._data_version()), args, kwargs)
+        result = self._caches.results.get(k, _MISSING)
+        if result is _MISSING:
+            result = yield from plan(self, *args, **kwargs)
+            self._caches.results.put(k, result)
+        return result
+
+    return wrapper
+
+
+def query(plan: Callable[..., Plan]) -> Callable[..., Plan]:
+    """
+    Make a plan a public query method of the traffic services (named without
+    the leading underscore).
+
+    :param plan: the plan
+    """
+    plan.method = "_query_method"
+    return plan
+
+
+def stream(plan: Callable[..., Plan]) -> Callable[..., Plan]:
+    """
+    Make a plan a public streaming method of the traffic services (named
+    without the leading underscore).  The plan returns a statement that
+    selects lines of text.
+
+    :param plan: the plan
+    """
+    plan.method = "_stream_method"
+    return plan
+
+
+def _hashable(value: Any) -> Hashable:
+    """
+    Convert an argument to something we can use in a cache key.
+
+    :param value: the argument
+    """
+    if isinstance(value, BaseModel):
+        return tuple(
+            (name, _hashable(v)) for name, v in value.model_dump().items()
+        )
+    if isinstance(value, dict):
+        return tuple((k, _hashable(v)) for k, v in sorted(value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(v) for v in value)
+    return value
+
+
+# Note to the Future: The synchronous and asynchronous services answer the
+# same queries, and only differ in how they talk to the database.  So each
+# query is written once, below, as a "plan": a generator that yields the
+# steps it needs performed (`_Execute`, `_Compute` or `_Load`) and is sent
+# back their results.  Each service runs plans with its own `_run` and
+# step methods, and gets a public method for every plan marked with `query`
+# or `stream`.
+
+
+class _TrafficQueries(Service):
+    """The queries the traffic services share."""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name, plan in vars(_TrafficQueries).items():
+            factory = getattr(plan, "method", None)
+            if factory is None:
+                continue
+            method = getattr(cls, factory)(plan)
+            method.__name__ = name[1:]
+            method.__qualname__ = f"{cls.__qualname__}.{name[1:]}"
+            setattr(cls, name[1:], method)
 
     def __init__(self):
         """Create a new instance."""
+        # The schema belongs to the migrations (`homework db upgrade`), so
+        # creating a service never touches the database.
         self._settings = TrafficServiceSettings()
-        self._engine = create_engine(
-            self._settings.sqa_conn,
-            echo=True,  # TODO: Move to .env.
-        )
-        SQLModel.metadata.create_all(self._engine)
+        self._caches = _Caches(self._settings)
 
-    def get_aggregates(
+    @query
+    @cached
+    def _get_aggregates(
         self,
         day: int,
         period: int,
         link_id: int = None,
         bbox: Tuple[float, float, float, float] = None,
-        offset: int = 0,
+        start: datetime = None,
+        end: datetime = None,
+        after: int = None,
         limit: int = 10,
-    ) -> Tuple[Aggregate, ...]:
-        with Session(self._engine) as session:
-            statement = (
-                select(
-                    SpeedRecord.link_id,
-                    SpeedRecord.day_of_week,
-                    SpeedRecord.period,
-                    func.avg(SpeedRecord.speed).label("speed"),
-                    Link.road_name,
-                    Link.length,
-                    func.ST_AsGeoJSON(Link.geom).label("as_geojson"),
-                )
-                .join(Link, SpeedRecord.link_id == Link.link_id)
-                .where(
-                    SpeedRecord.day_of_week == day,
-                    SpeedRecord.period == period,
-                )
-            )
+        percentiles: Sequence[float] = None,
+        geometry: GeometryOptions = None,
+    ) -> Plan[Tuple[Aggregate, ...]]:
+        """
+        Get the aggregated speed per link for a day and period.
 
-            # Only add link_id filter if the argument was supplied.
-            if link_id is not None:
-                statement = statement.where(SpeedRecord.link_id == link_id)
+        :param day: the day of the week
+        :param period: the time period
+        :param link_id: limit the results to a single link
+        :param bbox: limit the results to links within a bounding box
+        :param start: only include speed records from this time on
+        :param end: only include speed records from before this time
+        :param after: only get links with IDs greater than this one
+        :param limit: the maximum number of rows
+        :param percentiles: also estimate these speed percentiles
+        :param geometry: the geometry resolution and precision
+        """
+        link_ids = yield from self._within(bbox=bbox)
+        # The in-memory columns don't have timestamps.
+        windowed = start is not None or end is not None
+        if self._settings.engine == Engine.NUMPY and not windowed:
+            columns = yield from self._columns()
+            ids, speeds = yield _Compute(
+                columns.aggregates,
+                dict(
+                    day=day,
+                    period=period,
+                    link_id=link_id,
+                    link_ids=link_ids,
+                    after=after,
+                    limit=limit,
+                ),
+            )
+            items = columnar.to_aggregates(
+                ids,
+                speeds,
+                day=day,
+                period=period,
+                links=(yield from self._fetch_links(ids, geometry=geometry)),
+            )
+        else:
+            statement = queries.aggregates(
+                day=day,
+                period=period,
+                link_id=link_id,
+                link_ids=link_ids,
+                start=start,
+                end=end,
+                after=after,
+                limit=limit,
+                materialized=self._settings.materialized,
+                geometry=geometry,
+            )
+            rows = yield _Execute(statement)
+            items = tuple(queries.to_aggregate(row) for row in rows)
+        if percentiles:
+            items = yield from self._with_percentiles(
+                items, day, period, percentiles, start=start, end=end
+            )
+        return items
 
-            # Add spatial filter if bbox is provided
-            if bbox is not None:
-                bbox_geom = func.ST_MakeEnvelope(
-                    bbox[0], bbox[1], bbox[2], bbox[3], 4326
-                )
-                statement = statement.where(
-                    func.ST_Intersects(Link.geom, bbox_geom)
-                )
+    @query
+    @cached
+    def _get_aggregates_geojson(
+        self,
+        day: int,
+        period: int,
+        link_id: int = None,
+        bbox: Tuple[float, float, float, float] = None,
+        start: datetime = None,
+        end: datetime = None,
+        after: int = None,
+        limit: int = 10,
+        geometry: GeometryOptions = None,
+    ) -> Plan[FeatureCollectionPage]:
+        """
+        Get the aggregated speed per link as a GeoJSON feature collection
+        assembled by the database.
 
-            # Build the rest of the statement.
-            statement = (
-                statement.group_by(
-                    SpeedRecord.link_id,
-                    SpeedRecord.day_of_week,
-                    SpeedRecord.period,
-                    Link.road_name,
-                    Link.length,
-                    Link.geom,
-                )
-                .order_by(SpeedRecord.link_id)
-                .offset(offset)
-                .limit(limit)
+        :param day: the day of the week
+        :param period: the time period
+        :param link_id: limit the results to a single link
+        :param bbox: limit the results to links within a bounding box
+        :param start: only include speed records from this time on
+        :param end: only include speed records from before this time
+        :param after: only get links with IDs greater than this one
+        :param limit: the maximum number of features
+        :param geometry: the geometry resolution and precision
+        """
+        link_ids = yield from self._within(bbox=bbox)
+        statement = queries.feature_collection(
+            queries.aggregates(
+                day=day,
+                period=period,
+                link_id=link_id,
+                link_ids=link_ids,
+                start=start,
+                end=end,
+                after=after,
+                limit=limit,
+                materialized=self._settings.materialized,
+                geometry=geometry,
             )
+        )
+        row = yield _Execute(statement, fetch="one")
+        return queries.to_feature_collection_page(row)
 
-            result = session.exec(statement).all()
-            return tuple(
-                Aggregate(
-                    link_id=row.link_id,
-                    day_of_week=row.day_of_week,
-                    period=row.period,
-                    speed=row.speed,
-                    road_name=row.road_name,
-                    length=row.length,
-                    geom=(
-                        geojson.LineString.model_validate(
-                            json.loads(row.as_geojson)
-                        )
-                        if row.as_geojson
-                        else None
-                    ),
-                )
-                for row in result
-            )
+    @stream
+    def _stream_aggregates(
+        self,
+        day: int,
+        period: int,
+        link_id: int = None,
+        bbox: Tuple[float, float, float, float] = None,
+        start: datetime = None,
+        end: datetime = None,
+        after: int = None,
+        limit: int = None,
+        features: bool = False,
+        geometry: GeometryOptions = None,
+    ) -> Plan[Select]:
+        """
+        Stream the aggregated speed per link as lines of JSON text.
 
-    def get_links(
+        Rows are fetched from a server-side cursor in batches, so memory use
+        doesn't grow with the size of the result.
+
+        :param day: the day of the week
+        :param period: the time period
+        :param link_id: limit the results to a single link
+        :param bbox: limit the results to links within a bounding box
+        :param start: only include speed records from this time on
+        :param end: only include speed records from before this time
+        :param after: only get links with IDs greater than this one
+        :param limit: the maximum number of rows (or `None` for all of them)
+        :param features: get GeoJSON features rather than plain objects
+        :param geometry: the geometry resolution and precision
+        :return: batches of lines
+        """
+        link_ids = yield from self._within(bbox=bbox)
+        return queries.lines(
+            queries.aggregates(
+                day=day,
+                period=period,
+                link_id=link_id,
+                link_ids=link_ids,
+                start=start,
+                end=end,
+                after=after,
+                limit=limit,
+                materialized=self._settings.materialized,
+                geometry=geometry,
+            ),
+            features=features,
+        )
+
+    @query
+    @cached
+    def _get_links(
         self,
         link_id: int = None,
+        link_ids: Sequence[int] = None,
         bbox: Tuple[float, float, float, float] = None,
+        polygon: geojson.Polygon = None,
         day: int = None,
         period: int = None,
-        offset: int = 0,
+        after: int = None,
         limit: int = 10,
-    ) -> Tuple[Link, ...]:
+        geometry: GeometryOptions = None,
+    ) -> Plan[Tuple[Link, ...]]:
         """
         Get links by ID, or all links if no ID is provided.
-        :param link_id: The ID of the link to retrieve. If None, returns all
-            links.
-        :return: A tuple of Link objects with their details.
+
+        :param link_id: the ID of the link to retrieve
+        :param link_ids: the IDs of several links to retrieve
+        :param bbox: limit the results to links within a bounding box
+        :param polygon: limit the results to links within a polygon
+        :param day: limit the results to links with records on this day
+        :param period: limit the results to links with records in this period
+        :param after: only get links with IDs greater than this one
+        :param limit: the maximum number of rows
+        :param geometry: the geometry resolution and precision
         """
-        with Session(self._engine) as session:
-            # TODO: Use a more efficient query to fetch only the necessary
-            # fields. This query fetches the link_id, road_name, and geometry
-            # as GeoJSON and we convert it to a `LineString`.  We can do this
-            # automatically to prevent repetitive code.
-            statement = select(
-                Link.link_id,
-                Link.road_name,
-                Link.length,
-                func.ST_AsGeoJSON(Link.geom).label("as_geojson"),
+        link_ids = yield from self._within(
+            bbox=bbox, polygon=polygon, link_ids=link_ids
+        )
+        statement = queries.links(
+            link_id=link_id,
+            link_ids=link_ids,
+            day=day,
+            period=period,
+            after=after,
+            limit=limit,
+            materialized=self._settings.materialized,
+            geometry=geometry,
+        )
+        rows = yield _Execute(statement)
+        return tuple(queries.to_link(row) for row in rows)
+
+    @query
+    def _get_link_batch(
+        self, link_ids: Sequence[int], geometry: GeometryOptions = None
+    ) -> Plan[LinkBatch]:
+        """
+        Look up several links with a single query.
+
+        :param link_ids: the IDs of the links
+        :param geometry: the geometry resolution and precision
+        :raises BatchTooLargeException: if there are too many IDs
+        """
+        link_ids = check_batch(link_ids, self._settings.max_batch_size)
+        links = yield from self._get_links(
+            link_ids=link_ids, limit=None, geometry=geometry
+        )
+        links, missing = arrange(link_ids, links)
+        return LinkBatch(links=links, missing=missing)
+
+    @query
+    @cached
+    def _get_links_geojson(
+        self,
+        link_id: int = None,
+        bbox: Tuple[float, float, float, float] = None,
+        polygon: geojson.Polygon = None,
+        day: int = None,
+        period: int = None,
+        after: int = None,
+        limit: int = 10,
+        geometry: GeometryOptions = None,
+    ) -> Plan[FeatureCollectionPage]:
+        """
+        Get links as a GeoJSON feature collection assembled by the database.
+
+        :param link_id: the ID of the link to retrieve
+        :param bbox: limit the results to links within a bounding box
+        :param polygon: limit the results to links within a polygon
+        :param day: limit the results to links with records on this day
+        :param period: limit the results to links with records in this period
+        :param after: only get links with IDs greater than this one
+        :param limit: the maximum number of features
+        :param geometry: the geometry resolution and precision
+        """
+        link_ids = yield from self._within(bbox=bbox, polygon=polygon)
+        statement = queries.feature_collection(
+            queries.links(
+                link_id=link_id,
+                link_ids=link_ids,
+                day=day,
+                period=period,
+                after=after,
+                limit=limit,
+                materialized=self._settings.materialized,
+                geometry=geometry,
             )
-            # Only add link_id filter if the caller has supplied one.
-            if link_id is not None:
-                statement = statement.where(Link.link_id == link_id)
-            # If a bounding box is provided, use it to filter the links.
-            if bbox is not None:
-                # Create a bounding box geometry.
-                bbox_geom = func.ST_MakeEnvelope(
-                    bbox[0], bbox[1], bbox[2], bbox[3], 4326
-                )
-                statement = statement.where(
-                    func.ST_Intersects(Link.geom, bbox_geom)
-                )
-            # If day and period are provided, join the SpeedRecord table
-            # to filter links based on speed records.
-            if day is not None and period is not None:
-                statement = statement.join(
-                    SpeedRecord, SpeedRecord.link_id == Link.link_id
-                ).where(
-                    SpeedRecord.day_of_week == day,
-                    SpeedRecord.period == period,
+        )
+        row = yield _Execute(statement, fetch="one")
+        return queries.to_feature_collection_page(row)
+
+    @stream
+    def _stream_links(
+        self,
+        link_id: int = None,
+        bbox: Tuple[float, float, float, float] = None,
+        polygon: geojson.Polygon = None,
+        day: int = None,
+        period: int = None,
+        after: int = None,
+        limit: int = None,
+        features: bool = False,
+        geometry: GeometryOptions = None,
+    ) -> Plan[Select]:
+        """
+        Stream links as lines of JSON text.
+
+        Rows are fetched from a server-side cursor in batches, so memory use
+        doesn't grow with the size of the result.
+
+        :param link_id: the ID of the link to retrieve
+        :param bbox: limit the results to links within a bounding box
+        :param polygon: limit the results to links within a polygon
+        :param day: limit the results to links with records on this day
+        :param period: limit the results to links with records in this period
+        :param after: only get links with IDs greater than this one
+        :param limit: the maximum number of rows (or `None` for all of them)
+        :param features: get GeoJSON features rather than plain objects
+        :param geometry: the geometry resolution and precision
+        :return: batches of lines
+        """
+        link_ids = yield from self._within(bbox=bbox, polygon=polygon)
+        return queries.lines(
+            queries.links(
+                link_id=link_id,
+                link_ids=link_ids,
+                day=day,
+                period=period,
+                after=after,
+                limit=limit,
+                materialized=self._settings.materialized,
+                geometry=geometry,
+            ),
+            features=features,
+        )
+
+    @query
+    @cached
+    def _get_profiles(
+        self, link_ids: Sequence[int], geometry: GeometryOptions = None
+    ) -> Plan[Tuple[SpeedProfile, ...]]:
+        """
+        Get the average speed for every day and period of several links.
+
+        :param link_ids: the IDs of the links
+        :param geometry: the geometry resolution and precision
+        """
+        statement = queries.profiles(
+            link_ids=link_ids,
+            materialized=self._settings.materialized,
+            geometry=geometry,
+        )
+        rows = yield _Execute(statement)
+        return tuple(queries.to_profile(row) for row in rows)
+
+    @query
+    def _get_profile_batch(
+        self, link_ids: Sequence[int], geometry: GeometryOptions = None
+    ) -> Plan[SpeedProfileBatch]:
+        """
+        Get the speed profiles of several links with a single query.
+
+        :param link_ids: the IDs of the links
+        :param geometry: the geometry resolution and precision
+        :raises BatchTooLargeException: if there are too many IDs
+        """
+        link_ids = check_batch(link_ids, self._settings.max_batch_size)
+        profiles = yield from self._get_profiles(
+            link_ids=link_ids, geometry=geometry
+        )
+        profiles, missing = arrange(link_ids, profiles)
+        return SpeedProfileBatch(profiles=profiles, missing=missing)
+
+    @query
+    @cached
+    def _get_percentiles(
+        self,
+        day: int,
+        period: int,
+        percentiles: Sequence[float],
+        group_by: Grouping = Grouping.LINK,
+        link_ids: Sequence[int] = None,
+        road_name: str = None,
+        bbox: Tuple[float, float, float, float] = None,
+        polygon: geojson.Polygon = None,
+        start: datetime = None,
+        end: datetime = None,
+        after: int = None,
+        limit: int = 10,
+    ) -> Plan[Tuple[SpeedPercentiles, ...]]:
+        """
+        Estimate speed percentiles for groups of links by merging their speed
+        histograms.
+
+        :param day: the day of the week
+        :param period: the time period
+        :param percentiles: the percentiles (between 0 and 100)
+        :param group_by: how links are grouped
+        :param link_ids: only include these links
+        :param road_name: only include links on this road
+        :param bbox: only include links within a bounding box
+        :param polygon: only include links within a polygon
+        :param start: only include speed records from this time on (which
+            bins them from the records rather than the pre-computed
+            histograms)
+        :param end: only include speed records from before this time
+        :param after: only get links with IDs greater than this one (when
+            grouping by link)
+        :param limit: the maximum number of links (when grouping by link)
+        """
+        link_ids = yield from self._within(
+            bbox=bbox, polygon=polygon, link_ids=link_ids
+        )
+        statement = queries.speed_bins(
+            day=day,
+            period=period,
+            group_by=group_by,
+            link_ids=link_ids,
+            road_name=road_name,
+            start=start,
+            end=end,
+            after=after,
+            limit=limit,
+        )
+        rows = yield _Execute(statement)
+        return queries.to_percentiles(rows, group_by, percentiles)
+
+    def _with_percentiles(
+        self,
+        aggregates: Tuple[Aggregate, ...],
+        day: int,
+        period: int,
+        percentiles: Sequence[float],
+        start: datetime = None,
+        end: datetime = None,
+    ) -> Plan[Tuple[Aggregate, ...]]:
+        """
+        Add speed percentiles to aggregates.
+
+        :param aggregates: the aggregates
+        :param day: the day of the week
+        :param period: the time period
+        :param percentiles: the percentiles (between 0 and 100)
+        :param start: only include speed records from this time on (like the
+            aggregates)
+        :param end: only include speed records from before this time
+        """
+        found = {
+            item.link_id: item.percentiles
+            for item in (
+                yield from self._get_percentiles(
+                    day=day,
+                    period=period,
+                    percentiles=percentiles,
+                    link_ids=[aggregate.link_id for aggregate in aggregates],
+                    start=start,
+                    end=end,
+                    limit=None,
                 )
-            # Add ordering, offset, and limit to the query.
-            statement = (
-                statement.order_by(Link.link_id).offset(offset).limit(limit)
             )
-            # Execute the query and fetch results.
-            result = session.exec(statement).all()
-            # If no results are found, return an empty tuple.
-            if not result:
-                return tuple()
-            return tuple(
-                Link(
-                    link_id=row.link_id,
-                    road_name=row.road_name,
-                    length=row.length,
-                    geom=(
-                        geojson.LineString.model_validate(
-                            json.loads(row.as_geojson)
-                            if row.as_geojson
-                            else None
-                        )
-                        if row.as_geojson
-                        else None
-                    ),
-                )
-                for row in result
+        }
+        return tuple(
+            aggregate.model_copy(
+                update={"percentiles": found.get(aggregate.link_id, {})}
             )
+            for aggregate in aggregates
+        )
 
-    def get_slow_links(
+    @query
+    @cached
+    def _get_slow_links(
         self,
         period: int,
         threshold: float,
         min_days: int = 3,
-        offset: int = 0,
+        after: int = None,
         limit: int = 10,
-    ) -> Tuple[Link, ...]:
-        with Session(self._engine) as session:
-            statement = (
-                select(
-                    Link.link_id,
-                    Link.road_name,
-                    Link.length,
-                    func.avg(SpeedRecord.speed).label("speed"),
-                    func.ST_AsGeoJSON(Link.geom).label("as_geojson"),
-                )
-                .join(SpeedRecord, SpeedRecord.link_id == Link.link_id)
-                .where(
-                    SpeedRecord.period == period, SpeedRecord.speed < threshold
-                )
-                .group_by(Link.link_id, Link.road_name, Link.length)
-                .having(func.count(SpeedRecord.id) >= min_days)
-                .order_by(Link.link_id)
-                .offset(offset)
-                .limit(limit)
+        geometry: GeometryOptions = None,
+    ) -> Plan[Tuple[Link, ...]]:
+        """
+        Get links that have been consistently slow during a period.
+
+        :param period: the time period
+        :param threshold: the speed threshold
+        :param min_days: the minimum number of slow days
+        :param after: only get links with IDs greater than this one
+        :param limit: the maximum number of rows
+        :param geometry: the geometry resolution and precision
+        """
+        if self._settings.engine == Engine.NUMPY:
+            columns = yield from self._columns()
+            ids, _ = yield _Compute(
+                columns.slow_links,
+                dict(
+                    period=period,
+                    threshold=threshold,
+                    min_days=min_days,
+                    after=after,
+                    limit=limit,
+                ),
             )
-            result = session.exec(statement).all()
-            return [
-                Link(
-                    link_id=row.link_id,
-                    road_name=row.road_name,
-                    length=row.length,
-                    geom=geojson.LineString.model_validate(
-                        json.loads(row.as_geojson)
-                    )
-                    if row.as_geojson
-                    else None,
-                )
-                for row in result
-            ]
+            return (yield from self._fetch_links(ids, geometry=geometry))
+        statement = queries.slow_links(
+            period=period,
+            threshold=threshold,
+            min_days=min_days,
+            after=after,
+            limit=limit,
+            materialized=self._settings.materialized,
+            geometry=geometry,
+        )
+        rows = yield _Execute(statement)
+        return tuple(queries.to_link(row) for row in rows)
+
+    @query
+    def _get_tile(
+        self, day: int, period: int, z: int, x: int, y: int
+    ) -> Plan[bytes]:
+        """
+        Get a Mapbox Vector Tile of the aggregated speed per link for a day
+        and period.
+
+        Tiles are cached, so each one is only built once (until it's
+        evicted or the data changes).
+
+        :param day: the day of the week
+        :param period: the time period
+        :param z: the tile's zoom level
+        :param x: the tile's column
+        :param y: the tile's row
+        :raises TileNotFoundException: if the tile is outside the grid
+        """
+        check_tile(z=z, x=x, y=y)
+        key = ((yield from self._data_version()), day, period, z, x, y)
+        tile = self._caches.tiles.get(key)
+        if tile is None:
+            statement = queries.tile(
+                day=day,
+                period=period,
+                z=z,
+                x=x,
+                y=y,
+                materialized=self._settings.materialized,
+            )
+            tile = bytes((yield _Execute(statement, fetch="one")))
+            self._caches.tiles.put(key, tile)
+        return tile
+
+    @query
+    def _data_version(self) -> Plan[int]:
+        """
+        Get the current data version.
+
+        The database is checked at most once every `data_version_interval`
+        seconds.  If the version has changed, cached results are discarded.
+        """
+        if self._caches.stale:
+            version = yield _Execute(queries.data_version(), fetch="first")
+            self._caches.validate(version or 0)
+        return self._caches.version
+
+    def cache_stats(self) -> TrafficCacheStats:
+        """Get cache statistics."""
+        return self._caches.stats()
+
+    def _columns(self) -> Plan[SpeedColumns]:
+        """
+        Get the speed records for the NumPy engine, loading them if we
+        haven't already (or the data has changed).
+        """
+        yield from self._data_version()
+        return (
+            yield _Load(
+                "columns", queries.speed_columns(), SpeedColumnsBuilder
+            )
+        )
+
+    def _link_index(self) -> Plan[LinkIndex]:
+        """
+        Get the spatial index of the links, building it if we haven't already
+        (or the data has changed).
+        """
+        yield from self._data_version()
+        return (
+            yield _Load("links", queries.link_geometries(), LinkIndexBuilder)
+        )
+
+    def _within(
+        self,
+        bbox: Tuple[float, float, float, float] = None,
+        polygon: geojson.Polygon = None,
+        link_ids: Sequence[int] = None,
+    ) -> Plan[Optional[List[int]]]:
+        """
+        Resolve spatial filters to link IDs with the in-memory spatial index.
+
+        :param bbox: the bounding box
+        :param polygon: the polygon
+        :param link_ids: only include these links
+        :returns: the IDs of the links (or `link_ids` if there's no spatial
+            filter)
+        """
+        if bbox is None and polygon is None:
+            return link_ids
+        index = yield from self._link_index()
+        return within(index, bbox, polygon, link_ids)
+
+    def _fetch_links(
+        self, link_ids: Sequence[int], geometry: GeometryOptions = None
+    ) -> Plan[Tuple[Link, ...]]:
+        """
+        Fetch links (in ID order) with a single query.
+
+        :param link_ids: the link IDs
+        :param geometry: the geometry resolution and precision
+        """
+        if not len(link_ids):
+            return ()
+        # psycopg2 can't adapt NumPy integers.
+        statement = queries.links(
+            link_ids=[int(i) for i in link_ids], limit=None, geometry=geometry
+        )
+        rows = yield _Execute(statement)
+        return tuple(queries.to_link(row) for row in rows)
+
+    def pool_stats(self) -> PoolStats:
+        """Get connection pool statistics."""
+        return pool_stats(self._engine.pool)
 
     @classmethod
     @lru_cache()
     def connect(cls) -> Self:
         """Connect to the service."""
         return cls()
+
+
+@instrumented
+class TrafficService(_TrafficQueries):
+    """Traffic service."""
+
+    def __init__(self):
+        """Create a new instance."""
+        super().__init__()
+        self._locks = {"columns": threading.Lock(), "links": threading.Lock()}
+
+    @cached_property
+    def _engine(self) -> SQLEngine:
+        """Get the database engine (creating it the first time it's used)."""
+        engine = create_engine(
+            self._settings.sqa_conn,
+            poolclass=InstrumentedQueuePool,
+            **engine_options(self._settings),
+        )
+        instrument(engine)
+        return engine
+
+    @staticmethod
+    def _query_method(plan: Callable[..., Plan]) -> Callable:
+        """
+        Make a method that runs a plan.
+
+        :param plan: the plan
+        """
+
+        @wraps(plan)
+        def method(self, *args, **kwargs):
+            return self._run(plan(self, *args, **kwargs))
+
+        return method
+
+    @staticmethod
+    def _stream_method(plan: Callable[..., Plan]) -> Callable:
+        """
+        Make a method that runs a plan and streams the lines its statement
+        selects.
+
+        :param plan: the plan
+        """
+
+        @wraps(plan)
+        def method(self, *args, **kwargs):
+            yield from self._stream(self._run(plan(self, *args, **kwargs)))
+
+        return method
+
+    def _run(self, plan: Plan[T]) -> T:
+        """
+        Run a plan, performing its steps as it yields them.
+
+        :param plan: the plan
+        """
+        result = None
+        while True:
+            try:
+                step = plan.send(result)
+            except StopIteration as stop:
+                return stop.value
+            result = getattr(self, step.shim)(step)
+
+    def _execute(self, step: _Execute) -> Any:
+        """
+        Execute a statement and fetch its results.
+
+        :param step: the step
+        """
+        with Session(self._engine) as session:
+            return getattr(session.exec(step.statement), step.fetch)()
+
+    def _compute(self, step: _Compute) -> Any:
+        """
+        Call a CPU-bound function.
+
+        :param step: the step
+        """
+        return step.function(**step.kwargs)
+
+    def _load(self, step: _Load) -> Any:
+        """
+        Load something we keep in memory (unless it's already loaded).
+
+        :param step: the step
+        """
+        with self._locks[step.attribute]:
+            if getattr(self._caches, step.attribute) is None:
+                builder = step.builder()
+                with Session(self._engine) as session:
+                    result = session.exec(
+                        step.statement,
+                        execution_options={"yield_per": _LOAD_BATCH_SIZE},
+                    )
+                    for rows in result.partitions():
+                        builder.add(rows)
+                setattr(self._caches, step.attribute, builder.build())
+            return getattr(self._caches, step.attribute)
+
+    def _stream(self, statement: Select) -> Iterator[List[str]]:
+        """
+        Execute a statement that selects lines of text and stream the
+        results in batches.
+
+        :param statement: the statement
+        """
+        with Session(self._engine) as session:
+            # `yield_per` fetches the rows through a server-side cursor.
+            result = session.exec(
+                statement,
+                execution_options={
+                    "yield_per": self._settings.stream_batch_size
+                },
+            )
+            for lines in result.partitions():
+                yield list(lines)
+
+    def create_partitions(
+        self, start: datetime, end: datetime
+    ) -> Tuple[str, ...]:
+        """
+        Create the monthly speed record partitions a time range needs (if
+        they don't already exist).
+
+        Records for a new partition's month that are in the default
+        partition are moved into it.
+
+        :param start: the start of the range
+        :param end: the end of the range (inclusive)
+        :return: the names of the partitions
+        :raises PartitionDetachedException: if a standalone table (like a
+            detached partition) has a partition's name
+        """
+        months = partitions.months(start, end)
+        with Session(self._engine) as session:
+            session.exec(partitions.lock())
+            for month in months:
+                attached = session.exec(partitions.attached(month)).scalar()
+                if attached:
+                    continue
+                if attached is not None:
+                    raise PartitionDetachedException(
+                        f"{partitions.name(month)} isn't a partition of the "
+                        "speed records table.  Rename or drop it first."
+                    )
+                for statement in partitions.create(
+                    month, by_day=self._settings.partition_by_day
+                ):
+                    session.exec(statement)
+            session.commit()
+        return tuple(partitions.name(month) for month in months)
+
+    def detach_partition(self, month: date, drop: bool = False):
+        """
+        Detach a month's speed records from the table.
+
+        :param month: the month
+        :param drop: drop the partition (rather than keeping it as a
+            standalone table)
+        """
+        with Session(self._engine) as session:
+            session.exec(partitions.detach(month))
+            if drop:
+                session.exec(partitions.drop(month))
+            version = session.exec(queries.bump_data_version()).scalar_one()
+            session.commit()
+        self._caches.validate(version)
+
+    def get_partitions(self) -> Tuple[SpeedRecordPartition, ...]:
+        """Get the partitions of the speed records table."""
+        with Session(self._engine) as session:
+            result = session.exec(partitions.tree()).all()
+            return tuple(
+                SpeedRecordPartition.model_validate(row._mapping)
+                for row in result
+            )
+
+    def simplify_links(self):
+        """Fill in the simplified copies of every link's geometry."""
+        with Session(self._engine) as session:
+            session.exec(queries.simplify_links())
+            session.commit()
+
+    def create_staging(self):
+        """
+        Create the (empty) staging tables the loader copies new links and
+        speed records into (see :py:meth:`replace_data`).
+        """
+        with Session(self._engine) as session:
+            for statement in queries.create_staging():
+                session.exec(statement)
+            session.commit()
+
+    def replace_data(self) -> AggregateRefresh:
+        """
+        Replace the links and speed records with the contents of the staging
+        tables, simplify the links' geometry and rebuild the aggregates.
+
+        It all happens in one transaction, so if anything fails the old data
+        is kept.  Emptying the tables locks them until the transaction ends,
+        though, so reads wait for the whole swap.
+
+        :return: the outcome of the (full) refresh
+        """
+        with Session(self._engine) as session:
+            for statement in queries.replace_from_staging():
+                session.exec(statement)
+            session.exec(queries.simplify_links())
+            refresh, version = self._refresh(session, full=True)
+            session.commit()
+        self._caches.validate(version)
+        return refresh
+
+    def refresh_aggregates(self, full: bool = False) -> AggregateRefresh:
+        """
+        Merge new speed records into the `traffic.link_aggs` and
+        `traffic.link_speed_bins` tables.
+
+        Only speed records that have arrived since the last refresh are read
+        unless a full refresh is requested, in which case the tables are
+        rebuilt from scratch.
+
+        New records are found by ID, so a record that commits *after* a
+        refresh with a lower ID than one that refresh already merged (say,
+        from a long transaction that was still loading) is never merged.
+        Don't refresh while records are being loaded, or follow such a load
+        with a full refresh.
+
+        :param full: rebuild the aggregates from all speed records
+        :return: the outcome of the refresh
+        """
+        with Session(self._engine) as session:
+            refresh, version = self._refresh(session, full=full)
+            session.commit()
+        if version is not None:
+            self._caches.validate(version)
+        return refresh
+
+    @staticmethod
+    def _refresh(
+        session: Session, full: bool
+    ) -> Tuple[AggregateRefresh, Optional[int]]:
+        """
+        Refresh the aggregates (without committing).
+
+        :param session: the session
+        :param full: rebuild the aggregates from all speed records
+        :return: the outcome of the refresh and the new data version (if the
+            data changed)
+        """
+        # Refreshes take turns so they can't merge the same records twice
+        # (even on the first run, before the state row exists).
+        session.exec(queries.refresh_lock())
+        session.exec(queries.aggregate_state())
+        state = session.exec(
+            select(LinkAggregateState)
+            .where(LinkAggregateState.id == 1)
+            .with_for_update()
+        ).one()
+        if full:
+            session.exec(delete(LinkAggregate))
+            session.exec(delete(LinkSpeedBin))
+            state.last_record_id = 0
+        # Figure out how far the new records go so that records inserted
+        # while we work are left for the next refresh.
+        last_record_id = (
+            session.exec(
+                select(func.max(SpeedRecord.id)).where(
+                    SpeedRecord.id > state.last_record_id
+                )
+            ).one()
+            or state.last_record_id
+        )
+        records = (
+            SpeedRecord.id > state.last_record_id,
+            SpeedRecord.id <= last_record_id,
+        )
+        count = session.exec(
+            select(func.count()).select_from(SpeedRecord).where(*records)
+        ).one()
+        if count:
+            session.exec(queries.aggregate_upsert(*records))
+            # Merge the new records into the speed histograms, too.
+            session.exec(queries.speed_bin_upsert(*records))
+        state.last_record_id = last_record_id
+        state.refreshed_at = func.now()
+        session.add(state)
+        # Let every process know that its cached results are stale.
+        version = (
+            session.exec(queries.bump_data_version()).scalar_one()
+            if count or full
+            else None
+        )
+        return (
+            AggregateRefresh(
+                full=full, records=count, last_record_id=last_record_id
+            ),
+            version,
+        )
+
+
+@instrumented
+class AsyncTrafficService(_TrafficQueries):
+    """
+    Traffic service for asynchronous callers.
+
+    The service is backed by an asynchronous engine so that callers (like
+    the web API) can keep many queries in flight without tying up a thread
+    for each one.
+    """
+
+    def __init__(self):
+        """Create a new instance."""
+        super().__init__()
+        self._locks = {"columns": asyncio.Lock(), "links": asyncio.Lock()}
+
+    @cached_property
+    def _engine(self) -> AsyncEngine:
+        """Get the database engine (creating it the first time it's used)."""
+        engine = create_async_engine(
+            self._settings.sqa_async_conn
+            or async_conn(self._settings.sqa_conn),
+            poolclass=InstrumentedAsyncQueuePool,
+            **engine_options(self._settings),
+        )
+        instrument(engine.sync_engine)
+        return engine
+
+    async def warm_up(self, connections: int = None):
+        """
+        Open pooled connections (and read the data version) before the first
+        request needs them.
+
+        :param connections: the number of connections to open (the pool size
+            by default)
+        """
+        count = (
+            self._settings.pool_size if connections is None else connections
+        )
+        async with AsyncExitStack() as stack:
+            conns = await asyncio.gather(
+                *(
+                    stack.enter_async_context(self._engine.connect())
+                    for _ in range(count)
+                )
+            )
+            await asyncio.gather(*(conn.execute(select(1)) for conn in conns))
+        # Returning the connections (above) leaves them idle in the pool.
+        await self.data_version()
+
+    @staticmethod
+    def _query_method(plan: Callable[..., Plan]) -> Callable:
+        """
+        Make a coroutine method that runs a plan.
+
+        :param plan: the plan
+        """
+
+        @wraps(plan)
+        async def method(self, *args, **kwargs):
+            return await self._run(plan(self, *args, **kwargs))
+
+        return method
+
+    @staticmethod
+    def _stream_method(plan: Callable[..., Plan]) -> Callable:
+        """
+        Make an asynchronous generator method that runs a plan and streams
+        the lines its statement selects.
+
+        :param plan: the plan
+        """
+
+        @wraps(plan)
+        async def method(self, *args, **kwargs):
+            statement = await self._run(plan(self, *args, **kwargs))
+            async for lines in self._stream(statement):
+                yield lines
+
+        return method
+
+    async def _run(self, plan: Plan[T]) -> T:
+        """
+        Run a plan, performing its steps as it yields them.
+
+        :param plan: the plan
+        """
+        result = None
+        while True:
+            try:
+                step = plan.send(result)
+            except StopIteration as stop:
+                return stop.value
+            result = await getattr(self, step.shim)(step)
+
+    async def _execute(self, step: _Execute) -> Any:
+        """
+        Execute a statement and fetch its results.
+
+        :param step: the step
+        """
+        async with AsyncSession(self._engine) as session:
+            return getattr(await session.exec(step.statement), step.fetch)()
+
+    async def _compute(self, step: _Compute) -> Any:
+        """
+        Call a CPU-bound function (off the event loop).
+
+        :param step: the step
+        """
+        return await asyncio.to_thread(step.function, **step.kwargs)
+
+    async def _load(self, step: _Load) -> Any:
+        """
+        Load something we keep in memory (unless it's already loaded).
+
+        :param step: the step
+        """
+        async with self._locks[step.attribute]:
+            if getattr(self._caches, step.attribute) is None:
+                builder = step.builder()
+                async with AsyncSession(self._engine) as session:
+                    result = await session.stream(
+                        step.statement,
+                        execution_options={"yield_per": _LOAD_BATCH_SIZE},
+                    )
+                    async for rows in result.partitions():
+                        builder.add(rows)
+                # Building can be CPU-bound, so we do it off the loop.
+                value = await asyncio.to_thread(builder.build)
+                setattr(self._caches, step.attribute, value)
+            return getattr(self._caches, step.attribute)
+
+    async def _stream(self, statement: Select) -> AsyncIterator[List[str]]:
+        """
+        Execute a statement that selects lines of text and stream the
+        results in batches.
+
+        :param statement: the statement
+        """
+        async with AsyncSession(self._engine) as session:
+            # `yield_per` fetches the rows through a server-side cursor.
+            result = await session.stream_scalars(
+                statement,
+                execution_options={
+                    "yield_per": self._settings.stream_batch_size
+                },
+            )
+            async for lines in result.partitions():
+                yield list(lines)
+
+
+def engine_options(settings: TrafficServiceSettings) -> Dict[str, Any]:
+    """
+    Get the engine options for the current settings.
+
+    :param settings: the traffic service settings
+    """
+    return {
+        "pool_size": settings.pool_size,
+        "max_overflow": settings.max_overflow,
+        "pool_timeout": settings.pool_timeout,
+        "pool_recycle": settings.pool_recycle,
+        "pool_pre_ping": settings.pool_pre_ping,
+        "echo": settings.echo,
+    }
+
+
+def check_batch(link_ids: Sequence[int], max_size: int) -> Tuple[int, ...]:
+    """
+    Remove duplicates from a batch of link IDs and make sure it isn't too
+    large.
+
+    :param link_ids: the link IDs
+    :param max_size: the maximum number of (distinct) IDs
+    :returns: the distinct IDs (in their original order)
+    :raises BatchTooLargeException: if there are too many IDs
+    """
+    link_ids = tuple(dict.fromkeys(link_ids))
+    if len(link_ids) > max_size:
+        raise BatchTooLargeException(
+            f"A batch may have at most {max_size} link IDs."
+        )
+    return link_ids
+
+
+def arrange(
+    link_ids: Sequence[int], items: Sequence[Any]
+) -> Tuple[List[Any], List[int]]:
+    """
+    Arrange the items found by a batch lookup in the order they were
+    requested and note the IDs that weren't found.
+
+    :param link_ids: the requested link IDs
+    :param items: the items that were found (which have `link_id`s)
+    :returns: the items and the missing IDs
+    """
+    found = {item.link_id: item for item in items}
+    return (
+        [found[i] for i in link_ids if i in found],
+        [i for i in link_ids if i not in found],
+    )
+
+
+def within(
+    index: LinkIndex,
+    bbox: Tuple[float, float, float, float] = None,
+    polygon: geojson.Polygon = None,
+    link_ids: Sequence[int] = None,
+) -> List[int]:
+    """
+    Find the links that fall within a bounding box and/or polygon.
+
+    :param index: the spatial index of the links
+    :param bbox: the bounding box
+    :param polygon: the polygon
+    :param link_ids: only include these links
+    :returns: the IDs of the links (in ascending order)
+    """
+    found = index.query(bbox=bbox, polygon=polygon)
+    if link_ids is not None:
+        found = found[np.isin(found, link_ids)]
+    return found.tolist()
+
+
+def check_tile(z: int, x: int, y: int):
+    """
+    Make sure tile coordinates are on the tile grid.
+
+    :param z: the tile's zoom level
+    :param x: the tile's column
+    :param y: the tile's row
+    :raises TileNotFoundException: if the tile is outside the grid
+    """
+    if z < 0 or not (0 <= x < 2**z and 0 <= y < 2**z):
+        raise TileNotFoundException()
+
+
+def async_conn(sqa_conn: str) -> str:
+    """
+    Get the asynchronous (asyncpg) equivalent of a connection string.
+
+    :param sqa_conn: a SQLAlchemy database connection string
+    """
+    return (
+        make_url(sqa_conn)
+        .set(drivername="postgresql+asyncpg")
+        .render_as_string(hide_password=False)
+    )
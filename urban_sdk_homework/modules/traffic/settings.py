@@ -1,10 +1,13 @@
 from typing import Optional
 
+from pydantic import confloat
+from pydantic import conint
 from pydantic import Field
 from pydantic_settings import SettingsConfigDict
 
 from urban_sdk_homework.core.settings.base import BaseSettings
 from urban_sdk_homework.core.settings.base import env_prefix
+from urban_sdk_homework.modules.traffic.models import Engine
 
 
 # TODO: Consider moving database connection strings to a centralized config.
@@ -21,3 +24,132 @@ class TrafficServiceSettings(BaseSettings):
         default="postgresql://localhost:5432/urbansdk",
         description="A SQLAlchemy database connection string.",
     )
+    sqa_async_conn: Optional[str] = Field(
+        default=None,
+        description=(
+            "An asynchronous SQLAlchemy database connection string.  If it "
+            "isn't set, it is derived from `sqa_conn` using the asyncpg "
+            "driver."
+        ),
+        examples=["postgresql+asyncpg://localhost:5432/urbansdk"],
+    )
+    pool_size: conint(ge=0) = Field(
+        default=5,
+        description=(
+            "This is the number of connections each process keeps open.  "
+            "Keep `pool_size` + `max_overflow` multiplied by the number of "
+            "API workers below Postgres' `max_connections`."
+        ),
+    )
+    max_overflow: int = Field(
+        default=10,
+        description=(
+            "This is the number of connections a process may open beyond "
+            "`pool_size` when the pool is exhausted.  (Use -1 for no limit.)"
+        ),
+    )
+    pool_timeout: confloat(gt=0) = Field(
+        default=30.0,
+        description=(
+            "This is the number of seconds to wait for a connection before "
+            "giving up."
+        ),
+    )
+    pool_recycle: int = Field(
+        default=-1,
+        description=(
+            "Connections older than this many seconds are replaced when they "
+            "are checked out.  (Use -1 to keep connections indefinitely.)"
+        ),
+    )
+    pool_pre_ping: bool = Field(
+        default=False,
+        description="Test connections for liveness when they're checked out.",
+    )
+    echo: bool = Field(
+        default=False,
+        description="Log every SQL statement.  (This is for development.)",
+    )
+    materialized: bool = Field(
+        default=True,
+        description=(
+            "Read aggregates from the pre-computed `traffic.link_aggs` table. "
+            "Set this to `False` to compute them from the raw speed records."
+        ),
+    )
+    page_size: conint(ge=1) = Field(
+        default=100,
+        description=(
+            "This is the number of items on a page when the caller doesn't "
+            "ask for a specific number."
+        ),
+    )
+    max_page_size: conint(ge=1) = Field(
+        default=10000,
+        description="This is the largest page size a caller may request.",
+    )
+    stream_batch_size: conint(ge=1) = Field(
+        default=1000,
+        description=(
+            "This is the number of rows fetched from the database at a time "
+            "when results are streamed (`format=ndjson` or "
+            "`format=geojsonseq`)."
+        ),
+    )
+    tile_cache_size: conint(ge=0) = Field(
+        default=4096,
+        description=(
+            "This is the number of vector tiles each process keeps in memory. "
+            " (Use 0 to turn the tile cache off.)"
+        ),
+    )
+    cache_size: conint(ge=0) = Field(
+        default=1024,
+        description=(
+            "This is the number of query results each process keeps in "
+            "memory.  (Use 0 to turn the cache off.)"
+        ),
+    )
+    cache_max_bytes: Optional[conint(ge=0)] = Field(
+        default=256 * 2**20,
+        description=(
+            "This is roughly how much memory (in bytes, estimated from the "
+            "size of their JSON) the query results each process keeps may "
+            "take up.  Results larger than this aren't cached.  (Use `None` "
+            "to bound the cache by `cache_size` alone.)"
+        ),
+    )
+    cache_ttl: Optional[confloat(gt=0)] = Field(
+        default=300.0,
+        description=(
+            "This is the number of seconds a query result stays cached.  "
+            "(Use `None` to keep results until they're evicted or the data "
+            "changes.)"
+        ),
+    )
+    data_version_interval: confloat(ge=0) = Field(
+        default=5.0,
+        description=(
+            "This is how often (in seconds) to check whether the data has "
+            "changed.  Cached results are discarded when it has."
+        ),
+    )
+    max_batch_size: conint(ge=1) = Field(
+        default=1000,
+        description="This is the most links a caller may look up at once.",
+    )
+    partition_by_day: bool = Field(
+        default=False,
+        description=(
+            "Sub-partition each month of speed records by day of the week "
+            "(so queries for a single day only read that day's partition)."
+        ),
+    )
+    engine: Engine = Field(
+        default=Engine.SQL,
+        description=(
+            "This is the engine that computes aggregates and slow links.  "
+            "`numpy` loads the speed records into memory once (per process) "
+            "and computes them there; `sql` asks Postgres every time."
+        ),
+    )
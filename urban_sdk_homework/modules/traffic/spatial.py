@@ -0,0 +1,96 @@
+from typing import Iterable
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+import shapely
+from shapely import STRtree
+
+from urban_sdk_homework.core.geometry import geojson
+
+# Note to the Future: The link network rarely changes, so rather than asking
+# Postgres to test every link against a bounding box (or polygon) on every
+# request, each worker keeps an R-tree of the link geometries and resolves
+# spatial filters to link IDs itself.  The database then only has to look
+# the links (or their speeds) up by ID.
+
+
+class LinkIndex:
+    """An in-memory spatial index of link geometries."""
+
+    def __init__(self, link_ids: np.ndarray, geoms: np.ndarray):
+        """
+        Create a new instance.
+
+        :param link_ids: the link IDs
+        :param geoms: the links' geometries (in the same order as the IDs)
+        """
+        self.link_ids = link_ids
+        self._tree = STRtree(geoms)
+
+    @classmethod
+    def from_batches(
+        cls, batches: Iterable[Sequence[Tuple[int, bytes]]]
+    ) -> "LinkIndex":
+        """
+        Build the index from batches of `(link_id, wkb)` rows.
+
+        :param batches: the batches of rows
+        """
+        builder = LinkIndexBuilder()
+        for rows in batches:
+            builder.add(rows)
+        return builder.build()
+
+    def query(
+        self,
+        bbox: Tuple[float, float, float, float] = None,
+        polygon: geojson.Polygon = None,
+    ) -> np.ndarray:
+        """
+        Find the links that intersect a bounding box, a polygon or both.
+
+        :param bbox: the bounding box (minx, miny, maxx, maxy)
+        :param polygon: the polygon
+        :returns: the IDs of the links (in ascending order)
+        """
+        geometry = shapely.box(*bbox) if bbox is not None else None
+        if polygon is not None:
+            shape = polygon.shape()
+            geometry = (
+                shape if geometry is None else geometry.intersection(shape)
+            )
+        if geometry is None:
+            return np.sort(self.link_ids)
+        indexes = self._tree.query(geometry, predicate="intersects")
+        return np.sort(self.link_ids[indexes])
+
+    def __len__(self) -> int:
+        return len(self.link_ids)
+
+
+class LinkIndexBuilder:
+    """Builds a :py:class:`LinkIndex` a batch of rows at a time."""
+
+    def __init__(self):
+        """Create a new instance."""
+        self._link_ids = []
+        self._wkbs = []
+
+    def add(self, rows: Sequence[Tuple[int, bytes]]):
+        """
+        Add a batch of `(link_id, wkb)` rows.
+
+        :param rows: the rows
+        """
+        for link_id, wkb in rows:
+            self._link_ids.append(link_id)
+            # Some drivers return `memoryview` for `bytea` columns.
+            self._wkbs.append(bytes(wkb))
+
+    def build(self) -> LinkIndex:
+        """Build the index."""
+        return LinkIndex(
+            link_ids=np.array(self._link_ids, dtype=np.int64),
+            geoms=shapely.from_wkb(np.array(self._wkbs, dtype=object)),
+        )
@@ -0,0 +1,444 @@
+from collections import deque
+from concurrent.futures import Executor
+from concurrent.futures import Future
+from datetime import date
+from datetime import timedelta
+from math import ceil
+from math import cos
+from math import radians
+from math import sqrt
+from pathlib import Path
+from typing import Callable
+from typing import Deque
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+from pydantic import Field
+from pyproj import Geod
+
+from urban_sdk_homework.core.models import BaseModel
+
+# Note to the Future: The synthetic network is a street grid: every node
+# (intersection) has a link running east and a link running north, so the
+# network is connected, and a link's neighbours share its end points exactly.
+# Intersections are jittered a little and links bend a little, so the network
+# doesn't look like graph paper (and spatial indexes have realistic work to
+# do).  Every random number about a node or a link is a hash of the seed and
+# its ID (rather than a draw from a sequential generator), and records are
+# generated in fixed-size chunks with their own generators, so the output
+# depends only on the seed and the scale, never on the number of workers.
+
+#: This is the centre of the grid (downtown Jacksonville) as (longitude,
+#: latitude).
+ORIGIN: Tuple[float, float] = (-81.6557, 30.3322)
+
+#: This is the average distance (in meters) between intersections.
+BLOCK = 150.0
+
+#: This is the number of links generated at a time (by one worker).
+CHUNK_SIZE = 10_000
+
+#: This is the number of decimal places in the coordinates.  (Five places is
+#: roughly a meter, like the real data.)
+PRECISION = 5
+
+#: These are the columns of the links file (like `link_info.parquet`).
+LINK_SCHEMA = pa.schema(
+    [
+        ("link_id", pa.int64()),
+        ("road_name", pa.string()),
+        ("_length", pa.float64()),
+        ("geo_json", pa.string()),
+    ]
+)
+
+#: These are the columns of the speed records file (like
+#: `duval_jan1_2024.parquet`).
+SPEED_RECORD_SCHEMA = pa.schema(
+    [
+        ("link_id", pa.int64()),
+        ("date_time", pa.timestamp("us", tz="UTC")),
+        ("day_of_week", pa.int64()),
+        ("period", pa.int64()),
+        ("average_speed", pa.float64()),
+    ]
+)
+
+#: This is the hour (UTC) each period's records are stamped with.
+PERIOD_HOURS = np.array([2, 5, 8, 11, 14, 17, 21])
+
+#: These are the free-flow speeds (mph) of local streets, collectors and
+#: arterials.
+FREE_FLOW = np.array([25.0, 35.0, 45.0])
+
+#: These are the fractions of the free-flow speed traffic moves at in each
+#: period on a weekday (Overnight to Evening)...
+WEEKDAY = np.array([1.0, 0.95, 0.6, 0.85, 0.8, 0.55, 0.9])
+
+#: ...and at the weekend.
+WEEKEND = np.array([1.0, 1.0, 0.95, 0.85, 0.85, 0.9, 0.92])
+
+#: This is how much (as a fraction of its speed) a record varies from the
+#: link's typical speed.
+NOISE = 0.08
+
+#: This is the slowest speed (mph) we record.
+MIN_SPEED = 2.0
+
+#: These are the names of the arterials.
+ARTERIALS = (
+    "Atlantic",
+    "Baymeadows",
+    "Beach",
+    "Beaver",
+    "Blanding",
+    "Emerson",
+    "Hendricks",
+    "Kings",
+    "Lem Turner",
+    "Main",
+    "Merrill",
+    "Normandy",
+    "Philips",
+    "Roosevelt",
+    "San Jose",
+    "Southside",
+    "University",
+    "Wilson",
+)
+
+#: These are the names of the north-south streets.
+AVENUES = (
+    "Acacia",
+    "Birch",
+    "Cedar",
+    "Cypress",
+    "Dogwood",
+    "Elm",
+    "Hickory",
+    "Juniper",
+    "Laurel",
+    "Live Oak",
+    "Magnolia",
+    "Maple",
+    "Mimosa",
+    "Myrtle",
+    "Palm",
+    "Palmetto",
+    "Pecan",
+    "Pine",
+    "Poplar",
+    "Sweetgum",
+    "Sycamore",
+    "Walnut",
+    "Willow",
+    "Wisteria",
+)
+
+#: This is the ellipsoid link lengths are measured on.
+_GEOD = Geod(ellps="WGS84")
+
+#: These are the streams of hashed random numbers (so different uses of the
+#: same ID don't get the same number).
+_JITTER_X, _JITTER_Y, _BEND, _FREE_FLOW, _CONGESTION = range(5)
+
+
+class Network(BaseModel):
+    """The shape of a synthetic network."""
+
+    links: int = Field(description="This is the number of links.", ge=1)
+    seed: int = Field(
+        default=0, description="This seeds every random number.", ge=0
+    )
+
+    @property
+    def columns(self) -> int:
+        """Get the number of intersections along each side of the grid."""
+        return max(ceil(sqrt(self.links / 2)), 1)
+
+    def chunks(self) -> Iterator[Tuple[int, int]]:
+        """Get the `(first, last)` link IDs of each chunk of links."""
+        for first in range(1, self.links + 1, CHUNK_SIZE):
+            yield first, min(first + CHUNK_SIZE - 1, self.links)
+
+
+def days(start: date, end: date) -> Tuple[date, ...]:
+    """
+    Get every day in a range.
+
+    :param start: the first day
+    :param end: the last day (inclusive)
+    """
+    return tuple(
+        start + timedelta(days=n) for n in range((end - start).days + 1)
+    )
+
+
+def links(network: Network, first: int, last: int) -> pa.Table:
+    """
+    Generate a chunk of links.
+
+    :param network: the network
+    :param first: the first link ID
+    :param last: the last link ID (inclusive)
+    """
+    ids = np.arange(first, last + 1, dtype=np.int64)
+    row, column, north = _position(network, ids)
+    # Each link runs from its intersection to the next one east (or north).
+    x0, y0 = _node(network, row, column)
+    x1, y1 = _node(network, row + north, column + 1 - north)
+    # Bend the link by pushing its middle sideways (by up to a tenth of a
+    # block either way).
+    bend = (_uniform(network.seed, _BEND, ids) - 0.5) * 0.2
+    xm = (x0 + x1) / 2 - (y1 - y0) * bend
+    ym = (y0 + y1) / 2 + (x1 - x0) * bend
+    coords = np.round(
+        np.stack(
+            [
+                np.stack([x, y], axis=-1)
+                for x, y in ((x0, y0), (xm, ym), (x1, y1))
+            ],
+            axis=1,
+        ),
+        PRECISION,
+    )
+    # The real data holds each link as a single-line MultiLineString.
+    lines = shapely.linestrings(coords)
+    geoms = shapely.multilinestrings(lines, indices=np.arange(len(ids)))
+    _, _, first_leg = _GEOD.inv(
+        coords[:, 0, 0], coords[:, 0, 1], coords[:, 1, 0], coords[:, 1, 1]
+    )
+    _, _, second_leg = _GEOD.inv(
+        coords[:, 1, 0], coords[:, 1, 1], coords[:, 2, 0], coords[:, 2, 1]
+    )
+    return pa.table(
+        {
+            "link_id": ids,
+            "road_name": _road_names(row, column, north),
+            "_length": np.round(first_leg + second_leg, 3),
+            "geo_json": shapely.to_geojson(geoms),
+        },
+        schema=LINK_SCHEMA,
+    )
+
+
+def speed_records(
+    network: Network, day: date, first: int, last: int
+) -> pa.Table:
+    """
+    Generate a day's speed records for a chunk of links (one record for each
+    link in each period, in time order).
+
+    Every link has a free-flow speed (set by its road's class) and a
+    sensitivity to congestion; in each period it slows down by the period's
+    usual amount (scaled by its sensitivity), give or take a little noise.
+
+    :param network: the network
+    :param day: the day
+    :param first: the first link ID
+    :param last: the last link ID (inclusive)
+    """
+    ids = np.arange(first, last + 1, dtype=np.int64)
+    row, column, north = _position(network, ids)
+    road_class = np.where(north == 1, _class(column), _class(row))
+    free_flow = FREE_FLOW[road_class] * (
+        0.85 + 0.3 * _uniform(network.seed, _FREE_FLOW, ids)
+    )
+    # Arterials feel the rush hour more than side streets.
+    sensitivity = (0.6 + 0.2 * road_class) * (
+        0.5 + _uniform(network.seed, _CONGESTION, ids)
+    )
+    # Sunday is 1 (and Saturday is 7).
+    day_of_week = (day.isoweekday() % 7) + 1
+    factors = WEEKEND if day_of_week in (1, 7) else WEEKDAY
+    typical = free_flow[None, :] * np.clip(
+        1.0 - (1.0 - factors[:, None]) * sensitivity[None, :], 0.05, None
+    )
+    rng = np.random.default_rng((network.seed, day.toordinal(), first))
+    speeds = np.maximum(
+        typical * (1.0 + NOISE * rng.standard_normal(typical.shape)),
+        MIN_SPEED,
+    )
+    times = np.datetime64(day, "us") + PERIOD_HOURS.astype("timedelta64[h]")
+    periods = np.repeat(np.arange(1, 8), len(ids))
+    return pa.table(
+        {
+            "link_id": np.tile(ids, 7),
+            "date_time": np.repeat(times, len(ids)),
+            "day_of_week": np.full(len(periods), day_of_week),
+            "period": periods,
+            "average_speed": np.round(speeds.ravel(), 4),
+        },
+        schema=SPEED_RECORD_SCHEMA,
+    )
+
+
+def write(
+    path: Path,
+    schema: pa.Schema,
+    executor: Executor,
+    tasks: Iterable[Tuple[Callable[..., pa.Table], tuple]],
+    window: int,
+    on_rows: Callable[[int], None] = None,
+) -> int:
+    """
+    Generate the chunks of a file in parallel and write them in order.
+
+    :param path: the file
+    :param schema: the file's columns
+    :param executor: the executor that generates the chunks
+    :param tasks: the chunks, as functions and their arguments
+    :param window: the most chunks to generate (or hold) at once
+    :param on_rows: a function called with the number of rows in each chunk
+        once it has been written
+    :return: the number of rows written
+    """
+    # Only `window` chunks are in flight at once, so the workers can't get
+    # too far ahead of the writer (and fill up memory).
+    pending: Deque[Future] = deque()
+    tasks = iter(tasks)
+    rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        while True:
+            for fn, args in tasks:
+                pending.append(executor.submit(fn, *args))
+                if len(pending) >= window:
+                    break
+            if not pending:
+                return rows
+            table = pending.popleft().result()
+            writer.write_table(table)
+            rows += table.num_rows
+            if on_rows:
+                on_rows(table.num_rows)
+
+
+def _position(
+    network: Network, ids: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Find links on the grid.
+
+    :param network: the network
+    :param ids: the link IDs
+    :return: each link's intersection (row and column) and whether it runs
+        north (1) or east (0)
+    """
+    index = ids - 1
+    node = index // 2
+    return node // network.columns, node % network.columns, index % 2
+
+
+def _node(
+    network: Network, row: np.ndarray, column: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Get the coordinates of intersections.
+
+    :param network: the network
+    :param row: the intersections' rows
+    :param column: the intersections' columns
+    """
+    lat_block = BLOCK / 110_574.0
+    lng_block = BLOCK / (111_320.0 * cos(radians(ORIGIN[1])))
+    half = network.columns / 2
+    # Every intersection is jittered by up to a fifth of a block.
+    node = row * (network.columns + 1) + column
+    jitter_x = _uniform(network.seed, _JITTER_X, node) - 0.5
+    jitter_y = _uniform(network.seed, _JITTER_Y, node) - 0.5
+    return (
+        ORIGIN[0] + (column - half + jitter_x * 0.4) * lng_block,
+        ORIGIN[1] + (row - half + jitter_y * 0.4) * lat_block,
+    )
+
+
+def _class(road: np.ndarray) -> np.ndarray:
+    """
+    Get the class of the roads along grid lines: 2 (arterial) for every
+    tenth, 1 (collector) for every other fifth and 0 (local) for the rest.
+
+    :param road: the rows (or columns)
+    """
+    return np.where(road % 10 == 0, 2, np.where(road % 5 == 0, 1, 0))
+
+
+def _road_names(
+    row: np.ndarray, column: np.ndarray, north: np.ndarray
+) -> List[str]:
+    """
+    Name the roads links are on.
+
+    East-west roads are numbered streets and north-south roads are named
+    avenues, except for the arterials (every tenth road), which are
+    boulevards and roads.
+
+    :param row: the links' rows
+    :param column: the links' columns
+    :param north: whether each link runs north (1) or east (0)
+    """
+    streets = {r: _street(r) for r in np.unique(row[north == 0]).tolist()}
+    avenues = {c: _avenue(c) for c in np.unique(column[north == 1]).tolist()}
+    return [
+        avenues[c] if n else streets[r]
+        for r, c, n in zip(row.tolist(), column.tolist(), north.tolist())
+    ]
+
+
+def _street(row: int) -> str:
+    """
+    Name an east-west road.
+
+    :param row: the road's row
+    """
+    if row % 10 == 0:
+        return f"{ARTERIALS[(row // 10) % len(ARTERIALS)]} Blvd"
+    return f"{_ordinal(row)} St"
+
+
+def _avenue(column: int) -> str:
+    """
+    Name a north-south road.
+
+    :param column: the road's column
+    """
+    if column % 10 == 0:
+        return f"{ARTERIALS[(column // 10 + 7) % len(ARTERIALS)]} Rd"
+    return f"{AVENUES[column % len(AVENUES)]} Ave"
+
+
+def _ordinal(n: int) -> str:
+    """
+    Get the ordinal of a number (like `21st`).
+
+    :param n: the number
+    """
+    suffix = "th"
+    if not 10 <= n % 100 <= 20:
+        suffix = {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n}{suffix}"
+
+
+def _uniform(seed: int, stream: int, keys: np.ndarray) -> np.ndarray:
+    """
+    Get uniform random numbers in [0, 1) that depend only on the seed, the
+    stream and the keys (with a SplitMix64 hash).
+
+    :param seed: the seed
+    :param stream: the stream
+    :param keys: the keys (like link IDs)
+    """
+    with np.errstate(over="ignore"):
+        z = keys.astype(np.uint64) + np.uint64(
+            (seed * 0x9E3779B97F4A7C15 + stream * 0xBF58476D1CE4E5B9)
+            & 0xFFFFFFFFFFFFFFFF
+        )
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) / float(1 << 53)